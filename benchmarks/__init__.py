@@ -0,0 +1,5 @@
+"""
+Бенчмарки решателя расписания и синтетические сценарии для них.
+
+Запуск: python -m benchmarks.<модуль> (из корня репозитория).
+"""
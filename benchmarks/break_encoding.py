@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+"""
+Сравнение формулировок штрафа за перерыв (pairwise / compact): размер модели,
+время построения и решения, значение цели.
+
+python -m benchmarks.break_encoding [--time-limit SECONDS]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.generator import generate_scenario
+from ortools.sat.python import cp_model
+from theater_sched.solver.cp_sat_solver import NUM_SEARCH_WORKERS, _build_model
+
+
+CASES = [
+	# (сцены, постановки, дней в сезоне)
+	(3, 12, 90),
+	(3, 40, 365),
+]
+
+
+def run(time_limit: float = 10.0) -> list[dict]:
+	rows = []
+	for num_stages, num_productions, season_days in CASES:
+		scenario = generate_scenario(num_stages, num_productions, season_days)
+		for encoding in ("pairwise", "compact"):
+			scenario.params.constraints.break_encoding = encoding
+			started = time.perf_counter()
+			model, _, _ = _build_model(scenario)
+			build_seconds = time.perf_counter() - started
+			proto = model.Proto()
+
+			cp_solver = cp_model.CpSolver()
+			cp_solver.parameters.max_time_in_seconds = time_limit
+			cp_solver.parameters.num_search_workers = NUM_SEARCH_WORKERS
+			status = cp_solver.Solve(model)
+			rows.append({
+				"stages": num_stages,
+				"productions": num_productions,
+				"days": season_days,
+				"encoding": encoding,
+				"variables": len(proto.variables),
+				"constraints": len(proto.constraints),
+				"build_seconds": round(build_seconds, 4),
+				"solve_seconds": round(cp_solver.WallTime(), 3),
+				"status": cp_solver.StatusName(status),
+				"objective": cp_solver.ObjectiveValue(),
+			})
+	return rows
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--time-limit", type=float, default=10.0)
+	args = parser.parse_args()
+	for row in run(args.time_limit):
+		print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+"""
+Компиляция сценария (Scenario.compiled) на многолетних сезонах: время и память массивов.
+
+python -m benchmarks.compiled_scenario [--repeat N]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.generator import generate_scenario
+from theater_sched.domain.compiled import CompiledScenario
+
+
+CASES = [
+	# (сцены, постановки, дней в сезоне)
+	(4, 80, 365),
+	(4, 240, 3 * 365),
+	(4, 800, 10 * 365),
+]
+
+
+def run(repeat: int = 3) -> list[dict]:
+	rows = []
+	for num_stages, num_productions, season_days in CASES:
+		scenario = generate_scenario(num_stages, num_productions, season_days)
+		timings = []
+		for _ in range(repeat):
+			started = time.perf_counter()
+			compiled = CompiledScenario(scenario)
+			timings.append(time.perf_counter() - started)
+		arrays = [
+			compiled.production_stage, compiled.max_shows, compiled.slot_stage, compiled.slot_day,
+			compiled.slot_dow, compiled.slot_minute, compiled.chrono_rank, compiled.slot_rank,
+			*compiled.stage_slots, *compiled.stage_productions,
+		]
+		rows.append({
+			"stages": num_stages,
+			"productions": num_productions,
+			"days": season_days,
+			"timeslots": len(compiled.timeslots),
+			"compile_seconds": round(min(timings), 4),
+			"array_bytes": sum(a.nbytes for a in arrays),
+		})
+	return rows
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--repeat", type=int, default=3)
+	args = parser.parse_args()
+	for row in run(args.repeat):
+		print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+	main()
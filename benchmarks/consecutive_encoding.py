@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+"""
+Сравнение формулировок «показы подряд» (windows / start_index) на сезонах
+с длинными сериями: размер модели, время построения и решения, цель.
+
+python -m benchmarks.consecutive_encoding [--time-limit SECONDS]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.generator import generate_scenario
+from ortools.sat.python import cp_model
+from theater_sched.solver.cp_sat_solver import NUM_SEARCH_WORKERS, _build_model
+
+
+CASES = [
+	# (сцены, постановки, дней в сезоне, диапазон max_shows)
+	(3, 12, 120, (2, 6)),
+	(3, 15, 365, (10, 20)),
+	(3, 30, 365, (10, 20)),
+]
+
+
+def run(time_limit: float = 10.0) -> list[dict]:
+	rows = []
+	for num_stages, num_productions, season_days, shows in CASES:
+		scenario = generate_scenario(num_stages, num_productions, season_days, max_shows_range=shows)
+		constraints = scenario.params.constraints
+		# Длинные серии не помещаются между понедельниками
+		constraints.monday_off = shows[1] <= 6
+		constraints.break_encoding = "compact"
+		for encoding in ("windows", "start_index"):
+			constraints.consecutive_encoding = encoding
+			started = time.perf_counter()
+			model, _, _ = _build_model(scenario)
+			build_seconds = time.perf_counter() - started
+			proto = model.Proto()
+
+			cp_solver = cp_model.CpSolver()
+			cp_solver.parameters.max_time_in_seconds = time_limit
+			cp_solver.parameters.num_search_workers = NUM_SEARCH_WORKERS
+			status = cp_solver.Solve(model)
+			rows.append({
+				"stages": num_stages,
+				"productions": num_productions,
+				"days": season_days,
+				"max_shows": list(shows),
+				"encoding": encoding,
+				"variables": len(proto.variables),
+				"constraints": len(proto.constraints),
+				"build_seconds": round(build_seconds, 4),
+				"solve_seconds": round(cp_solver.WallTime(), 3),
+				"status": cp_solver.StatusName(status),
+				"objective": cp_solver.ObjectiveValue(),
+			})
+	return rows
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--time-limit", type=float, default=10.0)
+	args = parser.parse_args()
+	for row in run(args.time_limit):
+		print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+	main()
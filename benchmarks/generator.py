@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+"""
+Генератор синтетических сезонов в духе Большого театра для бенчмарков.
+"""
+
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from theater_sched.domain.models import (
+	FixedAssignment,
+	Person,
+	PersonProductionRole,
+	Production,
+	Role,
+	Scenario,
+	Stage,
+	TimeSlot,
+)
+
+
+STAGE_NAMES = ["Историческая сцена", "Новая сцена", "Камерная сцена", "Бетховенский зал"]
+
+# Типичная длина блока показов в репертуаре: чаще 2–5 вечеров подряд
+BOLSHOI_MAX_SHOWS = {1: 0.1, 2: 0.2, 3: 0.25, 4: 0.25, 5: 0.15, 6: 0.05}
+
+
+def generate_scenario(
+	num_stages: int = 3,
+	num_productions: int = 40,
+	season_days: int = 365,
+	max_shows_range: tuple[int, int] = (1, 6),
+	fill_ratio: float = 0.5,
+	start: date = date(2025, 9, 1),
+	seed: int = 0,
+	max_shows_weights: Optional[Dict[int, float]] = None,
+	fixed_ratio: float = 0.0,
+	num_people: int = 0,
+	roles_per_production: tuple[int, int] = (4, 10),
+	people_per_role: int = 4,
+) -> Scenario:
+	"""Сгенерировать сценарий: сцены, ежедневные вечерние слоты и постановки.
+
+	Постановки распределяются по сценам по кругу; max_shows выбирается из
+	max_shows_range (или по весам max_shows_weights, например
+	BOLSHOI_MAX_SHOWS) так, чтобы показы занимали не больше fill_ratio слотов
+	сцены (без понедельников), иначе модель была бы заведомо неразрешима.
+	Верхняя граница 6 — показы идут подряд и не могут пересекать понедельник.
+
+	fixed_ratio — доля постановок, первый показ которых закреплён
+	(FixedAssignment) по допустимому опорному расписанию. num_people > 0
+	добавляет людей, по roles_per_production ролей на постановку (первая —
+	дирижёр) и для каждой роли people_per_role допущенных людей.
+	При значениях по умолчанию сценарий тот же, что и раньше.
+	"""
+	rnd = random.Random(seed)
+	stages = [
+		Stage(id=f"stage{i}", name=STAGE_NAMES[i] if i < len(STAGE_NAMES) else f"Сцена {i}")
+		for i in range(num_stages)
+	]
+
+	timeslots: List[TimeSlot] = []
+	for d in range(season_days):
+		day = start + timedelta(days=d)
+		for st in stages:
+			timeslots.append(TimeSlot(
+				id=f"{st.id}_{day.isoformat()}",
+				stage_id=st.id,
+				date=day.isoformat(),
+				day_of_week=day.weekday(),
+				start_time="19:00" if st.id != "stage2" else "19:30",
+			))
+
+	working_days = sum(1 for d in range(season_days) if (start + timedelta(days=d)).weekday() != 0)
+	capacity = {st.id: int(working_days * fill_ratio) for st in stages}
+	productions: List[Production] = []
+	for i in range(num_productions):
+		stage_id = stages[i % num_stages].id
+		if max_shows_weights:
+			wanted = rnd.choices(list(max_shows_weights), weights=list(max_shows_weights.values()))[0]
+		else:
+			wanted = rnd.randint(*max_shows_range)
+		max_shows = max(1, min(wanted, capacity[stage_id]))
+		capacity[stage_id] -= max_shows
+		productions.append(Production(
+			id=f"prod{i}",
+			title=f"Постановка {i}",
+			stage_id=stage_id,
+			max_shows=max_shows,
+			weekend_priority=rnd.random() < 0.2,
+		))
+
+	# Отдельный генератор: добавки не меняют постановки и слоты при том же seed
+	extra = random.Random(seed + 1)
+	scenario = Scenario(
+		id=f"bench-{num_stages}x{num_productions}x{season_days}-{seed}",
+		productions=productions,
+		stages=stages,
+		timeslots=timeslots,
+		revenue={},
+	)
+	if fixed_ratio > 0:
+		scenario.fixed_assignments = _fixed_assignments(productions, timeslots, fixed_ratio, extra)
+	if num_people > 0:
+		_add_people_and_roles(scenario, num_people, roles_per_production, people_per_role, extra)
+	return scenario
+
+
+def _fixed_assignments(
+	productions: List[Production],
+	timeslots: List[TimeSlot],
+	fixed_ratio: float,
+	rnd: random.Random,
+) -> List[FixedAssignment]:
+	"""Закрепить первый показ части постановок по опорному расписанию.
+
+	Опорное расписание раскладывает серии постановок сцены друг за другом
+	внутри недель (вторник–воскресенье), так что оно удовлетворяет всем
+	жёстким ограничениям, а значит, закрепления из него совместимы.
+	Постановки, не поместившиеся в опорное расписание, не закрепляются.
+	"""
+	slots_by_stage: Dict[str, List[TimeSlot]] = {}
+	for t in timeslots:
+		slots_by_stage.setdefault(t.stage_id, []).append(t)
+	first_show: Dict[str, TimeSlot] = {}
+	position = {stage_id: 0 for stage_id in slots_by_stage}
+	for p in productions:
+		stage_slots = slots_by_stage.get(p.stage_id, [])
+		i = position.get(p.stage_id, 0)
+		while i < len(stage_slots):
+			run = stage_slots[i:i + p.max_shows]
+			monday = next((k for k, t in enumerate(run) if t.day_of_week == 0), None)
+			if len(run) < p.max_shows:
+				i = len(stage_slots)
+			elif monday is not None:
+				i += monday + 1
+			else:
+				first_show[p.id] = run[0]
+				position[p.stage_id] = i + p.max_shows
+				break
+	chosen = [p for p in productions if p.id in first_show and rnd.random() < fixed_ratio]
+	return [
+		FixedAssignment(
+			production_id=p.id,
+			timeslot_id=first_show[p.id].id,
+			stage_id=p.stage_id,
+			date=first_show[p.id].date,
+			start_time=first_show[p.id].start_time,
+		)
+		for p in chosen
+	]
+
+
+def _add_people_and_roles(
+	scenario: Scenario,
+	num_people: int,
+	roles_per_production: tuple[int, int],
+	people_per_role: int,
+	rnd: random.Random,
+) -> None:
+	"""Люди труппы, роли постановок (первая — дирижёр) и допуски к ролям."""
+	scenario.people = [Person(id=f"person{i}", name=f"Артист {i}") for i in range(num_people)]
+	for p in scenario.productions:
+		for j in range(rnd.randint(*roles_per_production)):
+			role = Role(
+				id=f"{p.id}_role{j}",
+				name="Дирижёр" if j == 0 else f"Партия {j}",
+				production_id=p.id,
+				is_conductor=j == 0,
+				required_count=1 if j == 0 or rnd.random() < 0.8 else 2,
+			)
+			scenario.roles.append(role)
+			count = min(num_people, max(people_per_role, role.required_count))
+			for person in rnd.sample(scenario.people, count):
+				scenario.person_production_roles.append(
+					PersonProductionRole(person_id=person.id, production_id=p.id, role_id=role.id)
+				)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+"""
+Память на назначения и элементы расписания: слоты и интернирование id
+против обычных dataclass с __dict__ и хранимым schedule_item_id.
+
+Строки загружаются как из хранилища (JSON/SQLite): каждая запись приходит
+с новыми объектами str.
+
+python -m benchmarks.memory [--assignments N]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, List
+
+from theater_sched.domain.models import Assignment, ScheduleItem
+
+
+@dataclass
+class _PlainAssignment:
+	"""Прежнее представление назначения — для сравнения."""
+	scenario_id: str
+	schedule_item_id: str
+	production_id: str
+	timeslot_id: str
+	stage_id: str
+	person_id: str
+	role_id: str
+	is_conductor: bool = False
+
+
+@dataclass
+class _PlainScheduleItem:
+	scenario_id: str
+	production_id: str
+	stage_id: str
+	timeslot_id: str
+	revenue: float
+
+
+def _rows(num_assignments: int, roles_per_show: int = 20, people: int = 400) -> str:
+	"""JSON назначений сезона: показы на 3 сценах, по roles_per_show ролей в показе."""
+	rows = []
+	for i in range(num_assignments):
+		show, role = divmod(i, roles_per_show)
+		stage = f"stage{show % 3}"
+		production = f"prod{show // 6}"
+		timeslot = f"{stage}_slot{show}"
+		rows.append([
+			"bench-scenario", f"{production}|{stage}|{timeslot}", production, timeslot, stage,
+			f"person{(i * 7) % people}", f"{production}_role{role}", role == 0,
+		])
+	return json.dumps(rows)
+
+
+def _measure(payload: str, build: Callable[[list], list]) -> dict:
+	"""Память, удерживаемая объектами после загрузки из JSON (сами строки записей освобождены)."""
+	gc.collect()
+	tracemalloc.start()
+	rows = json.loads(payload)
+	started = time.perf_counter()
+	objects = build(rows)
+	elapsed = time.perf_counter() - started
+	del rows
+	gc.collect()
+	size, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return {"objects": len(objects), "retained_bytes": size, "build_seconds": round(elapsed, 4)}
+
+
+def _unique_shows(rows: list) -> list:
+	return list({r[1]: r for r in rows}.values())
+
+
+CASES = {
+	"assignments_plain": lambda rows: [_PlainAssignment(*r) for r in rows],
+	"assignments": lambda rows: [Assignment(r[0], r[2], r[3], r[4], r[5], r[6], r[7]) for r in rows],
+	"schedule_plain": lambda rows: [_PlainScheduleItem(r[0], r[2], r[4], r[3], 0.0) for r in _unique_shows(rows)],
+	"schedule": lambda rows: [ScheduleItem(r[0], r[2], r[4], r[3], 0.0) for r in _unique_shows(rows)],
+}
+
+
+def run(num_assignments: int = 100_000) -> list[dict]:
+	payload = _rows(num_assignments)
+	results = []
+	for name, build in CASES.items():
+		measured = _measure(payload, build)
+		results.append({
+			"case": name,
+			**measured,
+			"bytes_per_object": round(measured["retained_bytes"] / measured["objects"], 1),
+		})
+	return results
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--assignments", type=int, default=100_000)
+	args = parser.parse_args()
+	for row in run(args.assignments):
+		print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+"""
+Время построения CP-SAT модели (без решения) на синтетических сезонах.
+
+python -m benchmarks.model_build [--repeat N] [--baseline]
+
+С --baseline та же модель строится и исходным построителем
+(benchmarks/legacy_model.py), а в строку добавляются его время и ускорение.
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.generator import generate_scenario
+from benchmarks.legacy_model import build_legacy_model
+from theater_sched.solver.cp_sat_solver import _build_model
+
+
+CASES = [
+	# (сцены, постановки, дней в сезоне)
+	(3, 12, 90),
+	(3, 40, 365),
+	(4, 80, 365),
+]
+
+
+def _best_of(repeat: int, build) -> float:
+	timings = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		build()
+		timings.append(time.perf_counter() - started)
+	return min(timings)
+
+
+def run(repeat: int = 3, baseline: bool = False) -> list[dict]:
+	rows = []
+	for num_stages, num_productions, season_days in CASES:
+		scenario = generate_scenario(num_stages, num_productions, season_days)
+		build_seconds = _best_of(repeat, lambda: _build_model(scenario))
+		model, x, _ = _build_model(scenario)
+		proto = model.Proto()
+		row = {
+			"stages": num_stages,
+			"productions": num_productions,
+			"days": season_days,
+			"x_vars": len(x),
+			"variables": len(proto.variables),
+			"constraints": len(proto.constraints),
+			"build_seconds": round(build_seconds, 4),
+		}
+		if baseline:
+			baseline_seconds = _best_of(repeat, lambda: build_legacy_model(scenario))
+			row["baseline_build_seconds"] = round(baseline_seconds, 4)
+			row["speedup"] = round(baseline_seconds / build_seconds, 2)
+		rows.append(row)
+	return rows
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--repeat", type=int, default=3)
+	parser.add_argument("--baseline", action="store_true", help="сравнить с исходным построителем модели")
+	args = parser.parse_args()
+	for row in run(args.repeat, args.baseline):
+		print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+	main()
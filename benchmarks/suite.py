@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+"""
+Сквозной набор бенчмарков: построение модели, CpSolver.Solve, распределение
+по ролям (_assign_people_to_roles) и полный цикл через API (TestClient).
+
+Результаты — JSON с коммитом и версиями, пригодный для сравнения между
+коммитами:
+
+python -m benchmarks.suite --output before.json
+python -m benchmarks.suite --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import ortools
+from ortools.sat.python import cp_model
+
+from benchmarks.generator import BOLSHOI_MAX_SHOWS, generate_scenario
+from theater_sched.domain.models import Scenario, ScheduleItem
+from theater_sched.solver.cp_sat_solver import NUM_SEARCH_WORKERS, _assign_people_to_roles, _build_model
+
+
+CASES = {
+	# имя: параметры generate_scenario
+	"small": dict(num_stages=3, num_productions=12, season_days=90, num_people=60),
+	"season": dict(
+		num_stages=3, num_productions=40, season_days=365, max_shows_weights=BOLSHOI_MAX_SHOWS,
+		fixed_ratio=0.2, num_people=300,
+	),
+	"large": dict(
+		num_stages=4, num_productions=80, season_days=365, max_shows_weights=BOLSHOI_MAX_SHOWS,
+		fixed_ratio=0.1, num_people=600, roles_per_production=(10, 25),
+	),
+}
+
+# Метрики, сравниваемые с --compare (меньше — лучше)
+TIMED_METRICS = ("build_seconds", "solve_seconds", "assign_seconds", "api_seconds")
+
+
+def _git_commit() -> Optional[str]:
+	try:
+		return subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def _extract_schedule(scenario: Scenario, cp_solver: cp_model.CpSolver, x: Dict) -> List[ScheduleItem]:
+	stage_of = {t.id: t.stage_id for t in scenario.timeslots}
+	return [
+		ScheduleItem(scenario_id=scenario.id, production_id=p_id, stage_id=stage_of[t_id], timeslot_id=t_id, revenue=0.0)
+		for (p_id, t_id), var in x.items() if cp_solver.Value(var) == 1
+	]
+
+
+def _api_payload(scenario: Scenario, time_limit: float) -> Dict:
+	"""Тело POST /scenarios для сгенерированного сценария."""
+	return {
+		"productions": [asdict(p) for p in scenario.productions],
+		"stages": [asdict(st) for st in scenario.stages],
+		"timeslots": [asdict(t) for t in scenario.timeslots],
+		"fixed_assignments": [asdict(fa) for fa in scenario.fixed_assignments],
+		"people": [asdict(p) for p in scenario.people],
+		"roles": [asdict(r) for r in scenario.roles],
+		"person_production_roles": [asdict(ppr) for ppr in scenario.person_production_roles],
+		"params": {"time_limit_seconds": max(1, round(time_limit))},
+	}
+
+
+def _api_round_trip(client, scenario: Scenario, time_limit: float) -> Dict:
+	"""Создание сценария, решение, чтение расписания и Ганта через API."""
+	timings = {}
+	started = time.perf_counter()
+	response = client.post("/scenarios", json=_api_payload(scenario, time_limit))
+	response.raise_for_status()
+	scenario_id = response.json()["scenario_id"]
+	timings["api_create_seconds"] = time.perf_counter() - started
+
+	mark = time.perf_counter()
+	response = client.post(f"/scenarios/{scenario_id}/solve", json={})
+	response.raise_for_status()
+	timings["api_solve_seconds"] = time.perf_counter() - mark
+
+	mark = time.perf_counter()
+	client.get(f"/scenarios/{scenario_id}/schedule").raise_for_status()
+	client.get(f"/scenarios/{scenario_id}/gantt").raise_for_status()
+	timings["api_read_seconds"] = time.perf_counter() - mark
+	timings["api_seconds"] = time.perf_counter() - started
+	return {key: round(value, 4) for key, value in timings.items()}
+
+
+def run(names: List[str], time_limit: float = 10.0, repeat: int = 3, api: bool = True) -> Dict:
+	client = None
+	if api:
+		# Кэш решений отключён: одинаковые сценарии иначе не решались бы повторно
+		os.environ.setdefault("SOLVE_CACHE_SIZE", "0")
+		from fastapi.testclient import TestClient
+		from theater_sched.api.main import app
+		client = TestClient(app)
+
+	rows = []
+	for name in names:
+		scenario = generate_scenario(**CASES[name])
+		row = {
+			"case": name,
+			"stages": len(scenario.stages),
+			"productions": len(scenario.productions),
+			"timeslots": len(scenario.timeslots),
+			"fixed_assignments": len(scenario.fixed_assignments),
+			"people": len(scenario.people),
+			"roles": len(scenario.roles),
+		}
+
+		builds = []
+		for _ in range(repeat):
+			started = time.perf_counter()
+			model, x, _ = _build_model(scenario)
+			builds.append(time.perf_counter() - started)
+		proto = model.Proto()
+		row.update(variables=len(proto.variables), constraints=len(proto.constraints), build_seconds=round(min(builds), 4))
+
+		cp_solver = cp_model.CpSolver()
+		cp_solver.parameters.max_time_in_seconds = time_limit
+		cp_solver.parameters.num_search_workers = NUM_SEARCH_WORKERS
+		cp_solver.parameters.random_seed = 0
+		status = cp_solver.Solve(model)
+		row.update(
+			solve_seconds=round(cp_solver.WallTime(), 3),
+			status=cp_solver.StatusName(status),
+			objective=cp_solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+			best_bound=cp_solver.BestObjectiveBound(),
+		)
+
+		if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+			schedule = _extract_schedule(scenario, cp_solver, x)
+			assigns = []
+			for _ in range(repeat):
+				started = time.perf_counter()
+				assignments = _assign_people_to_roles(scenario, schedule)
+				assigns.append(time.perf_counter() - started)
+			row.update(shows=len(schedule), assignments=len(assignments), assign_seconds=round(min(assigns), 4))
+
+		if client is not None:
+			row.update(_api_round_trip(client, scenario, time_limit))
+		rows.append(row)
+
+	return {
+		"commit": _git_commit(),
+		"created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+		"python": platform.python_version(),
+		"ortools": ortools.__version__,
+		"num_search_workers": NUM_SEARCH_WORKERS,
+		"time_limit_seconds": time_limit,
+		"cases": rows,
+	}
+
+
+def compare(current: Dict, baseline: Dict) -> List[Dict]:
+	"""Отношение текущих времён к базовым по случаям (< 1 — быстрее)."""
+	base_cases = {row["case"]: row for row in baseline.get("cases", [])}
+	rows = []
+	for row in current["cases"]:
+		base = base_cases.get(row["case"])
+		if base is None:
+			continue
+		ratios = {
+			metric: round(row[metric] / base[metric], 3)
+			for metric in TIMED_METRICS if row.get(metric) and base.get(metric)
+		}
+		rows.append({"case": row["case"], "baseline_commit": baseline.get("commit"), **ratios})
+	return rows
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+	parser.add_argument("--time-limit", type=float, default=10.0)
+	parser.add_argument("--repeat", type=int, default=3)
+	parser.add_argument("--no-api", action="store_true", help="не замерять цикл через API")
+	parser.add_argument("--output", help="записать результаты в JSON-файл")
+	parser.add_argument("--compare", help="JSON-файл прошлого запуска для сравнения")
+	args = parser.parse_args()
+
+	report = run(args.cases, args.time_limit, args.repeat, api=not args.no_api)
+	for row in report["cases"]:
+		print(json.dumps(row, ensure_ascii=False))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(report, f, ensure_ascii=False, indent=2)
+	if args.compare:
+		with open(args.compare, encoding="utf-8") as f:
+			baseline = json.load(f)
+		for row in compare(report, baseline):
+			print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+	main()
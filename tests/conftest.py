@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+"""
+Общие фикстуры тестов: небольшие сценарии и хранилища во временном каталоге.
+
+python -m pytest -q (из корня репозитория)
+"""
+
+import datetime
+from typing import Dict, Sequence
+
+import pytest
+
+from theater_sched.domain.models import Scenario
+from theater_sched.repositories.memory import InMemoryRepository
+from theater_sched.repositories.sqlite import SqliteRepository
+from theater_sched.services.scenarios import ScenarioService
+
+
+def scenario_payload(
+	days: int = 30,
+	stages: Sequence[str] = ("hist", "new"),
+	time_limit: float = 2,
+	num_people: int = 6,
+	**params,
+) -> Dict:
+	"""Аргументы ScenarioService.create_scenario: сезон из days дней, по 3 постановки на сцену."""
+	start = datetime.date(2025, 11, 3)
+	timeslots = []
+	for d in range(days):
+		day = start + datetime.timedelta(days=d)
+		for stage in stages:
+			timeslots.append({
+				"id": f"{stage}_{day}", "stage_id": stage, "date": str(day),
+				"day_of_week": day.weekday(), "start_time": "19:00",
+			})
+	productions = [
+		{"id": f"{stage}_p{i}", "title": f"P{i}", "stage_id": stage, "max_shows": 2 + i, "weekend_priority": i == 0}
+		for stage in stages for i in range(3)
+	]
+	people = [{"id": f"u{i}", "name": f"U{i}"} for i in range(num_people)]
+	roles = [
+		{"id": f"{p['id']}_r{j}", "name": f"R{j}", "production_id": p["id"], "is_conductor": j == 0}
+		for p in productions for j in range(2)
+	]
+	pprs = [
+		{"person_id": person["id"], "production_id": role["production_id"], "role_id": role["id"]}
+		for person in people for role in roles
+	]
+	return {
+		"productions": productions,
+		"stages": [{"id": s, "name": s} for s in stages],
+		"timeslots": timeslots,
+		"params": {"time_limit_seconds": time_limit, **params},
+		"people": people,
+		"roles": roles,
+		"person_production_roles": pprs,
+	}
+
+
+def build_scenario(**kwargs) -> Scenario:
+	"""Сценарий из scenario_payload без фикстур (для тестов решателя)."""
+	return ScenarioService(InMemoryRepository()).create_scenario(**scenario_payload(**kwargs))
+
+
+@pytest.fixture
+def sqlite_path(tmp_path) -> str:
+	return str(tmp_path / "theater_sched.db")
+
+
+@pytest.fixture
+def sqlite_repo(sqlite_path) -> SqliteRepository:
+	return SqliteRepository(sqlite_path)
+
+
+@pytest.fixture
+def client():
+	"""Клиент API с настройками по умолчанию (хранилище в памяти, задачи в потоках процесса)."""
+	from fastapi.testclient import TestClient
+
+	from theater_sched.api.main import app
+
+	return TestClient(app)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repo(request, tmp_path):
+	if request.param == "memory":
+		return InMemoryRepository()
+	return SqliteRepository(str(tmp_path / "theater_sched.db"))
+
+
+@pytest.fixture
+def service(repo) -> ScenarioService:
+	return ScenarioService(repo)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import time
+
+from tests.conftest import scenario_payload
+from tests.test_jobs import LONG_SOLVE
+
+
+def _wait_finished(client, job_id: str, timeout: float = 60.0) -> dict:
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		job = client.get(f"/jobs/{job_id}").json()
+		if job["state"] not in ("queued", "running"):
+			return job
+		time.sleep(0.05)
+	raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_solve_without_wait_returns_job_id_for_polling(client):
+	scenario_id = client.post("/scenarios", json=scenario_payload()).json()["scenario_id"]
+
+	job = client.post(f"/scenarios/{scenario_id}/solve", json={"wait": False}).json()
+	assert job["state"] in ("queued", "running") and job["scenario_id"] == scenario_id
+
+	job = _wait_finished(client, job["job_id"])
+	assert job["state"] == "done" and job["result_status"] in ("optimal", "feasible")
+	assert job["elapsed_seconds"] > 0
+	assert client.get(f"/scenarios/{scenario_id}/status").json()["status"] == "solved"
+
+
+def test_delete_job_stops_running_search(client):
+	scenario_id = client.post("/scenarios", json=scenario_payload(**LONG_SOLVE)).json()["scenario_id"]
+	job_id = client.post(f"/scenarios/{scenario_id}/solve", json={"wait": False}).json()["job_id"]
+	deadline = time.monotonic() + 30
+	while client.get(f"/jobs/{job_id}").json()["state"] == "queued" and time.monotonic() < deadline:
+		time.sleep(0.05)
+
+	assert client.delete(f"/jobs/{job_id}").status_code == 200
+	job = _wait_finished(client, job_id)
+	assert job["state"] == "cancelled"
+	assert job["elapsed_seconds"] < LONG_SOLVE["time_limit"] / 2
+
+
+def test_unknown_job_and_scenario_return_404(client):
+	assert client.get("/jobs/missing").status_code == 404
+	assert client.delete("/jobs/missing").status_code == 404
+	assert client.post("/scenarios/missing/solve", json={"wait": False}).status_code == 404
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import replace
+
+import pytest
+
+from theater_sched.domain.models import ScenarioParams, ScheduleItem
+from theater_sched.services.scenarios import ScenarioService
+from theater_sched.solver import assignment
+from theater_sched.solver.assignment import (
+	AssignmentBudget,
+	assign_cp_sat,
+	assign_greedy,
+	assign_min_cost_flow,
+	assign_people_to_roles,
+	repair_assignments,
+)
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
+from tests.conftest import scenario_payload
+
+
+def _solved(service: ScenarioService, **params):
+	scenario = service.create_scenario(**scenario_payload(**params))
+	result = MinimalCPSATSolver().solve(scenario, num_search_workers=1)
+	assert result.status != "infeasible"
+	return scenario, result
+
+
+def test_solver_passes_granted_workers_and_remaining_time(service, monkeypatch):
+	budgets = []
+
+	def recording_engine(scenario, schedule, budget=None):
+		budgets.append(budget)
+		return []
+
+	monkeypatch.setitem(assignment.ASSIGNMENT_ENGINES, "recording", recording_engine)
+	scenario = service.create_scenario(**scenario_payload(time_limit=5, assignment_engine="recording"))
+
+	result = MinimalCPSATSolver().solve(scenario, num_search_workers=3)
+
+	(budget,) = budgets
+	assert budget.num_search_workers == 3
+	assert 0 <= budget.time_limit_seconds <= 5 - result.stats.solve_seconds
+
+
+def test_cp_sat_engine_without_time_left_falls_back_to_flow(service):
+	scenario, result = _solved(service)
+
+	staffed = assign_cp_sat(scenario, result.schedule, AssignmentBudget(num_search_workers=1, time_limit_seconds=0.0))
+
+	assert staffed == assign_min_cost_flow(scenario, result.schedule)
+
+
+def _assert_valid(scenario, schedule, assignments):
+	"""Никто не занят дважды в один момент, назначены только допущенные, позиции не переполнены."""
+	timeslots = {t.id: t for t in scenario.timeslots}
+	shows = {(item.production_id, item.timeslot_id) for item in schedule}
+	allowed = {(p.person_id, p.role_id) for p in scenario.person_production_roles if p.can_play}
+	required = {r.id: r.required_count for r in scenario.roles}
+	busy = Counter((a.person_id, timeslots[a.timeslot_id].date, timeslots[a.timeslot_id].start_time) for a in assignments)
+	filled = Counter((a.production_id, a.timeslot_id, a.role_id) for a in assignments)
+	assert max(busy.values()) == 1
+	assert all((a.production_id, a.timeslot_id) in shows for a in assignments)
+	assert all((a.person_id, a.role_id) in allowed for a in assignments)
+	assert all(count <= required[role_id] for (_, _, role_id), count in filled.items())
+
+
+@pytest.mark.parametrize("engine", ["flow", "cp_sat"])
+@pytest.mark.parametrize("num_people", [4, 3])
+def test_engines_never_double_book(service, engine, num_people):
+	# Показы двух сцен идут одновременно (19:00), на каждый нужно 2 человека:
+	# при 4 людях заполняется всё, при 3 часть позиций остаётся пустой
+	scenario, result = _solved(service, num_people=num_people, assignment_engine=engine)
+	budget = AssignmentBudget(num_search_workers=1, time_limit_seconds=5.0)
+
+	assignments = assignment.assign_people_to_roles(scenario, result.schedule, budget)
+
+	_assert_valid(scenario, result.schedule, assignments)
+	positions = 2 * len(result.schedule)
+	if num_people == 4:
+		assert len(assignments) == positions
+	else:
+		assert 0 < len(assignments) < positions
+
+
+@pytest.mark.parametrize("engine", ["flow", "cp_sat"])
+def test_engines_respect_can_play(service, engine):
+	payload = scenario_payload(num_people=6, assignment_engine=engine)
+	for ppr in payload["person_production_roles"]:
+		ppr["can_play"] = ppr["person_id"] != "u0"
+	scenario = service.create_scenario(**payload)
+	result = MinimalCPSATSolver().solve(scenario, num_search_workers=1)
+
+	_assert_valid(scenario, result.schedule, result.assignments)
+	assert result.assignments and all(a.person_id != "u0" for a in result.assignments)
+
+
+def test_flow_is_the_default_engine_and_greedy_stays_selectable(service):
+	assert ScenarioParams().assignment_engine == "flow"
+	assert service.create_scenario(**scenario_payload()).params.assignment_engine == "flow"
+	legacy = service.create_scenario(**scenario_payload(assignment_engine="greedy"))
+	assert legacy.params.assignment_engine == "greedy"
+
+
+def test_greedy_engine_keeps_legacy_round_robin(service):
+	scenario = service.create_scenario(**scenario_payload(days=4, stages=("hist",), num_people=3))
+	schedule = [
+		ScheduleItem(scenario.id, "hist_p0", "hist", t.id, 0.0) for t in scenario.timeslots
+	]
+
+	assignments = assign_greedy(scenario, schedule)
+
+	# Роли по очереди, люди по кругу: прежнее распределение до выбора метода
+	by_role = {}
+	for a in assignments:
+		by_role.setdefault(a.role_id, []).append(a.person_id)
+	assert by_role == {
+		"hist_p0_r0": ["u0", "u1", "u2", "u0"],
+		"hist_p0_r1": ["u1", "u2", "u0", "u1"],
+	}
+
+
+def test_unknown_engine_is_rejected(service):
+	scenario = service.create_scenario(**scenario_payload(assignment_engine="magic"))
+	with pytest.raises(ValueError):
+		assign_people_to_roles(scenario, [])
+
+
+def _keys(assignments):
+	return {(a.schedule_item_id, a.role_id, a.person_id) for a in assignments}
+
+
+def test_repair_after_dropped_show_keeps_all_other_assignments(service):
+	scenario, result = _solved(service)
+	dropped = result.schedule[0]
+	schedule = result.schedule[1:]
+
+	repaired, added, removed = repair_assignments(scenario, schedule, result.assignments)
+
+	assert added == []
+	assert {a.schedule_item_id for a in removed} == {dropped.schedule_item_id}
+	assert _keys(repaired) == _keys(a for a in result.assignments if a.schedule_item_id != dropped.schedule_item_id)
+
+
+def test_repair_of_override_reassigns_only_the_conflicting_position(service):
+	# Показы двух сцен идут одновременно: человек, поставленный вручную на
+	# hist, освобождает свою позицию на new в тот же вечер
+	scenario, result = _solved(service)
+	timeslots = {t.id: t for t in scenario.timeslots}
+	target = next(a for a in result.assignments if a.stage_id == "hist")
+	date = timeslots[target.timeslot_id].date
+	clash = next(
+		a for a in result.assignments
+		if a.stage_id == "new" and timeslots[a.timeslot_id].date == date
+	)
+	override = replace(target, person_id=clash.person_id)
+	others = [a for a in result.assignments if a is not target]
+
+	repaired, added, removed = repair_assignments(scenario, result.schedule, others, pinned=[override])
+
+	_assert_valid(scenario, result.schedule, repaired)
+	assert removed == [clash]
+	assert override in added
+	assert {a.schedule_item_id for a in added} <= {target.schedule_item_id, clash.schedule_item_id}
+	untouched = [a for a in others if a is not clash]
+	assert _keys(untouched) <= _keys(repaired)
+
+
+def test_repair_replaces_people_who_lost_eligibility(service):
+	scenario, result = _solved(service)
+	lost = result.assignments[0]
+	ppr = next(
+		p for p in scenario.person_production_roles
+		if (p.person_id, p.role_id) == (lost.person_id, lost.role_id)
+	)
+	ppr.can_play = False
+	scenario.eligibility.refresh(ppr.person_id, ppr.production_id, ppr.role_id)
+
+	repaired, added, removed = repair_assignments(scenario, result.schedule, result.assignments)
+
+	_assert_valid(scenario, result.schedule, repaired)
+	assert all((a.person_id, a.role_id) == (lost.person_id, lost.role_id) for a in removed)
+	assert lost in removed
+	assert len(added) == len(removed)
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from dataclasses import asdict
+
+from benchmarks import suite
+from benchmarks.generator import generate_scenario
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
+
+
+def _shape(scenario):
+	return [asdict(p) for p in scenario.productions], [asdict(t) for t in scenario.timeslots]
+
+
+def test_generator_is_deterministic_and_extras_keep_the_season():
+	base = generate_scenario(3, 12, 90, seed=7)
+
+	assert _shape(generate_scenario(3, 12, 90, seed=7)) == _shape(base)
+	assert _shape(generate_scenario(3, 12, 90, seed=8)) != _shape(base)
+	assert _shape(generate_scenario(3, 12, 90, seed=7, fixed_ratio=0.5, num_people=20)) == _shape(base)
+
+
+def test_generated_shows_fit_the_stage_capacity():
+	scenario = generate_scenario(3, 12, 90, max_shows_range=(4, 6), fill_ratio=0.25)
+	working_days = sum(1 for t in scenario.timeslots if t.stage_id == "stage0" and t.day_of_week != 0)
+
+	shows = Counter()
+	for p in scenario.productions:
+		shows[p.stage_id] += p.max_shows
+	assert all(count <= int(working_days * 0.25) for count in shows.values())
+	assert {p.stage_id for p in scenario.productions} == {"stage0", "stage1", "stage2"}
+
+
+def test_generated_fixed_assignments_are_feasible():
+	scenario = generate_scenario(2, 6, 30, fixed_ratio=1.0)
+	scenario.params.time_limit_seconds = 10
+	assert scenario.fixed_assignments
+
+	result = MinimalCPSATSolver().solve(scenario, num_search_workers=1)
+
+	assert result.status in ("optimal", "feasible")
+	shown = {(it.production_id, it.timeslot_id) for it in result.schedule}
+	assert all((fa.production_id, fa.timeslot_id) in shown for fa in scenario.fixed_assignments)
+
+
+def test_generated_roles_can_be_staffed():
+	scenario = generate_scenario(2, 6, 30, num_people=10, people_per_role=3)
+	eligible = defaultdict(set)
+	for ppr in scenario.person_production_roles:
+		eligible[ppr.role_id].add(ppr.person_id)
+
+	for role in scenario.roles:
+		assert len(eligible[role.id]) >= max(3, role.required_count)
+		assert role.is_conductor == role.id.endswith("_role0")
+
+
+def test_suite_reports_timings_and_compares_runs():
+	report = suite.run(["small"], time_limit=2, repeat=1, api=False)
+	(row,) = report["cases"]
+
+	assert row["case"] == "small"
+	assert {"variables", "constraints", "build_seconds", "solve_seconds", "status"} <= set(row)
+	assert report["time_limit_seconds"] == 2
+
+	baseline = {"commit": "abc", "cases": [{**row, "build_seconds": row["build_seconds"] * 2}]}
+	(ratios,) = suite.compare(report, baseline)
+	assert ratios["baseline_commit"] == "abc"
+	assert ratios["build_seconds"] == 0.5
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from theater_sched.domain.compiled import CompiledScenario
+from theater_sched.domain.models import Production, Scenario, Stage, TimeSlot
+
+
+def _scenario(timeslots, productions=()) -> Scenario:
+	return Scenario(
+		id="s",
+		productions=list(productions),
+		stages=[Stage(id="hist", name="Историческая"), Stage(id="new", name="Новая")],
+		timeslots=timeslots,
+		revenue={},
+	)
+
+
+def test_stage_slots_follow_date_and_time_order():
+	timeslots = [
+		TimeSlot("h3", "hist", "2025-11-04", 1, "12:00"),
+		TimeSlot("n1", "new", "2025-11-03", 0, "19:00"),
+		TimeSlot("h2", "hist", "2025-11-03", 0, "19:00"),
+		TimeSlot("h1", "hist", "2025-11-03", 0, "9:30"),
+		TimeSlot("h4", "hist", "2025-11-04", 1, "19:00"),
+	]
+	compiled = CompiledScenario(_scenario(timeslots))
+
+	ids = lambda slots: [compiled.timeslots[i].id for i in slots]
+	assert ids(compiled.stage_slots[compiled.stage_index["hist"]]) == ["h1", "h2", "h3", "h4"]
+	assert ids(compiled.stage_slots[compiled.stage_index["new"]]) == ["n1"]
+	for stage_slots in compiled.stage_slots:
+		assert compiled.slot_rank[stage_slots].tolist() == list(range(len(stage_slots)))
+	chrono = sorted(range(len(timeslots)), key=lambda i: compiled.chrono_rank[i])
+	assert ids(chrono) == ["h1", "n1", "h2", "h3", "h4"]
+	assert compiled.moment(compiled.timeslot_index["h1"]) == (compiled.slot_day[3], 9 * 60 + 30)
+
+
+def test_unparsed_dates_get_distinct_codes_before_real_days():
+	timeslots = [
+		TimeSlot("a", "hist", "2025-11-03"),
+		TimeSlot("b", "hist", "later"),
+		TimeSlot("c", "hist", "tbd"),
+		TimeSlot("d", "hist", "later"),
+	]
+	compiled = CompiledScenario(_scenario(timeslots))
+
+	days = compiled.slot_day.tolist()
+	assert days[1] == days[3] < 0 and days[2] < 0 and days[1] != days[2]
+	assert days[0] > 0
+	# Равные ключи сохраняют входной порядок
+	assert [compiled.timeslots[i].id for i in compiled.stage_slots[0]] == ["c", "b", "d", "a"]
+
+
+def test_stages_known_only_from_slots_or_productions_are_indexed():
+	compiled = CompiledScenario(_scenario(
+		[TimeSlot("x1", "extra", "2025-11-03")],
+		[Production("p1", "P1", "new"), Production("p2", "P2", "hist"), Production("p3", "P3", "tour")],
+	))
+
+	assert compiled.stage_ids == ["hist", "new", "tour", "extra"]
+	assert compiled.production_stage.tolist() == [1, 0, 2]
+	assert [p.tolist() for p in compiled.stage_productions] == [[1], [0], [2], []]
+
+
+def test_scenario_compiles_once():
+	scenario = _scenario([TimeSlot("h1", "hist", "2025-11-03")])
+	assert scenario.compiled is scenario.compiled
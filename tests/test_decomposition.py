@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import threading
+
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver, _split_by_stage
+from tests.conftest import build_scenario
+
+
+def test_split_by_stage_keeps_each_stage_independent():
+	scenario = build_scenario(stages=("hist", "new", "chamber"))
+	parts = _split_by_stage(scenario)
+
+	assert [[s.id for s in part.stages] for part in parts] == [["hist"], ["new"], ["chamber"]]
+	for part in parts:
+		stage_id = part.stages[0].id
+		assert {p.stage_id for p in part.productions} == {stage_id}
+		assert {t.stage_id for t in part.timeslots} == {stage_id}
+		assert part.people == [] and part.roles == []
+
+
+def test_decomposed_solve_matches_monolithic_objective():
+	monolithic = MinimalCPSATSolver().solve(build_scenario(time_limit=10))
+	decomposed = MinimalCPSATSolver().solve(build_scenario(time_limit=10, decompose_by_stage=True))
+
+	assert monolithic.status == decomposed.status == "optimal"
+	assert decomposed.objective_value == monolithic.objective_value
+	assert decomposed.stats.num_parts == 2
+	# Части объединены в одно расписание, а людей распределяют по нему целиком
+	assert {item.stage_id for item in decomposed.schedule} == {"hist", "new"}
+	assert {a.stage_id for a in decomposed.assignments} == {"hist", "new"}
+
+
+def test_decomposed_parts_report_merged_progress_and_stop_together():
+	events = []
+	result = MinimalCPSATSolver().solve(
+		build_scenario(time_limit=10, decompose_by_stage=True), on_solution=events.append,
+	)
+	assert events and events[-1]["complete"]
+	assert events[-1]["objective_value"] == result.objective_value
+
+	stop_event = threading.Event()
+	stop_event.set()
+	cancelled = MinimalCPSATSolver().solve(
+		build_scenario(days=120, stages=("a", "b", "c"), time_limit=60, decompose_by_stage=True),
+		stop_event=stop_event,
+	)
+	assert cancelled.stats.stop_reason == "cancelled" and cancelled.stats.num_parts == 3
+
+
+def test_single_stage_is_not_split():
+	result = MinimalCPSATSolver().solve(build_scenario(stages=("hist",), decompose_by_stage=True))
+	assert result.status == "optimal" and result.stats.num_parts == 1
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from theater_sched.domain.models import StopParams
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver, _EarlyStop
+from tests.conftest import build_scenario, scenario_payload
+
+# Сценарий, который за секунды не решается до доказанного оптимума
+LONG_SOLVE = dict(days=120, stages=("a", "b", "c"), time_limit=60)
+
+
+class _FakeCpSolver:
+	def __init__(self) -> None:
+		self.stops = 0
+
+	def StopSearch(self) -> None:
+		self.stops += 1
+
+
+def _early_stop(**params):
+	cp_solver = _FakeCpSolver()
+	return _EarlyStop(cp_solver, StopParams(**params)), cp_solver
+
+
+def test_first_feasible_stops_on_the_first_solution():
+	stop, cp_solver = _early_stop(first_feasible=True)
+	stop.on_solution(10.0, 100.0)
+	assert (stop.reason, cp_solver.stops) == ("first_feasible", 1)
+
+
+def test_gap_targets_use_solutions_and_bound_updates():
+	stop, cp_solver = _early_stop(absolute_gap=5)
+	stop.on_bound(100.0)
+	stop.on_solution(90.0, 100.0)
+	assert stop.reason is None
+	stop.on_bound(94.0)
+	assert (stop.reason, cp_solver.stops) == ("gap", 1)
+
+	stop, _ = _early_stop(relative_gap=0.01)
+	stop.on_solution(1000.0, 1020.0)
+	assert stop.reason is None
+	stop.on_solution(1015.0, 1020.0)
+	assert stop.reason == "gap"
+
+
+def test_no_improvement_counts_from_the_last_solution():
+	stop, _ = _early_stop(no_improvement_seconds=0)
+	assert stop.needs_watch
+	assert not stop.should_stop()
+	stop.on_solution(10.0, 100.0)
+	assert stop.should_stop() and stop.reason == "no_improvement"
+	assert not _early_stop(relative_gap=0.1)[0].needs_watch
+
+
+def test_first_feasible_preview_returns_early():
+	scenario = build_scenario(**LONG_SOLVE, stop={"first_feasible": True})
+
+	result = MinimalCPSATSolver().solve(scenario, num_search_workers=1)
+
+	assert result.stats.stop_reason == "first_feasible"
+	assert result.status == "feasible" and result.schedule
+	assert result.stats.total_seconds < 30
+
+
+def test_no_improvement_ends_a_stalled_search():
+	scenario = build_scenario(**LONG_SOLVE, stop={"no_improvement_seconds": 1})
+
+	result = MinimalCPSATSolver().solve(scenario, num_search_workers=1)
+
+	assert result.stats.stop_reason in ("no_improvement", "optimal")
+	assert result.stats.solve_seconds < 30
+
+
+def test_solve_response_reports_the_stop_reason(client):
+	payload = scenario_payload(**LONG_SOLVE, stop={"first_feasible": True})
+	scenario_id = client.post("/scenarios", json=payload).json()["scenario_id"]
+
+	response = client.post(f"/scenarios/{scenario_id}/solve").json()
+
+	assert response["stop_reason"] == "first_feasible"
+	assert response["status"] == "feasible"
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from theater_sched.domain.models import EligibilityIndex, Person, PersonProductionRole, Role
+from tests.conftest import build_scenario, scenario_payload
+
+
+def _view(index: EligibilityIndex, scenario):
+	"""Допуски индекса в сравнимом виде: роль -> люди и человек -> роли."""
+	return (
+		{r.id: sorted(index.eligible_people(r.production_id, r.id)) for r in scenario.roles},
+		{p.id: sorted(index.roles_of_person(p.id)) for p in scenario.people},
+	)
+
+
+def _assert_matches_rebuild(scenario):
+	assert _view(scenario.eligibility, scenario) == _view(EligibilityIndex(scenario), scenario)
+
+
+def test_incremental_updates_match_a_rebuilt_index():
+	scenario = build_scenario(num_people=3)
+	scenario.eligibility
+
+	scenario.add_person(Person(id="u9", name="U9"))
+	scenario.set_person_production_role(PersonProductionRole("u9", "hist_p0", "hist_p0_r0"))
+	scenario.set_person_production_role(PersonProductionRole("u0", "hist_p0", "hist_p0_r1", can_play=False))
+	scenario.add_role(Role(id="hist_p0_r2", name="R2", production_id="hist_p0"))
+	scenario.set_person_production_role(PersonProductionRole("u1", "hist_p0", "hist_p0_r2"))
+	scenario.remove_person("u2")
+	scenario.remove_role("new_p0_r1")
+	scenario.remove_person_production_roles([("u1", "hist_p1", "hist_p1_r0")])
+	_assert_matches_rebuild(scenario)
+
+	assert scenario.eligibility.eligible_people("hist_p0", "hist_p0_r0") == ["u0", "u1", "u9"]
+	assert "u0" not in scenario.eligibility.eligible_people("hist_p0", "hist_p0_r1")
+	assert scenario.eligibility.eligible_people("hist_p0", "hist_p0_r2") == ["u1"]
+	assert not any(ppr.person_id == "u2" for ppr in scenario.person_production_roles)
+	assert not any(ppr.role_id == "new_p0_r1" for ppr in scenario.person_production_roles)
+
+
+def test_upsert_updates_the_existing_link_in_place():
+	scenario = build_scenario(num_people=2)
+	count = len(scenario.person_production_roles)
+
+	scenario.set_person_production_role(PersonProductionRole("u0", "hist_p0", "hist_p0_r0", can_play=False))
+	assert len(scenario.person_production_roles) == count
+	assert not scenario.eligibility.can_play("u0", "hist_p0", "hist_p0_r0")
+
+	scenario.set_person_production_role(PersonProductionRole("u0", "hist_p0", "hist_p0_r0", can_play=True))
+	assert len(scenario.person_production_roles) == count
+	assert sorted(scenario.eligibility.eligible_people("hist_p0", "hist_p0_r0")) == ["u0", "u1"]
+
+
+def test_eligibility_endpoints_follow_upserts(client):
+	scenario_id = client.post("/scenarios", json=scenario_payload(num_people=2)).json()["scenario_id"]
+	link = {"person_id": "u1", "production_id": "hist_p0", "role_id": "hist_p0_r0", "can_play": False}
+
+	assert client.post(f"/scenarios/{scenario_id}/person-production-roles", json=link).status_code == 200
+
+	eligible = client.get(f"/scenarios/{scenario_id}/roles/hist_p0_r0/eligible-people").json()
+	assert eligible["person_ids"] == ["u0"]
+	roles = client.get(f"/scenarios/{scenario_id}/people/u1/roles").json()["roles"]
+	assert {"production_id": "hist_p0", "role_id": "hist_p0_r0"} not in roles
+	assert {"production_id": "hist_p0", "role_id": "hist_p0_r1"} in roles
+	assert client.get(f"/scenarios/{scenario_id}/roles/missing/eligible-people").status_code == 404
+	assert client.post(
+		f"/scenarios/{scenario_id}/person-production-roles", json={**link, "person_id": "nobody"},
+	).status_code == 400
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import gzip
+import json
+
+from theater_sched.services import encoding
+from theater_sched.services.encoding import EncodedJSON, choose_encoding, dumps
+from tests.conftest import scenario_payload
+
+
+def test_dumps_is_compact_utf8():
+	body = dumps({"name": "Лебединое озеро", "shows": [1, 2]})
+	assert body == '{"name":"Лебединое озеро","shows":[1,2]}'.encode("utf-8")
+
+
+def test_choose_encoding_follows_accept_encoding(monkeypatch):
+	big = encoding.MIN_COMPRESS_BYTES
+	assert choose_encoding("gzip", big - 1) is None
+	assert choose_encoding(None, big) is None
+	assert choose_encoding("gzip, deflate", big) == "gzip"
+	assert choose_encoding("gzip;q=0, deflate", big) is None
+	assert choose_encoding("*", big) == "gzip"
+	assert choose_encoding("identity", big) is None
+
+	monkeypatch.setattr(encoding, "SUPPORTED_ENCODINGS", ("br", "gzip"))
+	assert choose_encoding("gzip, br", big) == "br"
+	assert choose_encoding("gzip;q=1.0, br;q=0.5", big) == "gzip"
+
+
+def test_compressed_body_is_built_once():
+	body = EncodedJSON.of({"rows": list(range(1000))}, '"rev"')
+
+	packed = body.encoded("gzip")
+	assert body.encoded("gzip") is packed
+	assert gzip.decompress(packed) == body.body
+	assert body.encoded(None) is body.body
+
+
+def test_schedule_is_served_gzipped_and_encoded_once_per_revision(client):
+	from theater_sched.api import main
+
+	scenario_id = client.post("/scenarios", json=scenario_payload()).json()["scenario_id"]
+	client.post(f"/scenarios/{scenario_id}/solve")
+
+	plain = client.get(f"/scenarios/{scenario_id}/schedule", headers={"Accept-Encoding": "identity"})
+	packed = client.get(f"/scenarios/{scenario_id}/schedule", headers={"Accept-Encoding": "gzip"})
+
+	assert "Content-Encoding" not in plain.headers
+	assert packed.headers["Content-Encoding"] == "gzip"
+	assert packed.json() == plain.json() == json.loads(main.svc.get_schedule_body(scenario_id).body)
+	assert main.svc.get_schedule_body(scenario_id) is main.svc.get_schedule_body(scenario_id)
+	assert client.get(
+		f"/scenarios/{scenario_id}/schedule", headers={"If-None-Match": plain.headers["ETag"]},
+	).status_code == 304
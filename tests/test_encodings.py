@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from ortools.sat.python import cp_model
+
+from benchmarks.generator import generate_scenario
+from theater_sched.solver.cp_sat_solver import _build_model
+from tests.conftest import build_scenario
+
+
+def _optimum(model: cp_model.CpModel) -> float:
+	cp_solver = cp_model.CpSolver()
+	cp_solver.parameters.max_time_in_seconds = 20
+	cp_solver.parameters.num_search_workers = 1
+	assert cp_solver.Solve(model) == cp_model.OPTIMAL
+	return cp_solver.ObjectiveValue()
+
+
+def _build(scenario, **encodings):
+	for name, value in encodings.items():
+		setattr(scenario.params.constraints, name, value)
+	return _build_model(scenario)
+
+
+def test_compact_break_encoding_has_the_pairwise_optimum():
+	optima = {
+		encoding: _optimum(_build(build_scenario(), break_encoding=encoding)[0])
+		for encoding in ("pairwise", "compact")
+	}
+	assert optima["compact"] == optima["pairwise"]
+
+
+def test_compact_break_encoding_is_smaller():
+	scenario = generate_scenario(3, 12, 90)
+	pairwise = _build(scenario, break_encoding="pairwise")[2].families["break_between_different_shows"]
+	compact = _build(scenario, break_encoding="compact")[2].families["break_between_different_shows"]
+
+	assert compact["variables"] < pairwise["variables"]
+	assert compact["constraints"] < pairwise["constraints"]
+
+
+def test_start_index_encoding_has_the_windows_optimum():
+	optima = {
+		encoding: _optimum(_build(build_scenario(days=14), consecutive_encoding=encoding)[0])
+		for encoding in ("windows", "start_index")
+	}
+	assert optima["start_index"] == optima["windows"]
+
+
+def test_start_index_encoding_keeps_runs_consecutive():
+	model, x, _ = _build(build_scenario(days=14), consecutive_encoding="start_index")
+	cp_solver = cp_model.CpSolver()
+	cp_solver.parameters.num_search_workers = 1
+	assert cp_solver.Solve(model) == cp_model.OPTIMAL
+
+	days_by_production = {}
+	for (p_id, t_id), var in sorted(x.items(), key=lambda kv: kv[0][1]):
+		days_by_production.setdefault(p_id, []).append(cp_solver.Value(var))
+	for p_id, shown in days_by_production.items():
+		first = shown.index(1)
+		run = shown[first:first + sum(shown)]
+		assert run == [1] * sum(shown), p_id
+
+
+def test_start_index_encoding_is_smaller_for_long_runs():
+	scenario = generate_scenario(2, 6, 365, max_shows_range=(10, 20))
+	windows = _build(scenario, consecutive_encoding="windows")[2].families["consecutive_shows"]
+	start_index = _build(scenario, consecutive_encoding="start_index")[2].families["consecutive_shows"]
+
+	assert start_index["variables"] < windows["variables"]
+	assert start_index["constraints"] < windows["constraints"]
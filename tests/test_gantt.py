@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from theater_sched.services.gantt import show_interval
+from theater_sched.services.revision_cache import RevisionCache
+from tests.conftest import build_scenario, scenario_payload
+
+
+class _Result:
+	def __init__(self, revision: str) -> None:
+		self.revision = revision
+
+
+def test_show_interval_is_moscow_time_with_fixed_duration():
+	assert show_interval("2025-11-03", "19:00") == ("2025-11-03T19:00:00+03:00", "2025-11-03T22:00:00+03:00")
+	assert show_interval("2025-11-03", None) == show_interval("2025-11-03", "19:00")
+	assert show_interval("not a date", "19:00") is None
+
+
+def test_revision_cache_is_invalidated_by_a_new_revision():
+	builds = []
+	cache = RevisionCache(lambda scenario, result: builds.append(result.revision) or result.revision, max_entries=1)
+	scenario = build_scenario(days=1)
+
+	assert cache.get(scenario.id, "r1") is None
+	assert cache.build(scenario, _Result("r1")) == "r1"
+	assert cache.get(scenario.id, "r1") == "r1"
+	assert cache.get(scenario.id, "r2") is None
+
+	other = build_scenario(days=1)
+	cache.build(other, _Result("r1"))
+	assert cache.get(scenario.id, "r1") is None
+	assert builds == ["r1", "r1"]
+
+
+def test_gantt_etag_and_not_modified(client):
+	scenario_id = client.post("/scenarios", json=scenario_payload()).json()["scenario_id"]
+	assert client.get(f"/scenarios/{scenario_id}/gantt").status_code == 404
+	client.post(f"/scenarios/{scenario_id}/solve")
+
+	response = client.get(f"/scenarios/{scenario_id}/gantt")
+	etag = response.headers["ETag"]
+	tasks = response.json()["tasks"]
+	schedule = client.get(f"/scenarios/{scenario_id}/schedule").json()["schedule"]
+	assert len(tasks) == len(schedule) > 0
+	assert {t["resource"] for t in tasks} == {"hist", "new"}
+
+	again = client.get(f"/scenarios/{scenario_id}/gantt", headers={"If-None-Match": etag})
+	assert again.status_code == 304 and again.content == b""
+
+	# Правка результата меняет ревизию: старый ETag больше не подходит
+	a = client.get(f"/scenarios/{scenario_id}/assignments").json()["assignments"][0]
+	client.put(f"/scenarios/{scenario_id}/assignments", json={
+		"schedule_item_id": a["schedule_item_id"], "role_id": a["role_id"], "person_id": "u5",
+	})
+	changed = client.get(f"/scenarios/{scenario_id}/gantt", headers={"If-None-Match": etag})
+	assert changed.status_code == 200
+	assert changed.headers["ETag"] != etag
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from theater_sched.services.jobs import SolveJobManager
+from theater_sched.solver.cores import CoreAllocator
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
+from tests.conftest import scenario_payload
+
+# Сценарий, который за лимит времени не решается до оптимума: задача успевает побыть running
+LONG_SOLVE = dict(days=120, stages=("a", "b", "c"), time_limit=60)
+
+
+def _wait_for_state(jobs, job_id: str, states, timeout: float = 30.0):
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		job = jobs.get(job_id)
+		if job.state in states:
+			return job
+		time.sleep(0.05)
+	raise AssertionError(f"job {job_id} stayed {jobs.get(job_id).state}")
+
+
+class _WaitForCancel(MinimalCPSATSolver):
+	"""Решатель, который начинает поиск только после отмены: решение заведомо не найдено."""
+	def solve(self, scenario, stop_event=None, **kwargs):
+		stop_event.wait(30)
+		return super().solve(scenario, stop_event=stop_event, **kwargs)
+
+
+@pytest.fixture
+def jobs(service):
+	return SolveJobManager(service, max_concurrency=1, cores=CoreAllocator(2))
+
+
+def test_cancel_running_job_stops_search_and_keeps_best_schedule(service, jobs):
+	scenario = service.create_scenario(**scenario_payload(**LONG_SOLVE))
+	job = jobs.submit(scenario.id)
+	_wait_for_state(jobs, job.id, ("running",))
+	time.sleep(1.0)
+
+	jobs.cancel(job.id)
+	result = jobs.future(job.id).result(timeout=30)
+
+	job = jobs.get(job.id)
+	assert job.state == "cancelled"
+	assert job.finished_at - job.started_at < LONG_SOLVE["time_limit"] / 2
+	assert result.stats.stop_reason == "cancelled"
+
+
+def test_cancel_before_first_solution_keeps_previous_result(service, repo, jobs):
+	# На маленьком сценарии CP-SAT находит решение быстрее, чем замечает отмену
+	scenario = service.create_scenario(**scenario_payload(**dict(LONG_SOLVE, time_limit=3)))
+	solved = service.solve(scenario.id)
+	service._solver = _WaitForCancel()
+
+	job = jobs.submit(scenario.id)
+	_wait_for_state(jobs, job.id, ("running",))
+	jobs.cancel(job.id)
+	result = jobs.future(job.id).result(timeout=30)
+
+	job = jobs.get(job.id)
+	assert (job.state, job.result_status, job.objective_value) == ("cancelled", "cancelled", None)
+	assert result.status == "cancelled"
+	stored = repo.get_result(scenario.id)
+	assert (stored.revision, stored.objective_value) == (solved.revision, solved.objective_value)
+	assert repo.get_scenario(scenario.id).status == "solved"
+
+
+def test_cancel_before_first_solve_leaves_scenario_unsolved(service, repo):
+	scenario = service.create_scenario(**scenario_payload(**LONG_SOLVE))
+	stop_event = threading.Event()
+	stop_event.set()
+
+	assert service.solve(scenario.id, stop_event=stop_event).status == "cancelled"
+	assert repo.get_result(scenario.id) is None
+	assert repo.get_scenario(scenario.id).status == "created"
+
+
+def test_cancel_queued_job_never_runs(service, jobs):
+	long_scenario = service.create_scenario(**scenario_payload(**LONG_SOLVE))
+	running = jobs.submit(long_scenario.id)
+	queued = jobs.submit(service.create_scenario(**scenario_payload()).id)
+
+	assert jobs.cancel(queued.id).state == "cancelled"
+	assert jobs.future(queued.id).cancelled()
+	assert jobs.get(queued.id).started_at is None
+	jobs.cancel(running.id)
+	jobs.future(running.id).result(timeout=30)
+
+
+def test_concurrency_limit_queues_extra_jobs(service, jobs):
+	first = jobs.submit(service.create_scenario(**scenario_payload(**LONG_SOLVE)).id)
+	second = jobs.submit(service.create_scenario(**scenario_payload(**LONG_SOLVE)).id)
+	_wait_for_state(jobs, first.id, ("running",))
+
+	# max_concurrency=1: вторая задача ждёт, пока первая не освободит пул
+	assert jobs.get(second.id).state == "queued"
+	jobs.cancel(first.id)
+	_wait_for_state(jobs, second.id, ("running",))
+	jobs.cancel(second.id)
+	jobs.future(second.id).result(timeout=30)
+	assert jobs.get(first.id).state == "cancelled"
+
+
+def test_unknown_job_and_scenario(jobs):
+	with pytest.raises(ValueError):
+		jobs.cancel("missing")
+	with pytest.raises(ValueError):
+		jobs.submit("missing")
+
+
+def test_core_allocator_splits_cores_between_running_solves():
+	cores = CoreAllocator(4)
+
+	with cores.allocate(demand=2) as first:
+		with cores.allocate() as second:
+			assert (first, second) == (2, 2)
+			with cores.allocate() as third:
+				assert third == 1  # свободных ядер нет, но решение получает хотя бы один поток
+				assert cores.stats() == {"total_cores": 4, "in_use": 5, "running": 3}
+	assert cores.stats() == {"total_cores": 4, "in_use": 0, "running": 0}
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import pickle
+import threading
+
+from theater_sched.domain.models import Person
+from theater_sched.repositories.memory import REMEASURE_AFTER_RESAVES, InMemoryRepository
+from theater_sched.services.scenarios import ScenarioService
+from tests.conftest import scenario_payload
+
+
+def _add_people(repo: InMemoryRepository, scenario_id: str, edits: int, per_edit: int = 1) -> None:
+	for i in range(edits):
+		stored = repo.get_scenario(scenario_id)
+		for j in range(per_edit):
+			stored.add_person(Person(id=f"extra{i}_{j}", name=f"Extra {i} {j}"))
+		repo.save_scenario(stored)
+
+
+def test_in_place_edits_are_not_reserialized():
+	repo = InMemoryRepository(max_bytes=10_000_000)
+	scenario = ScenarioService(repo).create_scenario(**scenario_payload())
+	scenario.compiled  # производные кэши сценария тоже не сериализуются при каждой правке
+	measured = repo.stats()["size_measurements"]
+
+	_add_people(repo, scenario.id, REMEASURE_AFTER_RESAVES - 1)
+
+	assert repo.stats()["size_measurements"] == measured
+
+
+def test_size_is_remeasured_after_many_edits():
+	repo = InMemoryRepository(max_bytes=10_000_000)
+	scenario = ScenarioService(repo).create_scenario(**scenario_payload(num_people=0))
+	size = repo.stats()["estimated_bytes"]
+
+	_add_people(repo, scenario.id, REMEASURE_AFTER_RESAVES, per_edit=10)
+
+	assert repo.stats()["estimated_bytes"] > size
+
+
+def test_stale_sizes_are_remeasured_before_eviction():
+	repo = InMemoryRepository(max_bytes=10_000_000)
+	service = ScenarioService(repo)
+	first = service.create_scenario(**scenario_payload(num_people=0))
+	size = repo.stats()["estimated_bytes"]
+	_add_people(repo, first.id, 10, per_edit=200)
+	assert repo.stats()["estimated_bytes"] == size  # оценка пока прежняя
+	repo._max_bytes = int(size * 2.5)  # два исходных сценария помещаются, выросший с новым — нет
+
+	second = service.create_scenario(**scenario_payload(num_people=0))
+
+	stats = repo.stats()
+	assert stats["evictions"] == 1
+	assert repo.get_scenario(first.id) is None and repo.get_scenario(second.id) is not None
+	assert stats["estimated_bytes"] <= repo._max_bytes
+
+
+def test_evicted_entries_are_spilled_outside_the_lock(tmp_path, monkeypatch):
+	repo = InMemoryRepository(max_entries=1, spill_dir=str(tmp_path))
+	service = ScenarioService(repo)
+	first = service.create_scenario(**scenario_payload(num_people=2))
+	lock_free_during_dump = []
+	real_dump = pickle.dump
+
+	def dump(*args, **kwargs):
+		# Другой поток должен получить lock, пока вытесненный сценарий пишется на диск
+		def probe():
+			acquired = repo._lock.acquire(timeout=1)
+			lock_free_during_dump.append(acquired)
+			if acquired:
+				repo._lock.release()
+
+		thread = threading.Thread(target=probe)
+		thread.start()
+		thread.join()
+		real_dump(*args, **kwargs)
+
+	monkeypatch.setattr(pickle, "dump", dump)
+	second = service.create_scenario(**scenario_payload(num_people=3))
+	monkeypatch.setattr(pickle, "dump", real_dump)
+
+	assert lock_free_during_dump == [True]
+	assert [name for name in os.listdir(tmp_path) if name.endswith(".pkl")] == [f"scenario-{first.id}.pkl"]
+	assert [p.id for p in repo.get_scenario(first.id).people] == ["u0", "u1"]
+	stats = repo.stats()
+	assert (stats["spilled"], stats["spill_hits"]) == (2, 1)  # чтение first вытеснило second
+	assert len(repo.get_scenario(second.id).people) == 3
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from theater_sched.services.metrics import MetricsRegistry
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
+from tests.conftest import build_scenario, scenario_payload
+
+
+def test_solver_records_phase_timings_and_model_sizes():
+	result = MinimalCPSATSolver().solve(build_scenario(time_limit=10), num_search_workers=1)
+	stats = result.stats
+
+	assert (stats.solver_status, stats.stop_reason) == ("OPTIMAL", "optimal")
+	assert stats.gap == 0.0
+	assert stats.objective_value == stats.best_objective_bound == result.objective_value
+	assert (stats.num_search_workers, stats.time_limit_seconds) == (1, 10)
+	assert stats.num_variables == sum(f["variables"] for f in stats.families.values())
+	assert stats.num_constraints == sum(f["constraints"] for f in stats.families.values())
+	assert {"x", "consecutive_shows", "break_between_different_shows"} <= set(stats.families)
+	assert stats.build_seconds > 0 and stats.solve_seconds > 0 and stats.assign_seconds > 0
+	assert stats.total_seconds >= stats.build_seconds + stats.assign_seconds
+
+
+def test_histogram_renders_cumulative_buckets():
+	registry = MetricsRegistry()
+	histogram = registry.histogram("h_seconds", "Help.", (0.1, 1.0), ("phase",))
+	counter = registry.counter("c_total", "Help.", ("reason",))
+	for value in (0.05, 0.5, 5.0):
+		histogram.observe(value, phase="solve")
+	counter.inc(reason='say "hi"')
+
+	lines = registry.render().splitlines()
+
+	assert lines[:2] == ["# HELP h_seconds Help.", "# TYPE h_seconds histogram"]
+	assert 'h_seconds_bucket{phase="solve",le="0.1"} 1' in lines
+	assert 'h_seconds_bucket{phase="solve",le="1.0"} 2' in lines
+	assert 'h_seconds_bucket{phase="solve",le="+Inf"} 3' in lines
+	assert 'h_seconds_sum{phase="solve"} 5.55' in lines
+	assert 'h_seconds_count{phase="solve"} 3' in lines
+	assert 'c_total{reason="say \\"hi\\""} 1.0' in lines
+
+
+def test_solve_stats_and_metrics_endpoints(client):
+	scenario_id = client.post("/scenarios", json=scenario_payload()).json()["scenario_id"]
+	assert client.get(f"/scenarios/{scenario_id}/solve-stats").status_code == 404
+	client.post(f"/scenarios/{scenario_id}/solve")
+
+	stats = client.get(f"/scenarios/{scenario_id}/solve-stats").json()
+	assert stats["scenario_id"] == scenario_id
+	assert {"build_seconds", "solve_seconds", "families", "num_branches", "gap", "stop_reason"} <= set(stats)
+
+	response = client.get("/metrics")
+	assert response.headers["content-type"].startswith("text/plain")
+	assert "# TYPE theater_solve_phase_seconds histogram" in response.text
+	assert 'theater_solve_phase_seconds_count{phase="total"}' in response.text
+	assert "theater_solves_total{" in response.text
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from ortools.sat.python import cp_model
+
+from benchmarks.generator import generate_scenario
+from benchmarks.legacy_model import build_legacy_model
+from theater_sched.solver.cp_sat_solver import _build_model
+from tests.conftest import build_scenario
+
+
+def _optimum(model: cp_model.CpModel) -> float:
+	cp_solver = cp_model.CpSolver()
+	cp_solver.parameters.max_time_in_seconds = 20
+	cp_solver.parameters.num_search_workers = 1
+	assert cp_solver.Solve(model) == cp_model.OPTIMAL
+	return cp_solver.ObjectiveValue()
+
+
+def test_indexed_builder_creates_the_legacy_variables():
+	scenario = generate_scenario(3, 12, 90)
+	_, x, _ = _build_model(scenario)
+	_, legacy_x = build_legacy_model(scenario)
+
+	assert x.keys() == legacy_x.keys()
+
+
+def test_indexed_builder_has_the_legacy_optimum():
+	scenario = build_scenario()
+	model, _, _ = _build_model(scenario)
+	legacy_model, _ = build_legacy_model(scenario)
+
+	assert _optimum(model) == _optimum(legacy_model)
+
+
+def test_model_sizes_by_family_add_up_to_the_model():
+	model, x, index = _build_model(generate_scenario(3, 12, 90))
+	proto = model.Proto()
+
+	assert index.families["x"]["variables"] == len(x)
+	assert sum(f["variables"] for f in index.families.values()) == len(proto.variables)
+	assert sum(f["constraints"] for f in index.families.values()) == len(proto.constraints)
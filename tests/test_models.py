@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import dataclasses
+import pickle
+
+import pytest
+
+from benchmarks import memory
+from theater_sched.domain.models import Assignment, ScheduleItem, TimeSlot
+
+
+def _fresh(value: str) -> str:
+	"""Новый объект str с тем же значением (как после разбора JSON)."""
+	return "".join(list(value))
+
+
+def test_rows_are_slotted_and_immutable_where_expected():
+	slot = TimeSlot("t1", "hist", "2025-11-03")
+	item = ScheduleItem("s", "p", "hist", "t1", 1.0)
+	a = Assignment("s", "p", "t1", "hist", "u0", "r0")
+
+	for row in (slot, item, a):
+		assert not hasattr(row, "__dict__")
+	with pytest.raises(dataclasses.FrozenInstanceError):
+		slot.date = "2025-11-04"
+	with pytest.raises(dataclasses.FrozenInstanceError):
+		item.timeslot_id = "t2"
+	# Ручная правка меняет человека на месте
+	a.person_id = "u1"
+	assert a.person_id == "u1"
+
+
+def test_ids_are_interned():
+	first = Assignment(_fresh("scenario"), _fresh("prod"), _fresh("slot"), _fresh("hist"), _fresh("u0"), _fresh("r0"))
+	second = Assignment(_fresh("scenario"), _fresh("prod"), _fresh("slot"), _fresh("hist"), _fresh("u0"), _fresh("r0"))
+	for name in ("scenario_id", "production_id", "timeslot_id", "stage_id", "person_id", "role_id"):
+		assert getattr(first, name) is getattr(second, name)
+
+	items = [ScheduleItem(_fresh("s"), _fresh("p"), _fresh("hist"), _fresh("t1"), 0.0) for _ in range(2)]
+	assert items[0].timeslot_id is items[1].timeslot_id
+	slots = [TimeSlot(_fresh("t1"), _fresh("hist"), _fresh("2025-11-03")) for _ in range(2)]
+	assert slots[0].date is slots[1].date
+
+
+def test_schedule_item_id_is_derived_from_fields():
+	item = ScheduleItem("s", "p", "hist", "t1", 0.0)
+	a = Assignment("s", "p", "t1", "hist", "u0", "r0")
+
+	assert item.schedule_item_id == a.schedule_item_id == "p|hist|t1"
+	assert "schedule_item_id" not in {f.name for f in dataclasses.fields(Assignment)}
+	assert dataclasses.replace(a, timeslot_id="t2").schedule_item_id == "p|hist|t2"
+
+
+def test_rows_survive_pickling_for_process_pools():
+	rows = [
+		TimeSlot("t1", "hist", "2025-11-03", 0, "19:00"),
+		ScheduleItem("s", "p", "hist", "t1", 1.0),
+		Assignment("s", "p", "t1", "hist", "u0", "r0", True),
+	]
+	assert pickle.loads(pickle.dumps(rows)) == rows
+
+
+def test_slotted_rows_use_less_memory_than_plain_dataclasses():
+	measured = {row["case"]: row["bytes_per_object"] for row in memory.run(2000)}
+	assert measured["assignments"] < measured["assignments_plain"]
+	assert measured["schedule"] < measured["schedule_plain"]
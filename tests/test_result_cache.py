@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from theater_sched.domain.models import ScenarioResult, ScheduleItem, SolveStats
+from theater_sched.repositories.memory import InMemoryRepository
+from theater_sched.services.result_cache import SolveResultCache, scenario_fingerprint
+from theater_sched.services.scenarios import ScenarioService
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
+from tests.conftest import build_scenario, scenario_payload
+
+
+def _result(scenario_id: str = "s1") -> ScenarioResult:
+	return ScenarioResult(
+		scenario_id=scenario_id,
+		schedule=[ScheduleItem(scenario_id, "p", "st", "t1", 10.0)],
+		objective_value=10.0,
+		status="optimal",
+		stats=SolveStats(solver_status="OPTIMAL", families={"x": {"variables": 1, "constraints": 2}}),
+	)
+
+
+def test_cached_copies_do_not_share_stats():
+	cache = SolveResultCache()
+	original = _result()
+	cache.put("fp", original, 5)
+
+	first = cache.get("fp", "s2", 5)
+	first.stats.solver_status = "EDITED"
+	first.stats.families["x"]["variables"] = 99
+	first.stats.pinned_stages.append("st")
+	original.stats.num_branches = 7
+
+	second = cache.get("fp", "s3", 5)
+	assert second.stats is not first.stats
+	assert (second.stats.solver_status, second.stats.num_branches) == ("OPTIMAL", 0)
+	assert second.stats.families == {"x": {"variables": 1, "constraints": 2}}
+	assert second.stats.pinned_stages == []
+
+
+class _CountingSolver(MinimalCPSATSolver):
+	def __init__(self) -> None:
+		self.calls = 0
+
+	def solve(self, scenario, **kwargs):
+		self.calls += 1
+		return super().solve(scenario, **kwargs)
+
+
+def test_fingerprint_ignores_list_order_and_scenario_id():
+	payload = scenario_payload()
+	shuffled = {key: list(reversed(value)) if isinstance(value, list) else value for key, value in payload.items()}
+
+	assert scenario_fingerprint(build_scenario()) == scenario_fingerprint(
+		ScenarioService(InMemoryRepository()).create_scenario(**shuffled)
+	)
+
+
+def test_fingerprint_changes_with_content():
+	scenario = build_scenario()
+	before = scenario_fingerprint(scenario)
+	scenario.productions[0].max_shows += 1
+	assert scenario_fingerprint(scenario) != before
+	scenario.productions[0].max_shows -= 1
+	scenario.params.constraints.monday_off = False
+	assert scenario_fingerprint(scenario) != before
+
+
+def test_identical_scenario_is_served_from_cache(repo):
+	solver = _CountingSolver()
+	service = ScenarioService(repo, SolveResultCache())
+	service._solver = solver
+	first = service.create_scenario(**scenario_payload())
+	second = service.create_scenario(**scenario_payload())
+
+	solved = service.solve(first.id)
+	cached = service.solve(second.id)
+
+	assert solver.calls == 1
+	assert not solved.from_cache and cached.from_cache
+	assert cached.scenario_id == second.id
+	assert cached.objective_value == solved.objective_value
+	assert repo.get_result(second.id).from_cache
+	assert repo.get_scenario(second.id).status == "solved"
+
+
+def test_feasible_result_is_not_reused_for_a_longer_time_limit():
+	cache = SolveResultCache()
+	feasible = _result()
+	feasible.status = "feasible"
+	cache.put("fp", feasible, 5)
+
+	assert cache.get("fp", "s2", 5) is not None
+	assert cache.get("fp", "s2", 10) is None
+	assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_solve_response_reports_cache_hit_or_miss(client):
+	# Сценарий, который не решают другие тесты: кэш приложения общий на весь прогон
+	ids = [client.post("/scenarios", json=scenario_payload(days=11, num_people=4)).json()["scenario_id"] for _ in range(2)]
+
+	responses = [client.post(f"/scenarios/{scenario_id}/solve").json() for scenario_id in ids]
+
+	assert [r["cache"] for r in responses] == ["miss", "hit"]
+	assert responses[0]["objective_value"] == responses[1]["objective_value"]
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import pytest
+
+from theater_sched.services.result_query import QueryError, ResultIndex, ResultQuery
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
+from tests.conftest import build_scenario, scenario_payload
+
+
+@pytest.fixture(scope="module")
+def solved():
+	scenario = build_scenario()
+	result = MinimalCPSATSolver().solve(scenario, num_search_workers=1)
+	assert result.schedule and result.assignments
+	return scenario, result
+
+
+def _pages(query_page, query: ResultQuery, key: str):
+	"""Пройти все страницы по next_cursor и склеить строки."""
+	rows = []
+	while True:
+		page = query_page(query)
+		rows += page[key]
+		if page["next_cursor"] is None:
+			return rows
+		query.cursor = page["next_cursor"]
+
+
+def test_filtered_pages_add_up_to_the_filtered_schedule(solved):
+	scenario, result = solved
+	dates = {t.id: t.date for t in scenario.timeslots}
+	index = ResultIndex(scenario, result)
+
+	query = ResultQuery(date_from="2025-11-10", date_to="2025-11-16", stage_id="hist", limit=2)
+	rows = _pages(lambda q: index.query_schedule(q, include_assignments=False), query, "schedule")
+
+	expected = sorted(
+		(dates[it.timeslot_id], it.production_id) for it in result.schedule
+		if it.stage_id == "hist" and "2025-11-10" <= dates[it.timeslot_id] <= "2025-11-16"
+	)
+	assert [(dates[r["timeslot_id"]], r["production_id"]) for r in rows] == expected
+
+
+def test_person_filter_and_projection(solved):
+	scenario, result = solved
+	index = ResultIndex(scenario, result)
+
+	page = index.query_assignments(ResultQuery(person_id="u0", fields=["timeslot_id", "role_id", "date"]))
+
+	mine = [a for a in result.assignments if a.person_id == "u0"]
+	assert len(page["assignments"]) == len(mine)
+	assert all(set(row) == {"timeslot_id", "role_id", "date"} for row in page["assignments"])
+	dates = [row["date"] for row in page["assignments"]]
+	assert dates == sorted(dates)
+
+	shows = index.query_schedule(ResultQuery(person_id="u0"))
+	assert {r["timeslot_id"] for r in shows["schedule"]} == {a.timeslot_id for a in mine}
+	assert {a["person_id"] for a in shows["assignments"]} == {"u0"}
+
+
+def test_bad_fields_dates_and_stale_cursors_are_rejected(solved):
+	scenario, result = solved
+	index = ResultIndex(scenario, result)
+
+	with pytest.raises(QueryError):
+		index.query_assignments(ResultQuery(fields=["salary"]))
+	with pytest.raises(QueryError):
+		index.query_schedule(ResultQuery(date_from="03.11.2025"))
+	cursor = index.query_schedule(ResultQuery(limit=1))["next_cursor"]
+	result.touch()
+	with pytest.raises(QueryError):
+		ResultIndex(scenario, result).query_schedule(ResultQuery(cursor=cursor))
+
+
+def test_assignments_endpoint_pages_by_cursor(client):
+	scenario_id = client.post("/scenarios", json=scenario_payload()).json()["scenario_id"]
+	client.post(f"/scenarios/{scenario_id}/solve")
+	everything = client.get(f"/scenarios/{scenario_id}/assignments").json()["assignments"]
+
+	first = client.get(f"/scenarios/{scenario_id}/assignments", params={"person_id": "u1", "limit": 3}).json()
+	second = client.get(
+		f"/scenarios/{scenario_id}/assignments",
+		params={"person_id": "u1", "limit": 3, "cursor": first["next_cursor"]},
+	).json()
+
+	mine = [a for a in everything if a["person_id"] == "u1"]
+	assert len(first["assignments"]) == 3
+	assert {a["schedule_item_id"] for a in first["assignments"] + second["assignments"]} <= {
+		a["schedule_item_id"] for a in mine
+	}
+	assert not set(map(str, first["assignments"])) & set(map(str, second["assignments"]))
+	assert client.get(f"/scenarios/{scenario_id}/assignments", params={"fields": "salary"}).status_code == 400
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from theater_sched.domain.models import Person
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
+from tests.conftest import scenario_payload
+
+
+class _EditDuringSolve(MinimalCPSATSolver):
+	"""Решатель, во время которого другой запрос добавляет человека в сценарий."""
+	def __init__(self, repo) -> None:
+		self._repo = repo
+
+	def solve(self, scenario, **kwargs):
+		edited = self._repo.get_scenario(scenario.id)
+		assert edited.status == "solving"
+		edited.people.append(Person(id="late", name="Late"))
+		self._repo.save_scenario(edited)
+		return super().solve(scenario, **kwargs)
+
+
+def test_solve_keeps_edits_made_during_solve(repo, service):
+	scenario = service.create_scenario(**scenario_payload(num_people=3))
+	service._solver = _EditDuringSolve(repo)
+
+	result = service.solve(scenario.id, num_search_workers=1)
+
+	stored = repo.get_scenario(scenario.id)
+	assert result.status != "infeasible"
+	assert stored.status == "solved"
+	assert [p.id for p in stored.people] == ["u0", "u1", "u2", "late"]
+
+
+def test_set_scenario_status_only_changes_status(repo, service):
+	scenario = service.create_scenario(**scenario_payload(num_people=2))
+
+	repo.set_scenario_status(scenario.id, "solving")
+
+	stored = repo.get_scenario(scenario.id)
+	assert stored.status == "solving"
+	assert len(stored.people) == 2 and len(stored.timeslots) == len(scenario.timeslots)
+	repo.set_scenario_status("missing", "solving")  # неизвестный сценарий — без ошибки
+	assert repo.get_scenario("missing") is None
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from theater_sched.domain.models import SolveJob
+from theater_sched.repositories.sqlite_jobs import SqliteJobStore, worker_name
+
+
+def _job(job_id: str, created_at: float, scenario_id: str = "s") -> SolveJob:
+	return SolveJob(id=job_id, scenario_id=scenario_id, created_at=created_at)
+
+
+@pytest.fixture
+def store(sqlite_path) -> SqliteJobStore:
+	return SqliteJobStore(sqlite_path)
+
+
+def test_claim_takes_oldest_queued_job_once(store, sqlite_path):
+	store.add(_job("b", 2.0), {"warm_start": True}, stream=True)
+	store.add(_job("a", 1.0), {})
+	other_process = SqliteJobStore(sqlite_path)
+
+	job, options, stream = store.claim("w1")
+	assert (job.id, job.state, options, stream) == ("a", "running", {}, False)
+	job, options, stream = other_process.claim("w2")
+	assert (job.id, options, stream) == ("b", {"warm_start": True}, True)
+	assert store.claim("w1") is None
+	assert store.get("a").started_at is not None
+
+
+def test_concurrent_claims_never_share_a_job(store, sqlite_path):
+	for i in range(40):
+		store.add(_job(f"j{i}", float(i)), {})
+	claimed = []
+
+	def claim_all(name: str) -> None:
+		worker_store = SqliteJobStore(sqlite_path)
+		while (item := worker_store.claim(name)) is not None:
+			claimed.append(item[0].id)
+
+	threads = [threading.Thread(target=claim_all, args=(f"w{i}",)) for i in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert sorted(claimed) == sorted(f"j{i}" for i in range(40))
+
+
+def test_cancel_queued_and_running(store):
+	store.add(_job("queued", 2.0), {})
+	store.add(_job("running", 1.0), {})
+	store.claim("w1")
+
+	assert store.cancel("queued").state == "cancelled"
+	assert store.cancel("running").state == "running"  # остановить поиск должен воркер
+	assert store.heartbeat("running", "w1") is True
+	assert store.claim("w1") is None
+	assert store.cancel("missing") is None
+
+
+def test_fail_running_only_touches_that_worker(store):
+	store.add(_job("mine", 1.0), {})
+	store.add(_job("theirs", 2.0), {})
+	store.claim(worker_name("instance-a", pid=100))
+	store.claim(worker_name("instance-b", pid=100))  # тот же pid в другом запуске пула
+
+	assert store.fail_running(worker_name("instance-a", pid=100), "exited") == 1
+	assert store.get("mine").state == "failed" and store.get("mine").error == "exited"
+	assert store.get("theirs").state == "running"
+
+
+def test_fail_stale_uses_heartbeats(store):
+	store.add(_job("alive", 1.0), {})
+	store.add(_job("lost", 2.0), {})
+	store.claim("w1")
+	store.claim("w2")
+	time.sleep(0.3)
+	assert store.heartbeat("alive", "w1") is False
+
+	assert store.fail_stale(0.2, "no heartbeat") == 1
+	assert store.get("lost").state == "failed"
+	assert store.get("alive").state == "running"
+
+
+def test_finish_and_heartbeat_only_touch_owned_jobs(store):
+	store.add(_job("lost", 1.0), {})
+	job, _, _ = store.claim("w1")
+	store.fail_stale(-1.0, "no heartbeat")  # воркер медленный, но живой
+
+	# Воркер узнаёт, что задача уже не его, и его итог не затирает failed
+	assert store.heartbeat("lost", "w1") is True
+	job.state, job.finished_at = "done", time.time()
+	assert store.finish(job, "w1", {"status": "optimal"}) is False
+	assert store.get("lost").state == "failed" and store.get_output("lost") is None
+
+	store.add(_job("other", 2.0), {})
+	job, _, _ = store.claim("w2")
+	job.state = "done"
+	assert store.finish(job, "w1") is False
+	assert store.heartbeat("other", "w1") is True
+	assert store.finish(job, "w2") is True and store.get("other").state == "done"
+
+
+def test_events_and_pruning(sqlite_path):
+	store = SqliteJobStore(sqlite_path, max_finished_jobs=1)
+	store.add(_job("old", 1.0), {})
+	store.claim("w1")
+	store.add_event("old", 1, {"objective": 1})
+	store.add_event("old", 2, {"objective": 2})
+	assert store.events_after("old", 1) == [(2, {"objective": 2})]
+
+	store.add(_job("new", 2.0), {})
+	store.claim("w1")
+	for job_id in ("old", "new"):
+		job = store.get(job_id)
+		job.state, job.finished_at = "done", time.time()
+		store.finish(job, "w1")
+	store.add(_job("newest", 3.0), {})  # очистка выполняется при постановке
+
+	assert store.get("old") is None and store.events_after("old", 0) == []
+	assert store.get("new").state == "done" and store.get("newest").state == "queued"
+
+
+def test_kind_and_output_round_trip(sqlite_path):
+	store = SqliteJobStore(sqlite_path)
+	job = _job("v1", 1.0)
+	job.kind = "variants"
+	store.add(job, {"variants": [{"name": "a"}]})
+
+	claimed, options, _ = store.claim("w1")
+	assert (claimed.kind, options) == ("variants", {"variants": [{"name": "a"}]})
+	claimed.state, claimed.finished_at = "done", 2.0
+	store.finish(claimed, "w1", {"variants": [{"name": "a", "status": "optimal"}]})
+
+	assert store.get("v1").kind == "variants"
+	assert store.get_output("v1") == {"variants": [{"name": "a", "status": "optimal"}]}
+	assert store.get_output("missing") is None
+
+
+def test_old_database_is_migrated(sqlite_path):
+	conn = sqlite3.connect(sqlite_path)
+	conn.executescript(
+		"CREATE TABLE jobs (id TEXT PRIMARY KEY, scenario_id TEXT NOT NULL, state TEXT NOT NULL, "
+		"created_at REAL NOT NULL, started_at REAL, finished_at REAL, result_status TEXT, objective_value REAL, "
+		"cache TEXT, stop_reason TEXT, error TEXT, options TEXT NOT NULL, stream INTEGER NOT NULL DEFAULT 0, "
+		"cancel_requested INTEGER NOT NULL DEFAULT 0, worker TEXT);"
+		"INSERT INTO jobs (id, scenario_id, state, created_at, options) VALUES ('old', 's', 'queued', 1.0, '{}');"
+	)
+	conn.commit()
+	conn.close()
+
+	store = SqliteJobStore(sqlite_path)
+	assert store.get("old").kind == "solve"
+	assert store.claim("w1")[0].id == "old"
+	assert store.heartbeat("old", "w1") is False
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import theater_sched.repositories.sqlite as sqlite_module
+from theater_sched.domain.models import Assignment, Person, ScenarioResult, ScheduleItem
+from theater_sched.repositories.sqlite import SqliteRepository
+from theater_sched.services.scenarios import ScenarioService
+from tests.conftest import scenario_payload
+
+
+def _result(scenario_id: str, objective: float, from_cache: bool = False, person_id: str = "u0") -> ScenarioResult:
+	return ScenarioResult(
+		scenario_id=scenario_id,
+		schedule=[ScheduleItem(scenario_id, "hist_p0", "hist", "hist_2025-11-03", objective)],
+		objective_value=objective,
+		status="optimal",
+		assignments=[Assignment(scenario_id, "hist_p0", "hist_2025-11-03", "hist", person_id, "hist_p0_r0", True)],
+		from_cache=from_cache,
+	)
+
+
+def test_get_scenario_reads_one_version(sqlite_path, monkeypatch):
+	repo = SqliteRepository(sqlite_path)
+	scenario = ScenarioService(repo).create_scenario(**scenario_payload(num_people=2))
+	other_process = SqliteRepository(sqlite_path)
+	original = sqlite_module.Production
+	edited = []
+
+	def production(**kwargs):
+		# Между чтением постановок и людей другой процесс сохраняет новую версию сценария
+		if not edited:
+			edited.append(True)
+			changed = other_process.get_scenario(scenario.id)
+			changed.people.append(Person(id="late", name="Late"))
+			other_process.save_scenario(changed)
+		return original(**kwargs)
+
+	monkeypatch.setattr(sqlite_module, "Production", production)
+	read = repo.get_scenario(scenario.id)
+	monkeypatch.setattr(sqlite_module, "Production", original)
+
+	assert edited and [p.id for p in read.people] == ["u0", "u1"]
+	assert [p.id for p in repo.get_scenario(scenario.id).people] == ["u0", "u1", "late"]
+
+
+def test_get_result_reads_one_version(sqlite_path, monkeypatch):
+	repo = SqliteRepository(sqlite_path)
+	other_process = SqliteRepository(sqlite_path)
+	repo.save_result(_result("s", 1.0))
+	original = sqlite_module.ScheduleItem
+	saved = []
+
+	def schedule_item(**kwargs):
+		if not saved:
+			saved.append(True)
+			other_process.save_result(_result("s", 2.0, person_id="u1"))
+		return original(**kwargs)
+
+	monkeypatch.setattr(sqlite_module, "ScheduleItem", schedule_item)
+	read = repo.get_result("s")
+	monkeypatch.setattr(sqlite_module, "ScheduleItem", original)
+
+	assert saved and read.objective_value == 1.0 and [a.person_id for a in read.assignments] == ["u0"]
+	assert [a.person_id for a in repo.get_result("s").assignments] == ["u1"]
+
+
+def test_from_cache_survives_round_trip(sqlite_repo):
+	sqlite_repo.save_result(_result("cached", 1.0, from_cache=True))
+	sqlite_repo.save_result(_result("solved", 1.0))
+
+	assert sqlite_repo.get_result("cached").from_cache is True
+	assert sqlite_repo.get_result("solved").from_cache is False
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import pytest
+
+from theater_sched.domain.models import Person, PersonProductionRole, Role
+from theater_sched.services.staff import (
+	PEOPLE, PERSON_PRODUCTION_ROLES, ROLES, StaffBatchError, StaffOperation, apply_staff_operations,
+)
+from tests.conftest import build_scenario, scenario_payload
+
+
+def test_batch_sees_earlier_operations_of_the_same_batch():
+	scenario = build_scenario(num_people=2)
+
+	counts = apply_staff_operations(scenario, [
+		StaffOperation(op="add", kind=PEOPLE, item=Person(id="u9", name="U9")),
+		StaffOperation(op="add", kind=ROLES, item=Role(id="hist_p0_r9", name="R9", production_id="hist_p0")),
+		StaffOperation(op="add", kind=PERSON_PRODUCTION_ROLES, item=PersonProductionRole("u9", "hist_p0", "hist_p0_r9")),
+		StaffOperation(op="remove", kind=PERSON_PRODUCTION_ROLES, key=("u0", "hist_p0", "hist_p0_r0")),
+		StaffOperation(op="remove", kind=PERSON_PRODUCTION_ROLES, key=("u1", "hist_p0", "hist_p0_r0")),
+	])
+
+	assert counts == {"people.add": 1, "roles.add": 1, "person-production-roles.add": 1, "person-production-roles.remove": 2}
+	assert scenario.eligibility.eligible_people("hist_p0", "hist_p0_r9") == ["u9"]
+	assert scenario.eligibility.eligible_people("hist_p0", "hist_p0_r0") == []
+
+
+def test_invalid_batch_leaves_the_scenario_untouched():
+	scenario = build_scenario(num_people=2)
+	people, roles, pprs = list(scenario.people), list(scenario.roles), list(scenario.person_production_roles)
+
+	with pytest.raises(StaffBatchError) as e:
+		apply_staff_operations(scenario, [
+			StaffOperation(op="add", kind=PEOPLE, item=Person(id="u9", name="U9")),
+			StaffOperation(op="remove", kind=PEOPLE, key=("u0",)),
+			StaffOperation(op="add", kind=PERSON_PRODUCTION_ROLES, item=PersonProductionRole("u0", "hist_p0", "hist_p0_r0")),
+			StaffOperation(op="add", kind=ROLES, item=Role(id="r", name="R", production_id="missing")),
+		])
+
+	assert [err["index"] for err in e.value.errors] == [2, 3]
+	assert (scenario.people, scenario.roles, scenario.person_production_roles) == (people, roles, pprs)
+	assert "u9" not in scenario.eligibility.people
+
+
+def test_batch_endpoint_writes_the_scenario_once(client, monkeypatch):
+	from theater_sched.api import main
+
+	scenario_id = client.post("/scenarios", json=scenario_payload(num_people=2)).json()["scenario_id"]
+	saves = []
+	save_scenario = main.repo.save_scenario
+	monkeypatch.setattr(main.repo, "save_scenario", lambda s: (saves.append(s.id), save_scenario(s)))
+
+	response = client.post(f"/scenarios/{scenario_id}/people/batch", json=[
+		{"id": f"n{i}", "name": f"N{i}"} for i in range(50)
+	])
+
+	assert response.status_code == 200 and response.json()["applied"] == 50
+	assert saves == [scenario_id]
+	assert len(main.repo.get_scenario(scenario_id).people) == 52
+
+
+def test_patch_batch_is_all_or_nothing(client):
+	scenario_id = client.post("/scenarios", json=scenario_payload(num_people=2)).json()["scenario_id"]
+
+	response = client.post(f"/scenarios/{scenario_id}/batch", json={"operations": [
+		{"op": "add", "path": "/people", "value": {"id": "u9", "name": "U9"}},
+		{"op": "replace", "path": "/person-production-roles", "value": {
+			"person_id": "u9", "production_id": "hist_p0", "role_id": "hist_p0_r0", "can_play": True,
+		}},
+		{"op": "remove", "path": "/roles/missing"},
+	]})
+	assert response.status_code == 400
+	assert [err["index"] for err in response.json()["detail"]] == [2]
+	eligible = client.get(f"/scenarios/{scenario_id}/roles/hist_p0_r0/eligible-people").json()["person_ids"]
+	assert eligible == ["u0", "u1"]
+
+	response = client.post(f"/scenarios/{scenario_id}/batch", json={"operations": [
+		{"op": "add", "path": "/people", "value": {"id": "u9", "name": "U9"}},
+		{"op": "replace", "path": "/person-production-roles", "value": {
+			"person_id": "u9", "production_id": "hist_p0", "role_id": "hist_p0_r0", "can_play": True,
+		}},
+		{"op": "remove", "path": "/person-production-roles/u0/hist_p0/hist_p0_r0"},
+	]})
+	assert response.status_code == 200
+	eligible = client.get(f"/scenarios/{scenario_id}/roles/hist_p0_r0/eligible-people").json()["person_ids"]
+	assert eligible == ["u1", "u9"]
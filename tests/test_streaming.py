@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+
+from theater_sched.solver.cp_sat_solver import _SolutionReporter
+from tests.conftest import build_scenario, scenario_payload
+
+
+def _events(lines):
+	"""Разобрать поток SSE на пары (событие, данные)."""
+	events, name = [], None
+	for line in lines:
+		if line.startswith("event: "):
+			name = line[len("event: "):]
+		elif line.startswith("data: "):
+			events.append((name, json.loads(line[len("data: "):])))
+	return events
+
+
+def test_stream_replays_to_the_final_schedule(client):
+	# Сценарий, который не решают другие тесты: из кэша решений событий solution нет
+	scenario_id = client.post("/scenarios", json=scenario_payload(days=29)).json()["scenario_id"]
+
+	with client.stream("GET", f"/scenarios/{scenario_id}/solve/stream") as response:
+		assert response.headers["content-type"].startswith("text/event-stream")
+		events = _events(response.iter_lines())
+
+	names = [name for name, _ in events]
+	assert names[0] == "job" and names[-1] == "done" and "solution" in names
+	assert events[-1][1]["state"] == "done"
+	shown = set()
+	for name, data in events:
+		if name != "solution":
+			continue
+		assert {"objective_value", "best_bound", "gap", "wall_time", "added", "removed"} <= set(data)
+		shown |= {(a["production_id"], a["timeslot_id"]) for a in data["added"]}
+		shown -= {(r["production_id"], r["timeslot_id"]) for r in data["removed"]}
+	schedule = client.get(f"/scenarios/{scenario_id}/schedule").json()
+	assert shown and shown == {(item["production_id"], item["timeslot_id"]) for item in schedule["schedule"]}
+
+
+def test_stream_of_a_cached_result_reports_the_hit(client):
+	payload = scenario_payload(days=27)
+	client.post(f"/scenarios/{client.post('/scenarios', json=payload).json()['scenario_id']}/solve")
+	scenario_id = client.post("/scenarios", json=payload).json()["scenario_id"]
+
+	with client.stream("GET", f"/scenarios/{scenario_id}/solve/stream") as response:
+		events = _events(response.iter_lines())
+
+	assert [name for name, _ in events] == ["job", "done"]
+	assert events[-1][1]["cache"] == "hit"
+
+
+def test_stream_for_unknown_scenario_is_404(client):
+	assert client.get("/scenarios/missing/solve/stream").status_code == 404
+
+
+def test_reporter_merges_parts_and_sends_diffs():
+	scenario = build_scenario()
+	events = []
+	reporter = _SolutionReporter(scenario, num_parts=2, on_solution=events.append)
+	hist, new = scenario.timeslots[0], scenario.timeslots[1]
+
+	reporter.update(0, 10.0, 12.0, [("hist_p0", hist.id)])
+	reporter.update(1, 5.0, 5.0, [("new_p0", new.id)])
+	reporter.update(0, 11.0, 11.0, [("hist_p1", hist.id)])
+
+	assert [e["complete"] for e in events] == [False, True, True]
+	assert [e["objective_value"] for e in events] == [10.0, 15.0, 16.0]
+	assert events[2]["gap"] == 0.0
+	assert events[2]["added"] == [{"production_id": "hist_p1", "stage_id": "hist", "timeslot_id": hist.id}]
+	assert events[2]["removed"] == [{"production_id": "hist_p0", "stage_id": "hist", "timeslot_id": hist.id}]
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+
+from theater_sched.services.variants import ScenarioVariant, VariantError, solve_variants
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
+from tests.conftest import scenario_payload
+
+
+@pytest.fixture
+def base(service):
+	return service.create_scenario(**scenario_payload(num_people=0, time_limit=2))
+
+
+def test_fan_out_is_capped_by_granted_cores(base):
+	variants = [ScenarioVariant(name=f"v{i}", max_shows={"hist_p0": 3 + i % 2}) for i in range(5)]
+
+	report = solve_variants(base, variants, num_search_workers=2)
+
+	# База решается вместе с вариантами: 6 прогонов на 2 процессах, по потоку на процесс
+	assert (report["processes"], report["num_search_workers"]) == (2, 1)
+	assert report["base"]["source"] == "solved"
+	assert [row["name"] for row in report["variants"]] == [f"v{i}" for i in range(5)]
+	for i, row in enumerate(report["variants"]):
+		assert row["status"] in ("optimal", "feasible")
+		(change,) = [p for p in row["productions"] if p["production_id"] == "hist_p0"]
+		assert (change["base_shows"], change["shows"]) == (2, 3 + i % 2)
+
+
+def test_fan_out_uses_stored_baseline(base):
+	baseline = MinimalCPSATSolver().solve(base, num_search_workers=1)
+	variants = [ScenarioVariant(name="same")]
+
+	report = solve_variants(base, variants, baseline=baseline, num_search_workers=4)
+
+	assert (report["processes"], report["num_search_workers"]) == (1, 4)
+	assert report["base"]["source"] == "result"
+	(row,) = report["variants"]
+	assert row["objective_delta"] == 0  # показы могут сдвинуться: оптимумов несколько
+
+
+def test_invalid_variant_is_rejected_before_solving(base):
+	with pytest.raises(VariantError):
+		solve_variants(base, [ScenarioVariant(name="typo", constraints={"monday_of": False})])
+	with pytest.raises(VariantError):
+		solve_variants(base, [ScenarioVariant(name="unknown", max_shows={"nope": 2})])
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver, stage_fingerprints
+from tests.conftest import build_scenario, scenario_payload
+
+
+def _slots(result, stage_id):
+	return {(it.production_id, it.timeslot_id) for it in result.schedule if it.stage_id == stage_id}
+
+
+def test_stage_fingerprints_change_only_for_the_edited_stage():
+	scenario = build_scenario()
+	before = stage_fingerprints(scenario)
+	next(p for p in scenario.productions if p.id == "new_p0").max_shows += 1
+	after = stage_fingerprints(scenario)
+
+	assert after["hist"] == before["hist"]
+	assert after["new"] != before["new"]
+
+
+def test_fix_unchanged_stages_keeps_previous_schedule_of_untouched_stages():
+	scenario = build_scenario(time_limit=10)
+	solver = MinimalCPSATSolver()
+	previous = solver.solve(scenario)
+	next(p for p in scenario.productions if p.id == "new_p0").max_shows += 1
+
+	result = solver.solve(scenario, previous=previous, fix_unchanged_stages=True)
+
+	assert result.stats.pinned_stages == ["hist"]
+	assert result.status == "optimal_restricted"
+	assert _slots(result, "hist") == _slots(previous, "hist")
+	assert sum(1 for it in result.schedule if it.production_id == "new_p0") == 3
+
+
+def test_warm_start_without_pinning_reaches_the_same_optimum():
+	scenario = build_scenario(time_limit=10)
+	solver = MinimalCPSATSolver()
+	previous = solver.solve(scenario)
+
+	result = solver.solve(scenario, previous=previous)
+
+	assert result.status == "optimal"
+	assert result.stats.pinned_stages == []
+	assert result.objective_value == previous.objective_value
+
+
+def test_service_warm_start_uses_stored_result(service):
+	scenario = service.create_scenario(**scenario_payload(time_limit=10))
+	first = service.solve(scenario.id)
+
+	again = service.solve(scenario.id, warm_start=True, fix_unchanged_stages=True)
+
+	assert sorted(again.stats.pinned_stages) == ["hist", "new"]
+	assert again.status == "optimal_restricted"
+	assert {(it.production_id, it.timeslot_id) for it in again.schedule} == {
+		(it.production_id, it.timeslot_id) for it in first.schedule
+	}
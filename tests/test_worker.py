@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from theater_sched.repositories.sqlite import SqliteRepository
+from theater_sched.repositories.sqlite_jobs import SqliteJobStore
+from theater_sched.services.jobs import QueuedSolveJobManager
+from theater_sched.services.scenarios import ScenarioService
+from theater_sched.services.variants import ScenarioVariant, VariantError
+from theater_sched.worker import SolveWorker
+from tests.conftest import scenario_payload
+from tests.test_jobs import LONG_SOLVE, _wait_for_state
+from tests.test_scenarios import _EditDuringSolve
+
+
+@pytest.fixture
+def service(sqlite_repo) -> ScenarioService:
+	return ScenarioService(sqlite_repo)
+
+
+@pytest.fixture
+def api_jobs(sqlite_path) -> QueuedSolveJobManager:
+	"""Менеджер задач процесса API: своё хранилище и свои соединения с базой."""
+	return QueuedSolveJobManager(SqliteJobStore(sqlite_path), SqliteRepository(sqlite_path), poll_interval=0.05)
+
+
+@pytest.fixture
+def worker(service, sqlite_path) -> SolveWorker:
+	return SolveWorker(service, SqliteJobStore(sqlite_path), num_search_workers=1, poll_interval=0.05, name="w1")
+
+
+def _run_in_background(worker: SolveWorker) -> threading.Thread:
+	thread = threading.Thread(target=worker.run_once)
+	thread.start()
+	return thread
+
+
+def test_queued_solve_resolves_future_with_stored_result(service, api_jobs, worker):
+	scenario = service.create_scenario(**scenario_payload())
+	events = []
+	job = api_jobs.submit(scenario.id, on_solution=events.append)
+
+	_run_in_background(worker).join()
+	result = api_jobs.future(job.id).result(timeout=10)
+
+	job = api_jobs.get(job.id)
+	assert (job.state, job.cache, job.result_status) == ("done", "miss", result.status)
+	assert result.status != "infeasible" and result.assignments
+	assert events and all("objective_value" in event for event in events)
+	assert api_jobs.to_dict(job)["stop_reason"] == result.stats.stop_reason
+
+
+def test_future_of_job_submitted_by_another_process(service, api_jobs, worker, sqlite_path):
+	scenario = service.create_scenario(**scenario_payload())
+	job = api_jobs.submit(scenario.id)
+	other_api = QueuedSolveJobManager(SqliteJobStore(sqlite_path), SqliteRepository(sqlite_path), poll_interval=0.05)
+
+	_run_in_background(worker).join()
+
+	assert other_api.future(job.id).result(timeout=10).scenario_id == scenario.id
+	with pytest.raises(ValueError):
+		other_api.future("missing")
+
+
+def test_cancel_from_api_stops_worker_search(service, api_jobs, worker):
+	scenario = service.create_scenario(**scenario_payload(**LONG_SOLVE))
+	job = api_jobs.submit(scenario.id)
+	thread = _run_in_background(worker)
+	_wait_for_state(api_jobs, job.id, ("running",))
+	time.sleep(1.0)
+
+	api_jobs.cancel(job.id)
+	result = api_jobs.future(job.id).result(timeout=30)
+	thread.join()
+
+	job = api_jobs.get(job.id)
+	assert job.state == "cancelled" and result.stats.stop_reason == "cancelled"
+	assert job.finished_at - job.started_at < LONG_SOLVE["time_limit"] / 2
+
+
+def test_failed_solve_marks_job_failed(service, api_jobs, worker):
+	payload = scenario_payload()
+	payload["fixed_assignments"] = [{"production_id": "hist_p0", "timeslot_id": "new_2025-11-04"}]  # чужая сцена
+	scenario = service.create_scenario(**payload)
+	job = api_jobs.submit(scenario.id)
+
+	_run_in_background(worker).join()
+
+	assert api_jobs.future(job.id).result(timeout=10) is None
+	job = api_jobs.get(job.id)
+	assert job.state == "failed" and job.error
+
+
+def test_worker_keeps_edits_made_by_api_during_solve(service, sqlite_repo, api_jobs, worker):
+	scenario = service.create_scenario(**scenario_payload(num_people=2))
+	service._solver = _EditDuringSolve(sqlite_repo)
+	job = api_jobs.submit(scenario.id)
+
+	_run_in_background(worker).join()
+	api_jobs.future(job.id).result(timeout=10)
+
+	stored = sqlite_repo.get_scenario(scenario.id)
+	assert stored.status == "solved"
+	assert [p.id for p in stored.people] == ["u0", "u1", "late"]
+
+
+def test_submit_unknown_scenario(api_jobs):
+	with pytest.raises(ValueError):
+		api_jobs.submit("missing")
+	with pytest.raises(ValueError):
+		api_jobs.cancel("missing")
+
+
+def test_queued_variants_are_solved_by_worker(service, api_jobs, worker):
+	scenario = service.create_scenario(**scenario_payload())
+	variants = [
+		ScenarioVariant(name="same"),
+		ScenarioVariant(name="fewer", max_shows={"hist_p2": 1}, constraints={"monday_off": True}),
+	]
+	job = api_jobs.submit_variants(scenario.id, variants)
+	assert api_jobs.to_dict(api_jobs.get(job.id))["kind"] == "variants"
+
+	_run_in_background(worker).join()
+	report = api_jobs.future(job.id).result(timeout=10)
+
+	assert api_jobs.get(job.id).state == "done"
+	assert report["scenario_id"] == scenario.id and report["base"]["source"] == "solved"
+	assert [row["name"] for row in report["variants"]] == ["same", "fewer"]
+	assert report["variants"][0]["objective_delta"] == 0
+	# Сценарий и его результат пакет не меняет
+	assert service.get_status(scenario.id)["status"] == scenario.status
+
+
+def test_invalid_variants_are_rejected_before_queueing(service, api_jobs, worker):
+	scenario = service.create_scenario(**scenario_payload())
+	with pytest.raises(VariantError):
+		api_jobs.submit_variants(scenario.id, [ScenarioVariant(name="bad", max_shows={"missing": 1})])
+	with pytest.raises(ValueError):
+		api_jobs.submit_variants("missing", [ScenarioVariant(name="v")])
+	assert worker.run_once() is False
+
+
+def test_each_job_gets_its_own_result(service, sqlite_repo, api_jobs, worker):
+	scenario = service.create_scenario(**scenario_payload())
+	first = api_jobs.submit(scenario.id)
+	second = api_jobs.submit(scenario.id, repair_assignments=True)
+
+	_run_in_background(worker).join()
+	_run_in_background(worker).join()
+	first_result = api_jobs.future(first.id).result(timeout=10)
+	second_result = api_jobs.future(second.id).result(timeout=10)
+
+	# Сценарий хранит только последний результат, а задача — свой
+	assert first_result.revision != second_result.revision
+	assert sqlite_repo.get_result(scenario.id).revision == second_result.revision
+	assert first_result.schedule and first_result.assignments and first_result.stats.stop_reason
+
+
+def test_poll_failures_are_logged_and_fail_waiting_futures(service, sqlite_path, caplog, monkeypatch):
+	store = SqliteJobStore(sqlite_path)
+	api_jobs = QueuedSolveJobManager(store, SqliteRepository(sqlite_path), poll_interval=0.01, max_poll_failures=3)
+	scenario = service.create_scenario(**scenario_payload())
+
+	def broken(job_ids):
+		raise RuntimeError("database is broken")
+
+	monkeypatch.setattr(store, "get_many", broken)
+	job = api_jobs.submit(scenario.id)
+
+	with pytest.raises(RuntimeError, match="database is broken"):
+		api_jobs.future(job.id).result(timeout=10)
+	assert sum("Solve queue poll failed" in r.getMessage() for r in caplog.records) >= 3
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import asyncio
+import json
+import os
+from dataclasses import replace
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
 import pytz
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 
 # Московский часовой пояс
 MOSCOW_TZ = pytz.timezone('Europe/Moscow')
@@ -53,8 +58,28 @@ def _normalize_fixed_assignment(fa: "FixedAssignmentIn") -> Dict:
 	}
 
 from theater_sched.repositories.memory import InMemoryRepository
+from theater_sched.repositories.sqlite import SqliteRepository
+from theater_sched.repositories.sqlite_jobs import SqliteJobStore
+from theater_sched.services.encoding import EncodedJSON, assignment_dicts, choose_encoding
+from theater_sched.services.gantt import GanttView, build_gantt_view
+from theater_sched.services.jobs import QueuedSolveJobManager, SolveJobManager
+from theater_sched.services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS
+from theater_sched.services.result_cache import SolveResultCache
+from theater_sched.services.result_query import QueryError, ResultQuery
+from theater_sched.services.revision_cache import RevisionCache
+from theater_sched.services.variants import ScenarioVariant, VariantError
+from theater_sched.solver.assignment import repair_assignments
+from theater_sched.solver.cores import CoreAllocator
+from theater_sched.services.staff import (
+	PEOPLE,
+	PERSON_PRODUCTION_ROLES,
+	ROLES,
+	StaffBatchError,
+	StaffOperation,
+	apply_staff_operations,
+)
 from theater_sched.services.scenarios import ScenarioService
-from theater_sched.domain.models import Person, Role, PersonProductionRole, Assignment
+from theater_sched.domain.models import Person, Role, PersonProductionRole, Assignment, FixedAssignment
 
 
 class ProductionIn(BaseModel):
@@ -103,6 +128,28 @@ class ConstraintsIn(BaseModel):
 	same_show_weekend: bool = True
 	break_between_different_shows: bool = True
 	weekend_priority_bonus: bool = True
+	break_encoding: Literal["pairwise", "compact"] = "pairwise"
+	consecutive_encoding: Literal["windows", "start_index"] = "windows"
+
+
+class SolverParamsIn(BaseModel):
+	"""Параметры поиска CP-SAT (см. SolverParams)."""
+	num_search_workers: Optional[int] = Field(default=None, ge=1)  # Не больше выделенных сервером ядер
+	random_seed: Optional[int] = None
+	relative_gap_limit: Optional[float] = Field(default=None, ge=0)
+	presolve_level: int = Field(default=2, ge=0, le=2)  # 0 — выкл., 1 — облегчённый, 2 — полный
+	search_branching: Literal[
+		"automatic", "fixed", "portfolio", "lp", "pseudo_cost",
+		"portfolio_with_quick_restart", "hint", "partial_fixed", "randomized",
+	] = "automatic"
+
+
+class StopParamsIn(BaseModel):
+	"""Критерии досрочной остановки поиска (см. StopParams)."""
+	relative_gap: Optional[float] = Field(default=None, ge=0)
+	absolute_gap: Optional[float] = Field(default=None, ge=0)
+	no_improvement_seconds: Optional[float] = Field(default=None, gt=0)
+	first_feasible: bool = False  # Быстрый предпросмотр: первое допустимое расписание
 
 
 class ParamsIn(BaseModel):
@@ -110,6 +157,10 @@ class ParamsIn(BaseModel):
 	objective_weights: Dict[str, float] = Field(default_factory=lambda: {"revenue": 1.0})
 	time_limit_seconds: int = 5
 	constraints: Optional[ConstraintsIn] = None
+	decompose_by_stage: bool = False  # Решать сцены независимо и параллельно
+	assignment_engine: Literal["flow", "cp_sat", "greedy"] = "flow"  # Метод распределения по ролям
+	solver: Optional[SolverParamsIn] = None  # Параметры поиска CP-SAT
+	stop: Optional[StopParamsIn] = None      # Досрочная остановка поиска
 
 
 class PersonIn(BaseModel):
@@ -136,6 +187,23 @@ class PersonProductionRoleIn(BaseModel):
 	can_play: bool = True
 
 
+class StaffOperationIn(BaseModel):
+	"""Операция пакета в стиле JSON Patch.
+
+	path: /people, /roles, /person-production-roles (добавление, value — объект)
+	или /people/{id}, /roles/{id}, /person-production-roles/{person_id}/{production_id}/{role_id}
+	(удаление). Для связей человек-роль replace — синоним add (upsert).
+	"""
+	op: Literal["add", "remove", "replace"]
+	path: str
+	value: Optional[Dict] = None
+
+
+class StaffBatchIn(BaseModel):
+	"""Пакет операций над людьми, ролями и связями человек-роль."""
+	operations: List[StaffOperationIn]
+
+
 class ScenarioCreateIn(BaseModel):
 	"""Запрос на создание сценария.
 
@@ -155,8 +223,39 @@ class ScenarioCreateIn(BaseModel):
 	person_production_roles: List[PersonProductionRoleIn] = Field(default_factory=list)
 
 
-repo = InMemoryRepository()
-svc = ScenarioService(repo)
+# Хранилище: THEATER_REPOSITORY=memory (по умолчанию) или sqlite (путь — THEATER_SQLITE_PATH)
+if os.getenv("THEATER_REPOSITORY", "memory") == "sqlite":
+	repo = SqliteRepository(os.getenv("THEATER_SQLITE_PATH", "theater_sched.db"))
+else:
+	# Ограничения in-memory кэша (пусто — без ограничений)
+	repo = InMemoryRepository(
+		max_entries=int(os.environ["REPO_MAX_ENTRIES"]) if os.getenv("REPO_MAX_ENTRIES") else None,
+		max_bytes=int(os.environ["REPO_MAX_BYTES"]) if os.getenv("REPO_MAX_BYTES") else None,
+		ttl_seconds=float(os.environ["REPO_TTL_SECONDS"]) if os.getenv("REPO_TTL_SECONDS") else None,
+		spill_dir=os.getenv("REPO_SPILL_DIR") or None,
+	)
+# Кэш решений по содержимому сценария (SOLVE_CACHE_SIZE=0 — отключить)
+solve_cache_size = int(os.getenv("SOLVE_CACHE_SIZE", "256"))
+solve_cache = SolveResultCache(solve_cache_size) if solve_cache_size > 0 else None
+svc = ScenarioService(repo, solve_cache)
+# Готовые ответы для диаграммы Ганта по ревизии результата
+gantt_cache: RevisionCache[GanttView] = RevisionCache(build_gantt_view)
+# Ядра для потоков CP-SAT делятся между одновременными решениями (SOLVER_CPU_CORES — иначе по квоте CPU)
+cores = CoreAllocator(int(os.environ["SOLVER_CPU_CORES"]) if os.getenv("SOLVER_CPU_CORES") else None)
+# Задачи решения: THEATER_JOBS=local (по умолчанию) — пул потоков этого процесса,
+# sqlite — общая очередь для нескольких процессов API, решают процессы
+# python -m theater_sched.worker (нужен THEATER_REPOSITORY=sqlite)
+if os.getenv("THEATER_JOBS", "local") == "sqlite":
+	if not isinstance(repo, SqliteRepository):
+		raise RuntimeError("THEATER_JOBS=sqlite requires THEATER_REPOSITORY=sqlite")
+	jobs = QueuedSolveJobManager(
+		SqliteJobStore(os.getenv("THEATER_SQLITE_PATH", "theater_sched.db")),
+		repo,
+		poll_interval=float(os.getenv("SOLVE_POLL_INTERVAL", "0.2")),
+	)
+else:
+	# Сколько решений CP-SAT может выполняться одновременно
+	jobs = SolveJobManager(svc, max_concurrency=int(os.getenv("SOLVE_MAX_CONCURRENCY", "2")), cores=cores)
 app = FastAPI(title="Theater Scheduler API", version="0.1.0")
 
 # Разрешаем запросы с фронтенда (при необходимости сузьте allow_origins)
@@ -192,13 +291,55 @@ def create_scenario(payload: ScenarioCreateIn) -> Dict:
 class SolveRequest(BaseModel):
 	"""Запрос на решение сценария с настройками ограничений."""
 	constraints: Optional[ConstraintsIn] = None
+	# Если передан — заменяет закреплённые показы сценария
+	fixed_assignments: Optional[List[FixedAssignmentIn]] = None
+	# False — сразу вернуть id фоновой задачи, не дожидаясь решения
+	wait: bool = True
+	# Тёплый старт от прошлого результата; сцены без изменений можно закрепить как были
+	warm_start: bool = False
+	fix_unchanged_stages: bool = False
+	# Перераспределить людей только на изменившихся показах; в ответе — assignment_diff
+	repair_assignments: bool = False
+
+
+class ConstraintsOverrideIn(BaseModel):
+	"""Переопределение ограничений в варианте: указанные поля заменяют значения сценария."""
+	model_config = {"extra": "forbid"}  # опечатка в имени ограничения — ошибка, а не тихий пропуск
+
+	one_production_per_timeslot: Optional[bool] = None
+	exact_shows_count: Optional[bool] = None
+	consecutive_shows: Optional[bool] = None
+	monday_off: Optional[bool] = None
+	weekend_always_show: Optional[bool] = None
+	same_show_weekend: Optional[bool] = None
+	break_between_different_shows: Optional[bool] = None
+	weekend_priority_bonus: Optional[bool] = None
+	break_encoding: Optional[Literal["pairwise", "compact"]] = None
+	consecutive_encoding: Optional[Literal["windows", "start_index"]] = None
+
+
+class VariantIn(BaseModel):
+	"""Вариант "что если" поверх сценария."""
+	name: Optional[str] = None
+	constraints: Optional[ConstraintsOverrideIn] = None
+	max_shows: Dict[str, int] = Field(default_factory=dict)  # production_id -> число показов
+	# Дополнительные закреплённые показы (к закреплённым в сценарии)
+	fixed_assignments: List[FixedAssignmentIn] = Field(default_factory=list)
+	time_limit_seconds: Optional[int] = Field(default=None, ge=1)
+
+
+class VariantsIn(BaseModel):
+	"""Пакет вариантов для сравнения."""
+	variants: List[VariantIn] = Field(min_length=1, max_length=32)
 
 
 @app.post("/scenarios/{scenario_id}/solve")
-def solve_scenario(scenario_id: str, request: Optional[SolveRequest] = None) -> Dict:
+async def solve_scenario(scenario_id: str, request: Optional[SolveRequest] = None) -> Dict:
 	"""Запустить оптимизацию для указанного сценария.
 	
 	Если переданы constraints, они будут применены к решению.
+	Решение выполняется в пуле фоновых задач; при wait=false сразу
+	возвращается job_id для опроса через GET /jobs/{job_id}.
 	"""
 	try:
 		# Если переданы ограничения, обновляем сценарий
@@ -217,25 +358,197 @@ def solve_scenario(scenario_id: str, request: Optional[SolveRequest] = None) ->
 				same_show_weekend=request.constraints.same_show_weekend,
 				break_between_different_shows=request.constraints.break_between_different_shows,
 				weekend_priority_bonus=request.constraints.weekend_priority_bonus,
+				break_encoding=request.constraints.break_encoding,
+				consecutive_encoding=request.constraints.consecutive_encoding,
 			)
 			s.params.constraints = constraints
 			repo.save_scenario(s)  # Используем save_scenario вместо update_scenario
+
+		if request and request.fixed_assignments is not None:
+			s = repo.get_scenario(scenario_id)
+			if not s:
+				raise ValueError("Scenario not found")
+			from theater_sched.domain.models import FixedAssignment
+			s.fixed_assignments = [
+				FixedAssignment(**_normalize_fixed_assignment(fa)) for fa in request.fixed_assignments
+			]
+			repo.save_scenario(s)
 		
-		result = svc.solve(scenario_id)
-		return {
-			"scenario_id": result.scenario_id,
-			"status": result.status,
-			"objective_value": result.objective_value,
+		job = jobs.submit(
+			scenario_id,
+			warm_start=bool(request and request.warm_start),
+			fix_unchanged_stages=bool(request and request.fix_unchanged_stages),
+			repair_assignments=bool(request and request.repair_assignments),
+		)
+		if request and not request.wait:
+			return jobs.to_dict(job)
+
+		# Ждём завершения задачи, не занимая поток threadpool
+		future = jobs.future(job.id)
+		await asyncio.wait([asyncio.wrap_future(future)])
+		# В режиме общей очереди итог задачи записал воркер
+		job = jobs.get(job.id) or job
+		if job.state == "failed":
+			raise RuntimeError(job.error)
+		response = {
+			"scenario_id": scenario_id,
+			"status": job.result_status,
+			"objective_value": job.objective_value,
+			"job_id": job.id,
+			"job_state": job.state,
+			"cache": job.cache,
+			"stop_reason": job.stop_reason,
 		}
+		result = None if future.cancelled() else future.result()
+		if request and request.repair_assignments and result is not None:
+			response["assignment_diff"] = _assignment_diff_dict(result.assignment_diff)
+		return response
 	except ValueError as e:
 		raise HTTPException(status_code=404, detail=str(e))
 	except Exception as e:
-		import traceback
 		error_detail = f"Ошибка при решении: {str(e)}"
-		# В режиме разработки показываем полный traceback
 		raise HTTPException(status_code=500, detail=error_detail)
 
 
+@app.post("/scenarios/{scenario_id}/variants")
+async def solve_scenario_variants(scenario_id: str, payload: VariantsIn) -> Dict:
+	"""Решить варианты сценария параллельно (процесс на вариант) и сравнить с базой.
+
+	База — текущий результат сценария, а если его нет — сам сценарий, решённый
+	вместе с вариантами. Для каждого варианта: статус, цель, изменение цели и
+	постановки, чьи показы отличаются от базы. Сценарий и его результат не меняются.
+	При THEATER_JOBS=sqlite пакет ставится в общую очередь и решается процессом
+	решателя, а не процессом API.
+	"""
+	variants = [
+		ScenarioVariant(
+			name=v.name or f"variant-{i + 1}",
+			constraints=v.constraints.model_dump(exclude_none=True) if v.constraints else {},
+			max_shows=dict(v.max_shows),
+			fixed_assignments=[FixedAssignment(**_normalize_fixed_assignment(fa)) for fa in v.fixed_assignments],
+			time_limit_seconds=v.time_limit_seconds,
+		)
+		for i, v in enumerate(payload.variants)
+	]
+
+	def run() -> Dict:
+		with cores.allocate() as workers:
+			return svc.solve_variants(scenario_id, variants, num_search_workers=workers)
+
+	try:
+		if isinstance(jobs, QueuedSolveJobManager):
+			job = jobs.submit_variants(scenario_id, variants)
+			future = jobs.future(job.id)
+			await asyncio.wait([asyncio.wrap_future(future)])
+			report = future.result()
+			if report is None:
+				job = jobs.get(job.id) or job
+				raise HTTPException(status_code=500, detail=f"Ошибка при решении: {job.error or job.state}")
+			return report
+		# Ждём в отдельном потоке, не блокируя цикл событий
+		return await asyncio.to_thread(run)
+	except VariantError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	except ValueError as e:
+		raise HTTPException(status_code=404, detail=str(e))
+
+
+def _sse(event: str, data: Dict) -> str:
+	"""Форматирует одно событие Server-Sent Events."""
+	return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/scenarios/{scenario_id}/solve/stream")
+async def solve_scenario_stream(
+	scenario_id: str,
+	warm_start: bool = False,
+	fix_unchanged_stages: bool = False,
+	repair_assignments: bool = False,
+) -> StreamingResponse:
+	"""Запустить решение и транслировать улучшающие решения через SSE.
+
+	События: job (задача поставлена), solution (цель, граница, разрыв, время
+	и изменения расписания с прошлого события), done (итог задачи).
+	При отключении клиента поиск останавливается.
+	"""
+	loop = asyncio.get_running_loop()
+	queue: asyncio.Queue = asyncio.Queue()
+
+	def on_solution(event: Dict) -> None:
+		loop.call_soon_threadsafe(queue.put_nowait, event)
+
+	try:
+		job = jobs.submit(
+			scenario_id,
+			on_solution=on_solution,
+			warm_start=warm_start,
+			fix_unchanged_stages=fix_unchanged_stages,
+			repair_assignments=repair_assignments,
+		)
+	except ValueError as e:
+		raise HTTPException(status_code=404, detail=str(e))
+	finished = asyncio.wrap_future(jobs.future(job.id))
+
+	async def events():
+		try:
+			yield _sse("job", jobs.to_dict(job))
+			while not finished.done():
+				getter = asyncio.ensure_future(queue.get())
+				await asyncio.wait([getter, finished], return_when=asyncio.FIRST_COMPLETED)
+				if getter.done():
+					yield _sse("solution", getter.result())
+				else:
+					getter.cancel()
+			while not queue.empty():
+				yield _sse("solution", queue.get_nowait())
+			yield _sse("done", jobs.to_dict(jobs.get(job.id) or job))
+		finally:
+			if not finished.done():
+				jobs.cancel(job.id)
+
+	return StreamingResponse(
+		events(),
+		media_type="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+	)
+
+
+@app.get("/repository/stats")
+def repository_stats() -> Dict:
+	"""Счётчики хранилища (попадания/промахи/вытеснения), кэша решений и занятые ядра решателя."""
+	stats = getattr(repo, "stats", None)
+	return {
+		"repository": type(repo).__name__,
+		"stats": stats() if stats else None,
+		"solve_cache": solve_cache.stats() if solve_cache else None,
+		"cores": cores.stats(),
+	}
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+	"""Метрики решателя в текстовом формате Prometheus (гистограммы фаз, размера модели, поиска)."""
+	return Response(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> Dict:
+	"""Состояние фоновой задачи решения: queued/running/done/failed/cancelled."""
+	job = jobs.get(job_id)
+	if not job:
+		raise HTTPException(status_code=404, detail="Job not found")
+	return jobs.to_dict(job)
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str) -> Dict:
+	"""Отменить задачу: снять из очереди или остановить поиск CP-SAT (StopSearch)."""
+	try:
+		return jobs.to_dict(jobs.cancel(job_id))
+	except ValueError as e:
+		raise HTTPException(status_code=404, detail=str(e))
+
+
 @app.get("/scenarios/{scenario_id}/status")
 def scenario_status(scenario_id: str) -> Dict:
 	"""Получить текущий статус сценария и значение цели (если доступно)."""
@@ -245,83 +558,119 @@ def scenario_status(scenario_id: str) -> Dict:
 		raise HTTPException(status_code=404, detail=str(e))
 
 
+@app.get("/scenarios/{scenario_id}/solve-stats")
+def scenario_solve_stats(scenario_id: str) -> Dict:
+	"""Статистика последнего решения: время построения, решения, извлечения и
+	распределения, размер модели по семействам ограничений, ветвления,
+	конфликты, граница и разрыв CP-SAT."""
+	try:
+		return svc.get_solve_stats(scenario_id)
+	except ValueError as e:
+		raise HTTPException(status_code=404, detail=str(e))
+
+
+def _result_query(
+	date_from: Optional[str] = None,
+	date_to: Optional[str] = None,
+	stage_id: Optional[str] = None,
+	production_id: Optional[str] = None,
+	person_id: Optional[str] = None,
+	cursor: Optional[str] = None,
+	limit: Optional[int] = Query(default=None, ge=1),
+	fields: Optional[str] = None,
+) -> ResultQuery:
+	"""Параметры выборки: даты YYYY-MM-DD (включительно), фильтры, курсор, fields=поле1,поле2."""
+	return ResultQuery(
+		date_from=date_from,
+		date_to=date_to,
+		stage_id=stage_id,
+		production_id=production_id,
+		person_id=person_id,
+		cursor=cursor,
+		limit=limit,
+		fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+	)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+	"""Проверить заголовок If-None-Match (список ETag через запятую, W/ или *)."""
+	if not if_none_match:
+		return False
+	candidates = [tag.strip() for tag in if_none_match.split(",")]
+	return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _json_response(
+	body: EncodedJSON,
+	accept_encoding: Optional[str] = None,
+	if_none_match: Optional[str] = None,
+) -> Response:
+	"""Ответ из готовых байт JSON: сжатие по Accept-Encoding, а при ETag тела — 304 по If-None-Match."""
+	headers = {"Vary": "Accept-Encoding"}
+	if body.etag:
+		headers["ETag"] = body.etag
+		headers["Cache-Control"] = "no-cache"
+		if _etag_matches(if_none_match, body.etag):
+			return Response(status_code=304, headers=headers)
+	encoding = choose_encoding(accept_encoding, len(body.body))
+	if encoding:
+		headers["Content-Encoding"] = encoding
+	return Response(body.encoded(encoding), media_type="application/json", headers=headers)
+
+
+def _json(value: Dict, accept_encoding: Optional[str] = None) -> Response:
+	"""Ответ, сериализованный быстрым кодировщиком (без jsonable_encoder)."""
+	return _json_response(EncodedJSON.of(value), accept_encoding)
+
+
 @app.get("/scenarios/{scenario_id}/schedule")
-def scenario_schedule(scenario_id: str) -> Dict:
-	"""Получить построенное расписание для сценария."""
+def scenario_schedule(
+	scenario_id: str,
+	query: ResultQuery = Depends(_result_query),
+	include_assignments: bool = True,
+	accept_encoding: Optional[str] = Header(default=None),
+	if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+	"""Получить построенное расписание для сценария.
+
+	С параметрами выборки возвращается страница, отсортированная по дате,
+	и next_cursor для следующей; без них — всё расписание целиком
+	(кодируется один раз на ревизию результата, ETag — ревизия).
+	"""
 	try:
-		return svc.get_schedule(scenario_id)
+		if query.is_empty():
+			return _json_response(svc.get_schedule_body(scenario_id), accept_encoding, if_none_match)
+		return _json(svc.get_schedule(scenario_id, query, include_assignments), accept_encoding)
+	except QueryError as e:
+		raise HTTPException(status_code=400, detail=str(e))
 	except ValueError as e:
 		raise HTTPException(status_code=404, detail=str(e))
 
 
 @app.get("/scenarios/{scenario_id}/gantt")
-def scenario_gantt(scenario_id: str) -> Dict:
-    """Вернёт расписание в формате задач для диаграммы Ганта.
-
-    Формат: [{id, resource, start, end, title}]
-    start/end — ISO 8601 (например, 2025-11-01T19:00:00)
-    """
-    try:
-        schedule_data = svc.get_schedule(scenario_id)
-        s = repo.get_scenario(scenario_id)
-        if not s:
-            raise ValueError("Scenario not found")
-
-        ts_by_id = {t.id: t for t in s.timeslots}
-        stages_by_id = {st.id: st for st in s.stages}
-
-        def to_iso(date_str: str, hm: str | None, fallback_hm: str = "19:00") -> str:
-            # Форматируем время правильно для datetime.fromisoformat в московском времени
-            time_str = (hm or fallback_hm).strip()
-            if len(time_str) == 5:  # "HH:MM"
-                time_str = f"{time_str}:00"  # Преобразуем в "HH:MM:SS"
-            # Создаем naive datetime и локализуем в московское время
-            naive_dt = datetime.fromisoformat(f"{date_str}T{time_str}")
-            moscow_dt = MOSCOW_TZ.localize(naive_dt)
-            # Возвращаем в ISO формате (с часовым поясом)
-            return moscow_dt.isoformat()
-
-        tasks = []
-        for item in schedule_data.get("schedule", []):
-            tslot = ts_by_id.get(item["timeslot_id"])  # type: ignore[index]
-            if not tslot:
-                continue
-            # Время начала из таймслота (он уже привязан к конкретной сцене)
-            start_iso = to_iso(tslot.date, tslot.start_time)
-            # Для визуализации используем фиксированную длительность (3 часа)
-            try:
-                # Парсим дату в московском времени (to_iso уже возвращает datetime с часовым поясом)
-                start_dt = datetime.fromisoformat(start_iso)
-                # Если datetime naive (не должно быть, но на всякий случай), локализуем в московское время
-                if start_dt.tzinfo is None:
-                    start_dt = MOSCOW_TZ.localize(start_dt)
-                # Добавляем 3 часа
-                end_dt = start_dt + timedelta(hours=3)
-                # Форматируем в ISO с часовым поясом
-                end_iso = end_dt.isoformat()
-            except (ValueError, TypeError) as e:
-                # Если не удалось распарсить время, пропускаем этот элемент
-                continue
-            
-            # Сцена уже в таймслоте
-            stage_obj = stages_by_id.get(tslot.stage_id)
-            stage_label = stage_obj.name if stage_obj else tslot.stage_id
-            tasks.append(
-                {
-                    "id": f"{item['production_id']}|{item['stage_id']}|{item['timeslot_id']}",
-                    "resource": stage_label,
-                    "start": start_iso,
-                    "end": end_iso,
-                    "title": item["production_id"],
-                }
-            )
-
-        return {"scenario_id": scenario_id, "status": schedule_data["status"], "tasks": tasks}
-    except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
-    except Exception as e:
-        import traceback
-        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}\n{traceback.format_exc()}")
+def scenario_gantt(
+	scenario_id: str,
+	accept_encoding: Optional[str] = Header(default=None),
+	if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+	"""Вернёт расписание в формате задач для диаграммы Ганта.
+
+	Формат: [{id, resource, start, end, title}]
+	start/end — ISO 8601 (например, 2025-11-01T19:00:00)
+	Ответ строится один раз на ревизию результата; ETag — ревизия,
+	при совпадении с If-None-Match возвращается 304.
+	"""
+	revision = repo.get_result_revision(scenario_id)
+	if revision is None:
+		raise HTTPException(status_code=404, detail="Result not found")
+	view = gantt_cache.get(scenario_id, revision)
+	if view is None:
+		result = repo.get_result(scenario_id)
+		s = repo.get_scenario(scenario_id)
+		if not result or not s:
+			raise HTTPException(status_code=404, detail="Scenario not found")
+		view = gantt_cache.build(s, result)
+	return _json_response(view.body, accept_encoding, if_none_match)
 
 
 # Эндпоинты для управления людьми, ролями и назначениями
@@ -334,25 +683,25 @@ def add_person(scenario_id: str, person: PersonIn) -> Dict:
 		raise HTTPException(status_code=404, detail="Scenario not found")
 	
 	# Проверяем, нет ли уже человека с таким ID
-	if any(p.id == person.id for p in s.people):
+	if person.id in s.eligibility.people:
 		raise HTTPException(status_code=400, detail=f"Person with id {person.id} already exists")
 	
 	new_person = Person(id=person.id, name=person.name, email=person.email)
-	s.people.append(new_person)
+	s.add_person(new_person)
 	repo.save_scenario(s)
 	return {"person_id": person.id, "status": "added"}
 
 
 @app.get("/scenarios/{scenario_id}/people")
-def get_people(scenario_id: str) -> Dict:
+def get_people(scenario_id: str, accept_encoding: Optional[str] = Header(default=None)) -> Response:
 	"""Получить список всех людей в сценарии."""
 	s = repo.get_scenario(scenario_id)
 	if not s:
 		raise HTTPException(status_code=404, detail="Scenario not found")
-	return {
+	return _json({
 		"scenario_id": scenario_id,
 		"people": [{"id": p.id, "name": p.name, "email": p.email} for p in s.people]
-	}
+	}, accept_encoding)
 
 
 @app.delete("/scenarios/{scenario_id}/people/{person_id}")
@@ -362,9 +711,8 @@ def delete_person(scenario_id: str, person_id: str) -> Dict:
 	if not s:
 		raise HTTPException(status_code=404, detail="Scenario not found")
 	
-	s.people = [p for p in s.people if p.id != person_id]
-	# Также удаляем все связи с ролями
-	s.person_production_roles = [ppr for ppr in s.person_production_roles if ppr.person_id != person_id]
+	# Также удаляются все связи с ролями
+	s.remove_person(person_id)
 	repo.save_scenario(s)
 	return {"person_id": person_id, "status": "deleted"}
 
@@ -377,11 +725,11 @@ def add_role(scenario_id: str, role: RoleIn) -> Dict:
 		raise HTTPException(status_code=404, detail="Scenario not found")
 	
 	# Проверяем, что постановка существует
-	if not any(p.id == role.production_id for p in s.productions):
+	if role.production_id not in s.eligibility.production_ids:
 		raise HTTPException(status_code=400, detail=f"Production {role.production_id} not found")
 	
 	# Проверяем, нет ли уже роли с таким ID
-	if any(r.id == role.id for r in s.roles):
+	if role.id in s.eligibility.roles:
 		raise HTTPException(status_code=400, detail=f"Role with id {role.id} already exists")
 	
 	new_role = Role(
@@ -391,23 +739,25 @@ def add_role(scenario_id: str, role: RoleIn) -> Dict:
 		is_conductor=role.is_conductor,
 		required_count=role.required_count
 	)
-	s.roles.append(new_role)
+	s.add_role(new_role)
 	repo.save_scenario(s)
 	return {"role_id": role.id, "status": "added"}
 
 
 @app.get("/scenarios/{scenario_id}/roles")
-def get_roles(scenario_id: str, production_id: Optional[str] = None) -> Dict:
+def get_roles(
+	scenario_id: str,
+	production_id: Optional[str] = None,
+	accept_encoding: Optional[str] = Header(default=None),
+) -> Response:
 	"""Получить список ролей в сценарии (опционально фильтр по постановке)."""
 	s = repo.get_scenario(scenario_id)
 	if not s:
 		raise HTTPException(status_code=404, detail="Scenario not found")
 	
-	roles = s.roles
-	if production_id:
-		roles = [r for r in roles if r.production_id == production_id]
+	roles = s.eligibility.roles_of_production(production_id) if production_id else s.roles
 	
-	return {
+	return _json({
 		"scenario_id": scenario_id,
 		"roles": [{
 			"id": r.id,
@@ -416,7 +766,7 @@ def get_roles(scenario_id: str, production_id: Optional[str] = None) -> Dict:
 			"is_conductor": r.is_conductor,
 			"required_count": r.required_count
 		} for r in roles]
-	}
+	}, accept_encoding)
 
 
 @app.delete("/scenarios/{scenario_id}/roles/{role_id}")
@@ -426,9 +776,8 @@ def delete_role(scenario_id: str, role_id: str) -> Dict:
 	if not s:
 		raise HTTPException(status_code=404, detail="Scenario not found")
 	
-	s.roles = [r for r in s.roles if r.id != role_id]
-	# Также удаляем все связи с людьми
-	s.person_production_roles = [ppr for ppr in s.person_production_roles if ppr.role_id != role_id]
+	# Также удаляются все связи с людьми
+	s.remove_role(role_id)
 	repo.save_scenario(s)
 	return {"role_id": role_id, "status": "deleted"}
 
@@ -441,41 +790,33 @@ def set_person_production_role(scenario_id: str, ppr: PersonProductionRoleIn) ->
 		raise HTTPException(status_code=404, detail="Scenario not found")
 	
 	# Проверяем существование
-	if not any(p.id == ppr.person_id for p in s.people):
+	index = s.eligibility
+	if ppr.person_id not in index.people:
 		raise HTTPException(status_code=400, detail=f"Person {ppr.person_id} not found")
-	if not any(p.id == ppr.production_id for p in s.productions):
+	if ppr.production_id not in index.production_ids:
 		raise HTTPException(status_code=400, detail=f"Production {ppr.production_id} not found")
-	if not any(r.id == ppr.role_id for r in s.roles):
+	if ppr.role_id not in index.roles:
 		raise HTTPException(status_code=400, detail=f"Role {ppr.role_id} not found")
 	
-	# Удаляем существующую связь, если есть
-	s.person_production_roles = [
-		existing for existing in s.person_production_roles
-		if not (existing.person_id == ppr.person_id and 
-		        existing.production_id == ppr.production_id and 
-		        existing.role_id == ppr.role_id)
-	]
-	
-	# Добавляем новую
-	new_ppr = PersonProductionRole(
+	# Обновляем существующую связь или добавляем новую
+	s.set_person_production_role(PersonProductionRole(
 		person_id=ppr.person_id,
 		production_id=ppr.production_id,
 		role_id=ppr.role_id,
 		can_play=ppr.can_play
-	)
-	s.person_production_roles.append(new_ppr)
+	))
 	repo.save_scenario(s)
 	return {"status": "updated"}
 
 
 @app.get("/scenarios/{scenario_id}/person-production-roles")
-def get_person_production_roles(scenario_id: str) -> Dict:
+def get_person_production_roles(scenario_id: str, accept_encoding: Optional[str] = Header(default=None)) -> Response:
 	"""Получить все связи человек-роль-спектакль."""
 	s = repo.get_scenario(scenario_id)
 	if not s:
 		raise HTTPException(status_code=404, detail="Scenario not found")
 	
-	return {
+	return _json({
 		"scenario_id": scenario_id,
 		"person_production_roles": [{
 			"person_id": ppr.person_id,
@@ -483,33 +824,179 @@ def get_person_production_roles(scenario_id: str) -> Dict:
 			"role_id": ppr.role_id,
 			"can_play": ppr.can_play
 		} for ppr in s.person_production_roles]
+	}, accept_encoding)
+
+
+@app.get("/scenarios/{scenario_id}/roles/{role_id}/eligible-people")
+def get_eligible_people(scenario_id: str, role_id: str) -> Dict:
+	"""Люди, которые могут играть роль (can_play)."""
+	s = repo.get_scenario(scenario_id)
+	if not s:
+		raise HTTPException(status_code=404, detail="Scenario not found")
+	role = s.eligibility.roles.get(role_id)
+	if not role:
+		raise HTTPException(status_code=404, detail="Role not found")
+	return {
+		"scenario_id": scenario_id,
+		"role_id": role_id,
+		"production_id": role.production_id,
+		"person_ids": s.eligibility.eligible_people(role.production_id, role_id),
 	}
 
 
-@app.get("/scenarios/{scenario_id}/assignments")
-def get_assignments(scenario_id: str) -> Dict:
-	"""Получить все назначения людей на роли для расписания."""
-	result = repo.get_result(scenario_id)
-	if not result:
-		raise HTTPException(status_code=404, detail="Result not found")
-	
+@app.get("/scenarios/{scenario_id}/people/{person_id}/roles")
+def get_person_roles(scenario_id: str, person_id: str) -> Dict:
+	"""Роли, которые может играть человек (can_play)."""
+	s = repo.get_scenario(scenario_id)
+	if not s:
+		raise HTTPException(status_code=404, detail="Scenario not found")
+	if person_id not in s.eligibility.people:
+		raise HTTPException(status_code=404, detail="Person not found")
 	return {
 		"scenario_id": scenario_id,
-		"assignments": [{
-			"schedule_item_id": a.schedule_item_id,
-			"production_id": a.production_id,
-			"timeslot_id": a.timeslot_id,
-			"stage_id": a.stage_id,
-			"person_id": a.person_id,
-			"role_id": a.role_id,
-			"is_conductor": a.is_conductor
-		} for a in result.assignments]
+		"person_id": person_id,
+		"roles": [
+			{"production_id": production_id, "role_id": role_id}
+			for production_id, role_id in s.eligibility.roles_of_person(person_id)
+		],
 	}
 
 
+def _person_from(person: PersonIn) -> Person:
+	return Person(id=person.id, name=person.name, email=person.email)
+
+
+def _role_from(role: RoleIn) -> Role:
+	return Role(
+		id=role.id,
+		name=role.name,
+		production_id=role.production_id,
+		is_conductor=role.is_conductor,
+		required_count=role.required_count,
+	)
+
+
+def _ppr_from(ppr: PersonProductionRoleIn) -> PersonProductionRole:
+	return PersonProductionRole(
+		person_id=ppr.person_id,
+		production_id=ppr.production_id,
+		role_id=ppr.role_id,
+		can_play=ppr.can_play,
+	)
+
+
+def _parse_staff_operation(raw: StaffOperationIn) -> StaffOperation:
+	"""Разобрать операцию JSON Patch; ValueError — операция некорректна."""
+	tokens = [t for t in raw.path.strip("/").split("/") if t and t != "-"]
+	if not tokens:
+		raise ValueError(f"Invalid path {raw.path}")
+	kind, key = tokens[0], tuple(tokens[1:])
+	if raw.op == "remove":
+		expected = 3 if kind == PERSON_PRODUCTION_ROLES else 1
+		if kind not in (PEOPLE, ROLES, PERSON_PRODUCTION_ROLES) or len(key) != expected:
+			raise ValueError(f"Invalid path {raw.path} for remove")
+		return StaffOperation(op="remove", kind=kind, key=key)
+	if raw.op == "replace" and kind != PERSON_PRODUCTION_ROLES:
+		raise ValueError("replace is supported only for person-production-roles")
+	if key or raw.value is None:
+		raise ValueError(f"{raw.op} expects path /{kind} and a value")
+	try:
+		if kind == PEOPLE:
+			item = _person_from(PersonIn.model_validate(raw.value))
+		elif kind == ROLES:
+			item = _role_from(RoleIn.model_validate(raw.value))
+		elif kind == PERSON_PRODUCTION_ROLES:
+			item = _ppr_from(PersonProductionRoleIn.model_validate(raw.value))
+		else:
+			raise ValueError(f"Unknown collection {kind}")
+	except ValidationError as e:
+		raise ValueError(str(e))
+	return StaffOperation(op="add", kind=kind, item=item)
+
+
+def _apply_staff_batch(scenario_id: str, operations: List[StaffOperation]) -> Dict:
+	"""Применить пакет атомарно и сохранить сценарий одной записью в хранилище."""
+	s = repo.get_scenario(scenario_id)
+	if not s:
+		raise HTTPException(status_code=404, detail="Scenario not found")
+	try:
+		counts = apply_staff_operations(s, operations)
+	except StaffBatchError as e:
+		raise HTTPException(status_code=400, detail=e.errors)
+	repo.save_scenario(s)
+	return {"scenario_id": scenario_id, "applied": len(operations), "counts": counts}
+
+
+@app.post("/scenarios/{scenario_id}/batch")
+def apply_staff_batch(scenario_id: str, payload: StaffBatchIn) -> Dict:
+	"""Пакет операций над людьми, ролями и связями человек-роль (всё или ничего)."""
+	operations = []
+	errors = []
+	for i, raw in enumerate(payload.operations):
+		try:
+			operations.append(_parse_staff_operation(raw))
+		except ValueError as e:
+			errors.append({"index": i, "error": str(e)})
+	if errors:
+		raise HTTPException(status_code=400, detail=errors)
+	return _apply_staff_batch(scenario_id, operations)
+
+
+@app.post("/scenarios/{scenario_id}/people/batch")
+def add_people_batch(scenario_id: str, people: List[PersonIn]) -> Dict:
+	"""Добавить список людей одним запросом."""
+	return _apply_staff_batch(scenario_id, [StaffOperation(op="add", kind=PEOPLE, item=_person_from(p)) for p in people])
+
+
+@app.post("/scenarios/{scenario_id}/roles/batch")
+def add_roles_batch(scenario_id: str, roles: List[RoleIn]) -> Dict:
+	"""Добавить список ролей одним запросом."""
+	return _apply_staff_batch(scenario_id, [StaffOperation(op="add", kind=ROLES, item=_role_from(r)) for r in roles])
+
+
+@app.post("/scenarios/{scenario_id}/person-production-roles/batch")
+def set_person_production_roles_batch(scenario_id: str, pprs: List[PersonProductionRoleIn]) -> Dict:
+	"""Установить/обновить список связей человек-роль одним запросом."""
+	return _apply_staff_batch(
+		scenario_id,
+		[StaffOperation(op="add", kind=PERSON_PRODUCTION_ROLES, item=_ppr_from(ppr)) for ppr in pprs],
+	)
+
+
+def _assignment_diff_dict(diff: Dict[str, List[Assignment]]) -> Dict:
+	return {
+		"added": assignment_dicts(diff.get("added", [])),
+		"removed": assignment_dicts(diff.get("removed", [])),
+	}
+
+
+@app.get("/scenarios/{scenario_id}/assignments")
+def get_assignments(
+	scenario_id: str,
+	query: ResultQuery = Depends(_result_query),
+	accept_encoding: Optional[str] = Header(default=None),
+	if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+	"""Получить назначения людей на роли для расписания (все или страницу по фильтрам)."""
+	try:
+		if query.is_empty():
+			return _json_response(svc.get_assignments_body(scenario_id), accept_encoding, if_none_match)
+		return _json(svc.get_assignments(scenario_id, query), accept_encoding)
+	except QueryError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	except ValueError as e:
+		raise HTTPException(status_code=404, detail=str(e))
+
+
 @app.put("/scenarios/{scenario_id}/assignments")
 def update_assignment(scenario_id: str, assignment: Dict) -> Dict:
-	"""Обновить назначение вручную."""
+	"""Обновить назначение вручную.
+
+	Необязательные поля: replace_person_id — кого заменить, если на роль
+	требуется несколько человек; repair=true — после правки переназначить
+	только затронутые позиции (человек был занят в это время в другом месте),
+	остальные назначения не меняются. В ответе diff: добавленные и удалённые назначения.
+	"""
 	result = repo.get_result(scenario_id)
 	if not result:
 		raise HTTPException(status_code=404, detail="Result not found")
@@ -525,35 +1012,32 @@ def update_assignment(scenario_id: str, assignment: Dict) -> Dict:
 	if not schedule_item_id or not person_id or not role_id:
 		raise HTTPException(status_code=400, detail="Missing required fields")
 	
-	# Находим существующее назначение
-	found = False
-	for a in result.assignments:
-		if a.schedule_item_id == schedule_item_id and a.role_id == role_id:
-			a.person_id = person_id
-			found = True
-			break
+	# Находим существующее назначение по индексу (schedule_item_id, role_id)
+	current = result.positions.get((schedule_item_id, role_id), [])
+	replace_person_id = assignment.get("replace_person_id")
+	existing = next((a for a in current if a.person_id == replace_person_id), None) if replace_person_id else None
+	if existing is None and current:
+		existing = current[0]
 	
-	if not found:
+	if existing is not None:
+		updated = replace(existing, person_id=person_id)
+	else:
 		# Создаём новое назначение
 		# Нужно найти соответствующий элемент расписания
-		schedule_item = None
-		for item in result.schedule:
-			item_id = f"{item.production_id}|{item.stage_id}|{item.timeslot_id}"
-			if item_id == schedule_item_id:
-				schedule_item = item
-				break
-		
+		schedule_item = next(
+			(item for item in result.schedule if item.schedule_item_id == schedule_item_id),
+			None,
+		)
 		if not schedule_item:
 			raise HTTPException(status_code=400, detail="Schedule item not found")
 		
 		# Находим роль, чтобы определить is_conductor
-		role = next((r for r in s.roles if r.id == role_id), None)
+		role = s.eligibility.roles.get(role_id)
 		if not role:
 			raise HTTPException(status_code=400, detail="Role not found")
 		
-		new_assignment = Assignment(
+		updated = Assignment(
 			scenario_id=scenario_id,
-			schedule_item_id=schedule_item_id,
 			production_id=schedule_item.production_id,
 			timeslot_id=schedule_item.timeslot_id,
 			stage_id=schedule_item.stage_id,
@@ -561,10 +1045,24 @@ def update_assignment(scenario_id: str, assignment: Dict) -> Dict:
 			role_id=role_id,
 			is_conductor=role.is_conductor
 		)
-		result.assignments.append(new_assignment)
+	
+	if assignment.get("repair"):
+		others = [a for a in result.assignments if a is not existing]
+		repaired, added, removed = repair_assignments(s, result.schedule, others, pinned=[updated])
+		if existing is not None:
+			removed.insert(0, existing)
+		result.set_assignments(repaired)
+		diff = {"added": added, "removed": removed}
+	elif existing is not None:
+		diff = {"added": [updated], "removed": [replace(existing)]}
+		existing.person_id = person_id
+		result.touch()
+	else:
+		result.add_assignment(updated)
+		diff = {"added": [updated], "removed": []}
 	
 	repo.save_result(result)
-	return {"status": "updated"}
+	return {"status": "updated", "diff": _assignment_diff_dict(diff)}
 
 
 @app.post("/scenarios/{scenario_id}/auto-generate-roles")
@@ -581,8 +1079,8 @@ def auto_generate_roles(scenario_id: str) -> Dict:
 		roles = generate_roles_for_production(production)
 		for role in roles:
 			# Проверяем, нет ли уже такой роли
-			if not any(r.id == role.id for r in s.roles):
-				s.roles.append(role)
+			if role.id not in s.eligibility.roles:
+				s.add_role(role)
 				generated_roles.append({
 					"id": role.id,
 					"name": role.name,
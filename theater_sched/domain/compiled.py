@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+"""
+Скомпилированная (колоночная) форма сценария для решателя и API.
+
+Строится один раз на сценарий (см. Scenario.compiled): строковые id
+заменяются целыми индексами, даты и время — числами в массивах NumPy,
+а порядок слотов каждой сцены по (дата, время) вычисляется заранее.
+"""
+
+from datetime import date
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from theater_sched.domain.models import Production, Scenario, TimeSlot
+
+
+def _parse_day(value: str) -> int:
+	return date.fromisoformat(value[:10]).toordinal()
+
+
+def _parse_minute(value: str) -> int:
+	hours, _, minutes = value.strip().partition(":")
+	minute = int(hours) * 60 + int(minutes[:2] or 0)
+	if not 0 <= minute < 24 * 60:
+		raise ValueError(value)
+	return minute
+
+
+def _encode(values: Sequence[str], parse: Callable[[str], int]) -> np.ndarray:
+	"""Числовые коды строк; неразборные значения получают отрицательные коды
+	(свой на каждое различное значение, в порядке первого появления)."""
+	codes = np.empty(len(values), dtype=np.int32)
+	unparsed: Dict[str, int] = {}
+	for i, value in enumerate(values):
+		try:
+			codes[i] = parse(value)
+		except (ValueError, TypeError, AttributeError):
+			codes[i] = unparsed.setdefault(value, -1 - len(unparsed))
+	return codes
+
+
+class CompiledScenario:
+	"""Постановки, сцены и таймслоты сценария в виде индексов и массивов.
+
+	Слот i: timeslots[i], сцена slot_stage[i], порядковый номер дня
+	slot_day[i] (date.toordinal), день недели slot_dow[i] (0 — понедельник)
+	и минута начала slot_minute[i]. stage_slots[s] — индексы слотов сцены s
+	по (дата, время), slot_rank[i] — позиция слота в этом порядке,
+	chrono_rank[i] — позиция слота среди всех слотов сценария по (дата, время).
+	Порядок при равных (дата, время) — как во входных данных.
+	"""
+	def __init__(self, scenario: Scenario) -> None:
+		# Сцены, известные только по постановкам или слотам, добавляются в конец
+		self.stage_index: Dict[str, int] = {}
+		for stage_id in (
+			*(st.id for st in scenario.stages),
+			*(p.stage_id for p in scenario.productions),
+			*(t.stage_id for t in scenario.timeslots),
+		):
+			self.stage_index.setdefault(stage_id, len(self.stage_index))
+		self.stage_ids: List[str] = list(self.stage_index)
+
+		self.productions: List[Production] = list(scenario.productions)
+		self.production_index: Dict[str, int] = {p.id: i for i, p in enumerate(self.productions)}
+		self.production_stage = np.fromiter(
+			(self.stage_index[p.stage_id] for p in self.productions), dtype=np.int32, count=len(self.productions),
+		)
+		self.max_shows = np.fromiter((p.max_shows for p in self.productions), dtype=np.int32, count=len(self.productions))
+
+		self.timeslots: List[TimeSlot] = list(scenario.timeslots)
+		self.timeslot_index: Dict[str, int] = {t.id: i for i, t in enumerate(self.timeslots)}
+		count = len(self.timeslots)
+		self.slot_stage = np.fromiter((self.stage_index[t.stage_id] for t in self.timeslots), dtype=np.int32, count=count)
+		self.slot_day = _encode([t.date for t in self.timeslots], _parse_day)
+		self.slot_dow = np.fromiter((t.day_of_week for t in self.timeslots), dtype=np.int8, count=count)
+		self.slot_minute = _encode([t.start_time for t in self.timeslots], _parse_minute)
+
+		# lexsort устойчива: при равных ключах сохраняется входной порядок
+		chrono = np.lexsort((self.slot_minute, self.slot_day))
+		self.chrono_rank = np.empty(count, dtype=np.int64)
+		self.chrono_rank[chrono] = np.arange(count)
+		by_stage = chrono[np.argsort(self.slot_stage[chrono], kind="stable")]
+		bounds = np.searchsorted(self.slot_stage[by_stage], np.arange(len(self.stage_ids) + 1))
+		self.stage_slots: List[np.ndarray] = [
+			by_stage[bounds[s]:bounds[s + 1]] for s in range(len(self.stage_ids))
+		]
+		self.slot_rank = np.empty(count, dtype=np.int64)
+		for slots in self.stage_slots:
+			self.slot_rank[slots] = np.arange(len(slots))
+
+		order = np.argsort(self.production_stage, kind="stable")
+		bounds = np.searchsorted(self.production_stage[order], np.arange(len(self.stage_ids) + 1))
+		self.stage_productions: List[np.ndarray] = [
+			order[bounds[s]:bounds[s + 1]] for s in range(len(self.stage_ids))
+		]
+
+	def moment(self, slot: int) -> Tuple[int, int]:
+		"""(день, минута) слота — ключ для проверки пересечений по времени."""
+		return int(self.slot_day[slot]), int(self.slot_minute[slot])
+
@@ -6,8 +6,26 @@ from __future__ import annotations
 Содержат постановки, сцены, таймслоты, параметры сценария, а также результат расписания.
 """
 
+import sys
+import uuid
+from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+	from theater_sched.domain.compiled import CompiledScenario
+
+
+def _intern_ids(obj: object, names: Tuple[str, ...]) -> None:
+	"""Интернировать строковые id объекта: одинаковые id во всех строках — один объект str.
+
+	Строки из JSON и SQLite создаются заново на каждую запись, а у
+	показов и назначений id повторяются тысячи раз.
+	"""
+	for name in names:
+		value = getattr(obj, name)
+		if type(value) is str:
+			object.__setattr__(obj, name, sys.intern(value))
 
 
 @dataclass
@@ -19,11 +37,12 @@ class Production:
 	max_shows: int = 1               # Требуемое количество показов
 	weekend_priority: bool = False   # Приоритет на выходные дни
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class TimeSlot:
 	"""Дискретный слот времени для показа.
 	
 	Каждый таймслот привязан к конкретной сцене и времени начала.
+	Неизменяемый, без __dict__; строковые поля интернируются.
 	"""
 	id: str                        # ID таймслота
 	stage_id: str                  # ID сцены
@@ -31,6 +50,9 @@ class TimeSlot:
 	day_of_week: int = 0           # 0=Monday, 6=Sunday
 	start_time: str = "19:00"      # "HH:MM" - время начала для этой сцены
 
+	def __post_init__(self) -> None:
+		_intern_ids(self, ("id", "stage_id", "date", "start_time"))
+
 @dataclass
 class Stage:
 	"""Сцена"""
@@ -71,6 +93,43 @@ class Constraints:
 	break_between_different_shows: bool = True  # Перерыв между разными спектаклями
 	weekend_priority_bonus: bool = True  # Бонус для спектаклей с приоритетом на выходные
 
+	# Формулировки модели: на оптимальное расписание не влияют, только на размер модели
+	# Штраф за отсутствие перерыва: "pairwise" (both_assigned + same_{p})
+	# или "compact" (один индикатор смены спектакля на границу слотов)
+	break_encoding: str = "pairwise"
+	# Показы подряд: "windows" (булево начало на каждое окно) или
+	# "start_index" (целый индекс начала серии + интервалы)
+	consecutive_encoding: str = "windows"
+
+
+@dataclass
+class SolverParams:
+	"""Параметры поиска CP-SAT (None — значение CP-SAT по умолчанию)."""
+	# Потоки поиска; не больше выделенных сервером ядер (см. CoreAllocator), None — сколько выделено
+	num_search_workers: Optional[int] = None
+	random_seed: Optional[int] = None
+	relative_gap_limit: Optional[float] = None  # Остановить поиск при |граница - цель| / |цель| <= limit
+	# Пресолв: 0 — выключен, 1 — облегчённый (одна итерация, без пробинга), 2 — полный
+	presolve_level: int = 2
+	# Стратегия ветвления: "automatic", "fixed", "portfolio", "lp", "pseudo_cost",
+	# "portfolio_with_quick_restart", "hint", "partial_fixed", "randomized"
+	search_branching: str = "automatic"
+
+
+@dataclass
+class StopParams:
+	"""Критерии досрочной остановки поиска (проверяются по решениям и границе CP-SAT)."""
+	relative_gap: Optional[float] = None            # |граница - цель| / max(1, |цель|) <= relative_gap
+	absolute_gap: Optional[float] = None            # |граница - цель| <= absolute_gap
+	no_improvement_seconds: Optional[float] = None  # столько секунд без улучшения цели
+	first_feasible: bool = False                    # первое допустимое решение (быстрый предпросмотр)
+
+	def is_active(self) -> bool:
+		return (
+			self.first_feasible or self.relative_gap is not None
+			or self.absolute_gap is not None or self.no_improvement_seconds is not None
+		)
+
 
 @dataclass
 class ScenarioParams:
@@ -78,6 +137,10 @@ class ScenarioParams:
 	objective_weights: Dict[str, float] = field(default_factory=lambda: {"revenue": 1.0})  # зачем ?
 	time_limit_seconds: float = 7.0                                                            
 	constraints: Constraints = field(default_factory=Constraints)
+	decompose_by_stage: bool = False  # Решать каждую сцену отдельной подзадачей (параллельно)
+	assignment_engine: str = "flow"   # Распределение по ролям: "flow", "cp_sat" или "greedy"
+	solver: SolverParams = field(default_factory=SolverParams)  # Параметры поиска CP-SAT
+	stop: StopParams = field(default_factory=StopParams)        # Досрочная остановка поиска
 
 
 @dataclass
@@ -97,18 +160,239 @@ class Scenario:
 	roles: List[Role] = field(default_factory=list)                              # Роли для постановок
 	person_production_roles: List[PersonProductionRole] = field(default_factory=list)  # Кто может играть какую роль
 
+	# Люди, роли и связи человек-роль меняются через методы ниже, чтобы
+	# индекс допуска (eligibility) оставался согласованным со списками.
+
+	@property
+	def compiled(self) -> CompiledScenario:
+		"""Колоночная форма постановок и таймслотов; строится при первом обращении.
+
+		Постановки, сцены и таймслоты сценария после создания не меняются,
+		поэтому форма не пересобирается.
+		"""
+		compiled = self.__dict__.get("_compiled")
+		if compiled is None:
+			from theater_sched.domain.compiled import CompiledScenario
+			compiled = self.__dict__["_compiled"] = CompiledScenario(self)
+		return compiled
+
+	@property
+	def eligibility(self) -> EligibilityIndex:
+		"""Индекс допуска людей к ролям; строится при первом обращении."""
+		index = self.__dict__.get("_eligibility")
+		if index is None:
+			index = self.__dict__["_eligibility"] = EligibilityIndex(self)
+		return index
+
+	def add_person(self, person: Person) -> None:
+		self.people.append(person)
+		self.eligibility.add_person(person)
+
+	def remove_person(self, person_id: str) -> None:
+		"""Удалить человека вместе с его связями с ролями."""
+		self.people = [p for p in self.people if p.id != person_id]
+		if self.eligibility.keys_of_person(person_id):
+			self.person_production_roles = [ppr for ppr in self.person_production_roles if ppr.person_id != person_id]
+		self.eligibility.remove_person(person_id)
+
+	def add_role(self, role: Role) -> None:
+		self.roles.append(role)
+		self.eligibility.add_role(role)
+
+	def remove_role(self, role_id: str) -> None:
+		"""Удалить роль вместе со связями с людьми."""
+		self.roles = [r for r in self.roles if r.id != role_id]
+		if self.eligibility.keys_of_role(role_id):
+			self.person_production_roles = [ppr for ppr in self.person_production_roles if ppr.role_id != role_id]
+		self.eligibility.remove_role(role_id)
+
+	def set_person_production_role(self, ppr: PersonProductionRole) -> None:
+		"""Добавить связь человек-роль или обновить can_play существующей (без пересборки списка)."""
+		existing = self.eligibility.get(ppr.person_id, ppr.production_id, ppr.role_id)
+		if existing is not None:
+			existing.can_play = ppr.can_play
+			self.eligibility.refresh(ppr.person_id, ppr.production_id, ppr.role_id)
+		else:
+			self.person_production_roles.append(ppr)
+			self.eligibility.add_person_production_role(ppr)
+
+	def remove_person_production_roles(self, keys: List[PPRKey]) -> None:
+		"""Удалить связи по ключам (person_id, production_id, role_id) одним проходом по списку."""
+		present = {key for key in keys if self.eligibility.get(*key) is not None}
+		if not present:
+			return
+		self.person_production_roles = [
+			ppr for ppr in self.person_production_roles
+			if (ppr.person_id, ppr.production_id, ppr.role_id) not in present
+		]
+		for key in present:
+			self.eligibility.remove_person_production_role(key)
+
+
+# (person_id, production_id, role_id)
+PPRKey = Tuple[str, str, str]
+
+
+class EligibilityIndex:
+	"""Индекс "кто какую роль может играть" для одного сценария.
+
+	Хранит словари по id людей, ролей и постановок, связи человек-роль по
+	ключу (person_id, production_id, role_id), а также для допущенных связей
+	(can_play и человек есть в сценарии): роль → люди и человек → роли.
+	Обновляется инкрементально методами Scenario.add_person/remove_person/
+	add_role/remove_role/set_person_production_role/remove_person_production_roles.
+	"""
+	def __init__(self, scenario: Scenario) -> None:
+		self.people: Dict[str, Person] = {p.id: p for p in scenario.people}
+		self.roles: Dict[str, Role] = {}
+		self.production_ids: Set[str] = {p.id for p in scenario.productions}
+		self._roles_by_production: Dict[str, Dict[str, Role]] = defaultdict(dict)
+		self._pprs: Dict[PPRKey, PersonProductionRole] = {}
+		self._keys_by_person: Dict[str, Set[PPRKey]] = defaultdict(set)
+		self._keys_by_role: Dict[str, Set[PPRKey]] = defaultdict(set)
+		# (production_id, role_id) -> {person_id: None}; словарь как упорядоченное множество
+		self._eligible: Dict[Tuple[str, str], Dict[str, None]] = defaultdict(dict)
+		# person_id -> {(production_id, role_id): None}
+		self._person_roles: Dict[str, Dict[Tuple[str, str], None]] = defaultdict(dict)
+		for role in scenario.roles:
+			self.add_role(role)
+		for ppr in scenario.person_production_roles:
+			self.add_person_production_role(ppr)
+
+	# Чтение
+
+	def get(self, person_id: str, production_id: str, role_id: str) -> Optional[PersonProductionRole]:
+		return self._pprs.get((person_id, production_id, role_id))
+
+	def can_play(self, person_id: str, production_id: str, role_id: str) -> bool:
+		ppr = self._pprs.get((person_id, production_id, role_id))
+		return ppr is not None and ppr.can_play
+
+	def eligible_people(self, production_id: str, role_id: str) -> List[str]:
+		"""Id людей, допущенных к роли (в порядке добавления связей)."""
+		return list(self._eligible.get((production_id, role_id), ()))
+
+	def roles_of_person(self, person_id: str) -> List[Tuple[str, str]]:
+		"""(production_id, role_id) ролей, к которым допущен человек."""
+		return list(self._person_roles.get(person_id, ()))
+
+	def roles_of_production(self, production_id: str) -> List[Role]:
+		return list(self._roles_by_production.get(production_id, {}).values())
+
+	def keys_of_person(self, person_id: str) -> Set[PPRKey]:
+		return self._keys_by_person.get(person_id, set())
+
+	def keys_of_role(self, role_id: str) -> Set[PPRKey]:
+		return self._keys_by_role.get(role_id, set())
+
+	# Обновление (вызывается из методов Scenario)
+
+	def add_person(self, person: Person) -> None:
+		self.people[person.id] = person
+		for key in self._keys_by_person.get(person.id, ()):
+			self.refresh(*key)
+
+	def remove_person(self, person_id: str) -> None:
+		self.people.pop(person_id, None)
+		for key in self._keys_by_person.pop(person_id, set()):
+			self._pprs.pop(key, None)
+			self._keys_by_role[key[2]].discard(key)
+			self._eligible[(key[1], key[2])].pop(person_id, None)
+		self._person_roles.pop(person_id, None)
+
+	def add_role(self, role: Role) -> None:
+		self.roles[role.id] = role
+		self._roles_by_production[role.production_id][role.id] = role
+
+	def remove_role(self, role_id: str) -> None:
+		role = self.roles.pop(role_id, None)
+		if role is not None:
+			self._roles_by_production[role.production_id].pop(role_id, None)
+		for key in self._keys_by_role.pop(role_id, set()):
+			self._pprs.pop(key, None)
+			self._keys_by_person[key[0]].discard(key)
+			self._eligible.pop((key[1], role_id), None)
+			self._person_roles[key[0]].pop((key[1], role_id), None)
+
+	def add_person_production_role(self, ppr: PersonProductionRole) -> None:
+		key = (ppr.person_id, ppr.production_id, ppr.role_id)
+		self._pprs[key] = ppr
+		self._keys_by_person[ppr.person_id].add(key)
+		self._keys_by_role[ppr.role_id].add(key)
+		self.refresh(*key)
+
+	def remove_person_production_role(self, key: PPRKey) -> None:
+		person_id, production_id, role_id = key
+		if self._pprs.pop(key, None) is None:
+			return
+		self._keys_by_person[person_id].discard(key)
+		self._keys_by_role[role_id].discard(key)
+		self._eligible[(production_id, role_id)].pop(person_id, None)
+		self._person_roles[person_id].pop((production_id, role_id), None)
+
+	def refresh(self, person_id: str, production_id: str, role_id: str) -> None:
+		"""Пересчитать допуск по одной связи после изменения can_play или состава людей."""
+		if self.can_play(person_id, production_id, role_id) and person_id in self.people:
+			self._eligible[(production_id, role_id)][person_id] = None
+			self._person_roles[person_id][(production_id, role_id)] = None
+		else:
+			self._eligible[(production_id, role_id)].pop(person_id, None)
+			self._person_roles[person_id].pop((production_id, role_id), None)
+
 
 # Классы для хранения составленного расписания
 
 @dataclass
+class SolveStats:
+	"""Статистика одного решения: время по фазам, размер модели и поиск CP-SAT.
+
+	При решении по сценам (decompose_by_stage) части идут параллельно:
+	время фаз — максимум по частям, счётчики, цель и граница — суммы.
+	"""
+	build_seconds: float = 0.0     # построение модели CP-SAT
+	solve_seconds: float = 0.0     # CpSolver.Solve (WallTime)
+	extract_seconds: float = 0.0   # извлечение расписания из решения
+	assign_seconds: float = 0.0    # распределение людей по ролям
+	total_seconds: float = 0.0     # весь MinimalCPSATSolver.solve
+	solver_status: str = ""        # статус CP-SAT: OPTIMAL, FEASIBLE, INFEASIBLE, UNKNOWN, ...
+	num_variables: int = 0
+	num_constraints: int = 0
+	# Семейство ограничений -> {"variables": ..., "constraints": ...}
+	families: Dict[str, Dict[str, int]] = field(default_factory=dict)
+	num_branches: int = 0
+	num_conflicts: int = 0
+	objective_value: Optional[float] = None
+	best_objective_bound: Optional[float] = None
+	gap: Optional[float] = None    # |граница - цель| / max(1, |цель|)
+	num_search_workers: int = 0
+	time_limit_seconds: float = 0.0
+	num_parts: int = 1             # число подзадач (сцен) при decompose_by_stage
+	# Почему закончился поиск: optimal, infeasible, time_limit, cancelled,
+	# gap, no_improvement или first_feasible (см. StopParams)
+	stop_reason: str = ""
+	# Сцены, закреплённые по прошлому результату (fix_unchanged_stages): при
+	# них оптимальность — только при закреплённых сценах (optimal_restricted)
+	pinned_stages: List[str] = field(default_factory=list)
+
+
+
+@dataclass(frozen=True, slots=True)
 class ScheduleItem:
-	"""Элемент расписания: одно назначение постановки на сцену и слот."""
+	"""Элемент расписания: одно назначение постановки на сцену и слот (неизменяемый, без __dict__)."""
 	scenario_id: str
 	production_id: str
 	stage_id: str
 	timeslot_id: str
 	revenue: float
 
+	def __post_init__(self) -> None:
+		_intern_ids(self, ("scenario_id", "production_id", "stage_id", "timeslot_id"))
+
+	@property
+	def schedule_item_id(self) -> str:
+		"""ID элемента расписания: production_id|stage_id|timeslot_id."""
+		return f"{self.production_id}|{self.stage_id}|{self.timeslot_id}"
+
 
 @dataclass
 class ScenarioResult:
@@ -118,6 +402,39 @@ class ScenarioResult:
 	objective_value: float
 	status: str
 	assignments: List[Assignment] = field(default_factory=list)  # Назначения людей на роли
+	stage_fingerprints: Dict[str, str] = field(default_factory=dict)  # Отпечатки входных данных по сценам (для тёплого старта)
+	from_cache: bool = False  # Результат взят из кэша решений, а не получен решателем
+	# При дозаполнении назначений: {"added": [...], "removed": [...]} относительно прошлого результата
+	assignment_diff: Dict[str, List[Assignment]] = field(default_factory=dict)
+	# Меняется при каждом изменении результата (ключ кэшей представлений и ETag)
+	revision: str = field(default_factory=lambda: uuid.uuid4().hex)
+	stats: Optional[SolveStats] = None  # Статистика решения (для результата из кэша — исходного решения)
+
+	def touch(self) -> None:
+		"""Отметить, что результат изменён (новая ревизия)."""
+		self.revision = uuid.uuid4().hex
+
+	@property
+	def positions(self) -> Dict[Tuple[str, str], List[Assignment]]:
+		"""Назначения по (schedule_item_id, role_id); строится при первом обращении."""
+		index = self.__dict__.get("_positions")
+		if index is None:
+			index = defaultdict(list)
+			for a in self.assignments:
+				index[(a.schedule_item_id, a.role_id)].append(a)
+			self.__dict__["_positions"] = index
+		return index
+
+	def add_assignment(self, assignment: Assignment) -> None:
+		self.assignments.append(assignment)
+		self.positions[(assignment.schedule_item_id, assignment.role_id)].append(assignment)
+		self.touch()
+
+	def set_assignments(self, assignments: List[Assignment]) -> None:
+		"""Заменить список назначений (индекс positions перестроится при обращении)."""
+		self.assignments = assignments
+		self.__dict__.pop("_positions", None)
+		self.touch()
 
 
 # Модели для управления людьми и ролями
@@ -149,11 +466,15 @@ class PersonProductionRole:
 	can_play: bool = True  # Может ли этот человек играть эту роль в этом спектакле
 
 
-@dataclass
+@dataclass(slots=True)
 class Assignment:
-	"""Назначение человека на роль/дирижера для конкретного показа."""
+	"""Назначение человека на роль/дирижера для конкретного показа.
+
+	Назначений в результатах больше всего, поэтому объект без __dict__,
+	id интернированы, а schedule_item_id не хранится, а выводится из полей.
+	Изменяемый: ручная правка меняет person_id на месте.
+	"""
 	scenario_id: str
-	schedule_item_id: str  # ID элемента расписания (production_id|stage_id|timeslot_id)
 	production_id: str
 	timeslot_id: str
 	stage_id: str
@@ -161,4 +482,34 @@ class Assignment:
 	role_id: str
 	is_conductor: bool = False
 
+	def __post_init__(self) -> None:
+		# Без цикла по именам полей: назначения создаются сотнями тысяч
+		self.scenario_id = sys.intern(self.scenario_id)
+		self.production_id = sys.intern(self.production_id)
+		self.timeslot_id = sys.intern(self.timeslot_id)
+		self.stage_id = sys.intern(self.stage_id)
+		self.person_id = sys.intern(self.person_id)
+		self.role_id = sys.intern(self.role_id)
+
+	@property
+	def schedule_item_id(self) -> str:
+		"""ID элемента расписания: production_id|stage_id|timeslot_id."""
+		return f"{self.production_id}|{self.stage_id}|{self.timeslot_id}"
+
+
+@dataclass
+class SolveJob:
+	"""Фоновая задача решения сценария."""
+	id: str
+	scenario_id: str
+	kind: str = "solve"                     # solve — решение сценария, variants — пакет вариантов (/variants)
+	state: str = "queued"                   # queued | running | done | failed | cancelled
+	created_at: float = 0.0                 # Время постановки в очередь (unix time)
+	started_at: Optional[float] = None      # Время начала решения
+	finished_at: Optional[float] = None     # Время завершения
+	result_status: Optional[str] = None     # Статус результата решателя (optimal/optimal_restricted/feasible/infeasible/cancelled)
+	objective_value: Optional[float] = None
+	cache: Optional[str] = None             # hit — результат из кэша решений, miss — решён заново
+	stop_reason: Optional[str] = None       # Почему закончился поиск (см. SolveStats.stop_reason)
+	error: Optional[str] = None
 
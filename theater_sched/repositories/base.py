@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from typing import Optional, Protocol
+
+from theater_sched.domain.models import Scenario, ScenarioResult
+
+
+class ScenarioRepository(Protocol):
+	"""Интерфейс хранилища сценариев и результатов (см. InMemoryRepository, SqliteRepository)."""
+	def save_scenario(self, scenario: Scenario) -> None: ...
+
+	def get_scenario(self, scenario_id: str) -> Optional[Scenario]: ...
+
+	def set_scenario_status(self, scenario_id: str, status: str) -> None: ...
+
+	def save_result(self, result: ScenarioResult) -> None: ...
+
+	def get_result(self, scenario_id: str) -> Optional[ScenarioResult]: ...
+
+	def get_result_revision(self, scenario_id: str) -> Optional[str]: ...
@@ -1,31 +1,240 @@
 from __future__ import annotations
 
-from typing import Dict, Optional
+import os
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
 
 from theater_sched.domain.models import Scenario, ScenarioResult
 
 
+@dataclass
+class _Entry:
+	value: Any
+	size: int            # Оценка размера в байтах (0, если лимит по памяти не задан)
+	last_access: float   # time.monotonic() последнего чтения/записи
+	resaves: int = 0     # Сохранений того же объекта (правок на месте) после измерения size
+
+
+# После стольких правок на месте размер записи перемеряется, даже если лимит не превышен
+REMEASURE_AFTER_RESAVES = 64
+
+
+def _measure(value: Any) -> int:
+	return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
 class InMemoryRepository:
 	"""Простейшее in-memory хранилище сценариев и результатов.
 
 	Подходит для MVP/демо. В продакшне заменить на БД/персистентное хранилище.
+
+	Сценарии и результаты лежат в общем LRU-кэше с необязательными
+	ограничениями: max_entries (число записей), max_bytes (оценка по размеру
+	pickle) и ttl_seconds (время с последнего обращения). Размер измеряется
+	при вставке нового объекта; повторное сохранение того же объекта после
+	правки на месте сохраняет прежнюю оценку, а уточняется она при вставке
+	новой записи, когда сумма оценок превышает max_bytes, или после
+	REMEASURE_AFTER_RESAVES правок.
+	Вытесненные записи
+	либо удаляются, либо, если задан spill_dir, сбрасываются на диск и
+	поднимаются обратно при следующем чтении. Запись на диск идёт после
+	освобождения lock: пока файл пишется, запись лежит в очереди сброса и
+	читается оттуда. Без ограничений ведёт себя как обычный словарь.
 	"""
-	def __init__(self) -> None:
-		self._scenarios: Dict[str, Scenario] = {}
-		self._results: Dict[str, ScenarioResult] = {}
+	def __init__(
+		self,
+		max_entries: Optional[int] = None,
+		max_bytes: Optional[int] = None,
+		ttl_seconds: Optional[float] = None,
+		spill_dir: Optional[str] = None,
+	) -> None:
+		self._max_entries = max_entries
+		self._max_bytes = max_bytes
+		self._ttl_seconds = ttl_seconds
+		self._spill_dir = spill_dir
+		if spill_dir:
+			os.makedirs(spill_dir, exist_ok=True)
+		self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+		self._bytes = 0
+		self._counters: Counter = Counter()
+		self._lock = threading.RLock()
+		# Вытесненные, но ещё не записанные на диск значения (сбрасываются вне _lock)
+		self._pending_spills: Dict[Tuple[str, str], Any] = {}
+		self._spill_lock = threading.Lock()
 
 	def save_scenario(self, scenario: Scenario) -> None:
 		"""Сохранить/обновить сценарий по его id."""
-		self._scenarios[scenario.id] = scenario
+		self._put(("scenario", scenario.id), scenario)
 
 	def get_scenario(self, scenario_id: str) -> Optional[Scenario]:
 		"""Вернуть сценарий по id, либо None, если не найден."""
-		return self._scenarios.get(scenario_id)
+		return self._get(("scenario", scenario_id))
+
+	def set_scenario_status(self, scenario_id: str, status: str) -> None:
+		"""Сменить только статус сценария (остальные поля не перезаписываются)."""
+		scenario = self._get(("scenario", scenario_id))
+		if scenario is not None:
+			scenario.status = status
 
 	def save_result(self, result: ScenarioResult) -> None:
 		"""Сохранить результат решения для сценария."""
-		self._results[result.scenario_id] = result
+		self._put(("result", result.scenario_id), result)
 
 	def get_result(self, scenario_id: str) -> Optional[ScenarioResult]:
 		"""Вернуть результат для сценария, либо None, если не найден."""
-		return self._results.get(scenario_id)
\ No newline at end of file
+		return self._get(("result", scenario_id))
+
+	def get_result_revision(self, scenario_id: str) -> Optional[str]:
+		"""Ревизия сохранённого результата, либо None."""
+		result = self.get_result(scenario_id)
+		return result.revision if result else None
+
+	def stats(self) -> Dict:
+		"""Счётчики кэша: попадания, промахи, вытеснения, сброс на диск, занятая память."""
+		with self._lock:
+			return {
+				"entries": len(self._entries),
+				"estimated_bytes": self._bytes,
+				"max_entries": self._max_entries,
+				"max_bytes": self._max_bytes,
+				"ttl_seconds": self._ttl_seconds,
+				"hits": self._counters["hits"],
+				"misses": self._counters["misses"],
+				"evictions": self._counters["evictions"],
+				"expirations": self._counters["expirations"],
+				"spilled": self._counters["spilled"],
+				"spill_hits": self._counters["spill_hits"],
+				"size_measurements": self._counters["size_measurements"],
+			}
+
+	def _put(self, key: Tuple[str, str], value: Any) -> None:
+		with self._lock:
+			old = self._entries.get(key)
+			# Тот же объект после правки на месте (люди, роли): не сериализуем весь сценарий заново
+			resaves = old.resaves + 1 if old is not None and old.value is value else 0
+		measure = bool(self._max_bytes) and (resaves == 0 or resaves >= REMEASURE_AFTER_RESAVES)
+		size = _measure(value) if measure else 0
+		with self._lock:
+			old = self._entries.pop(key, None)
+			if old is not None:
+				self._bytes -= old.size
+			if measure:
+				resaves = 0
+				self._counters["size_measurements"] += 1
+			elif self._max_bytes:
+				size = old.size if old is not None and old.value is value else 0
+				resaves = max(resaves, 1)  # запись без оценки перемеряется при проверке лимита
+			self._entries[key] = _Entry(value=value, size=size, last_access=time.monotonic(), resaves=resaves)
+			self._bytes += size
+			self._pending_spills.pop(key, None)
+			self._discard_spilled(key)
+			# Новая запись может вытеснить другие: перед этим уточняем их устаревшие оценки
+			self._enforce_limits(refresh=measure)
+		self._write_spills()
+
+	def _get(self, key: Tuple[str, str]) -> Any:
+		with self._lock:
+			self._expire()
+			entry = self._entries.get(key)
+			if entry is not None:
+				entry.last_access = time.monotonic()
+				self._entries.move_to_end(key)
+				self._counters["hits"] += 1
+				value = entry.value
+			else:
+				value = self._pending_spills.pop(key, None)
+				if value is None:
+					value = self._load_spilled(key)
+				if value is None:
+					self._counters["misses"] += 1
+				else:
+					self._counters["spill_hits"] += 1
+		if value is None or entry is not None:
+			self._write_spills()  # _expire мог вытеснить записи
+			return value
+		self._put(key, value)
+		return value
+
+	def _enforce_limits(self, refresh: bool = False) -> None:
+		"""Вытеснить самые давно используемые записи сверх лимитов (под lock)."""
+		self._expire()
+		if self._max_bytes is not None and (refresh or self._bytes > self._max_bytes):
+			self._refresh_sizes()
+		while self._entries and (
+			(self._max_entries is not None and len(self._entries) > self._max_entries)
+			or (self._max_bytes is not None and self._bytes > self._max_bytes and len(self._entries) > 1)
+		):
+			self._evict_oldest("evictions")
+
+	def _refresh_sizes(self) -> None:
+		"""Перемерить записи, изменённые на месте с последнего измерения (под lock)."""
+		for entry in self._entries.values():
+			if entry.resaves:
+				size = _measure(entry.value)
+				self._bytes += size - entry.size
+				entry.size, entry.resaves = size, 0
+				self._counters["size_measurements"] += 1
+
+	def _expire(self) -> None:
+		"""Вытеснить записи, к которым не обращались дольше ttl_seconds (под lock)."""
+		if self._ttl_seconds is None:
+			return
+		deadline = time.monotonic() - self._ttl_seconds
+		while self._entries and next(iter(self._entries.values())).last_access < deadline:
+			self._evict_oldest("expirations")
+
+	def _evict_oldest(self, reason: str) -> None:
+		"""Вытеснить самую давнюю запись (под lock); на диск её запишет _write_spills."""
+		key, entry = self._entries.popitem(last=False)
+		self._bytes -= entry.size
+		self._counters[reason] += 1
+		if self._spill_dir:
+			self._pending_spills[key] = entry.value
+
+	def _write_spills(self) -> None:
+		"""Записать на диск вытесненные значения из очереди сброса (вне _lock)."""
+		if not self._spill_dir:
+			return
+		with self._spill_lock:
+			with self._lock:
+				pending = list(self._pending_spills.items())
+			for key, value in pending:
+				path = self._spill_path(key)
+				with open(f"{path}.tmp", "wb") as f:
+					pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+				with self._lock:
+					if self._pending_spills.get(key) is value:
+						os.replace(f"{path}.tmp", path)
+						del self._pending_spills[key]
+						self._counters["spilled"] += 1
+					else:
+						# Пока писали, значение прочитали обратно или сохранили заново
+						os.remove(f"{path}.tmp")
+
+	def _spill_path(self, key: Tuple[str, str]) -> str:
+		kind, item_id = key
+		safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in item_id)
+		return os.path.join(self._spill_dir, f"{kind}-{safe_id}.pkl")
+
+	def _load_spilled(self, key: Tuple[str, str]) -> Any:
+		if not self._spill_dir:
+			return None
+		path = self._spill_path(key)
+		try:
+			with open(path, "rb") as f:
+				value = pickle.load(f)
+		except FileNotFoundError:
+			return None
+		os.remove(path)
+		return value
+
+	def _discard_spilled(self, key: Tuple[str, str]) -> None:
+		if self._spill_dir:
+			try:
+				os.remove(self._spill_path(key))
+			except FileNotFoundError:
+				pass
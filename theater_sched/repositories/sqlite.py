@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Iterator, Optional
+
+from theater_sched.domain.models import (
+	Assignment,
+	Constraints,
+	FixedAssignment,
+	Person,
+	PersonProductionRole,
+	Production,
+	Role,
+	Scenario,
+	ScenarioParams,
+	ScenarioResult,
+	ScheduleItem,
+	SolveStats,
+	SolverParams,
+	Stage,
+	StopParams,
+	TimeSlot,
+)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+	id TEXT PRIMARY KEY,
+	status TEXT NOT NULL,
+	params TEXT NOT NULL,
+	revenue TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	id TEXT NOT NULL,
+	name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS productions (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	id TEXT NOT NULL,
+	title TEXT NOT NULL,
+	stage_id TEXT NOT NULL,
+	max_shows INTEGER NOT NULL,
+	weekend_priority INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS timeslots (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	id TEXT NOT NULL,
+	stage_id TEXT NOT NULL,
+	date TEXT NOT NULL,
+	day_of_week INTEGER NOT NULL,
+	start_time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fixed_assignments (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	production_id TEXT NOT NULL,
+	timeslot_id TEXT NOT NULL,
+	stage_id TEXT NOT NULL,
+	date TEXT NOT NULL,
+	start_time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS people (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	id TEXT NOT NULL,
+	name TEXT NOT NULL,
+	email TEXT
+);
+CREATE TABLE IF NOT EXISTS roles (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	id TEXT NOT NULL,
+	name TEXT NOT NULL,
+	production_id TEXT NOT NULL,
+	is_conductor INTEGER NOT NULL,
+	required_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS person_production_roles (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	person_id TEXT NOT NULL,
+	production_id TEXT NOT NULL,
+	role_id TEXT NOT NULL,
+	can_play INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+	scenario_id TEXT PRIMARY KEY,
+	objective_value REAL NOT NULL,
+	status TEXT NOT NULL,
+	stage_fingerprints TEXT NOT NULL,
+	revision TEXT NOT NULL DEFAULT '',
+	stats TEXT,
+	assignment_diff TEXT,
+	from_cache INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS schedule_items (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	production_id TEXT NOT NULL,
+	stage_id TEXT NOT NULL,
+	timeslot_id TEXT NOT NULL,
+	revenue REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assignments (
+	scenario_id TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	schedule_item_id TEXT NOT NULL,
+	production_id TEXT NOT NULL,
+	timeslot_id TEXT NOT NULL,
+	stage_id TEXT NOT NULL,
+	person_id TEXT NOT NULL,
+	role_id TEXT NOT NULL,
+	is_conductor INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_stages_scenario ON stages (scenario_id, position);
+CREATE INDEX IF NOT EXISTS ix_productions_scenario ON productions (scenario_id, position);
+CREATE INDEX IF NOT EXISTS ix_timeslots_scenario ON timeslots (scenario_id, position);
+CREATE INDEX IF NOT EXISTS ix_fixed_assignments_scenario ON fixed_assignments (scenario_id, position);
+CREATE INDEX IF NOT EXISTS ix_people_scenario ON people (scenario_id, position);
+CREATE INDEX IF NOT EXISTS ix_roles_scenario ON roles (scenario_id, position);
+CREATE INDEX IF NOT EXISTS ix_ppr_scenario ON person_production_roles (scenario_id, position);
+CREATE INDEX IF NOT EXISTS ix_schedule_items_scenario ON schedule_items (scenario_id, position);
+CREATE INDEX IF NOT EXISTS ix_assignments_scenario ON assignments (scenario_id, position);
+"""
+
+# Дочерние таблицы сценария и результата (удаляются и перезаписываются целиком при сохранении)
+_SCENARIO_TABLES = (
+	"stages", "productions", "timeslots", "fixed_assignments",
+	"people", "roles", "person_production_roles",
+)
+_RESULT_TABLES = ("schedule_items", "assignments")
+
+
+class SqliteRepository:
+	"""Хранилище сценариев и результатов в SQLite (нормализованные таблицы, WAL).
+
+	Интерфейс совпадает с InMemoryRepository. Каждый поток получает своё
+	соединение; режим WAL позволяет нескольким процессам (воркерам uvicorn)
+	читать базу одновременно с записью. Сценарий и результат читаются
+	несколькими запросами в одной транзакции, поэтому запись другого
+	процесса между ними не даёт смеси двух версий.
+	"""
+	def __init__(self, path: str = "theater_sched.db") -> None:
+		self._path = path
+		self._local = threading.local()
+		with self._connect() as conn:
+			conn.executescript(_SCHEMA)
+			# Базы, созданные до появления ревизий результата
+			columns = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+			if "revision" not in columns:
+				conn.execute("ALTER TABLE results ADD COLUMN revision TEXT NOT NULL DEFAULT ''")
+			if "stats" not in columns:
+				conn.execute("ALTER TABLE results ADD COLUMN stats TEXT")
+			if "assignment_diff" not in columns:
+				conn.execute("ALTER TABLE results ADD COLUMN assignment_diff TEXT")
+			if "from_cache" not in columns:
+				conn.execute("ALTER TABLE results ADD COLUMN from_cache INTEGER NOT NULL DEFAULT 0")
+
+	def _connect(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(self._path, timeout=30.0)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute("PRAGMA foreign_keys=OFF")
+			self._local.conn = conn
+		return conn
+
+	@contextmanager
+	def _snapshot(self) -> Iterator[sqlite3.Connection]:
+		"""Транзакция чтения: все запросы внутри видят одну версию базы."""
+		conn = self._connect()
+		conn.execute("BEGIN")
+		try:
+			yield conn
+		finally:
+			conn.commit()
+
+	def save_scenario(self, scenario: Scenario) -> None:
+		"""Сохранить/обновить сценарий по его id."""
+		sid = scenario.id
+		with self._connect() as conn:
+			conn.execute(
+				"INSERT OR REPLACE INTO scenarios (id, status, params, revenue) VALUES (?, ?, ?, ?)",
+				(sid, scenario.status, json.dumps(asdict(scenario.params)), json.dumps(scenario.revenue)),
+			)
+			for table in _SCENARIO_TABLES:
+				conn.execute(f"DELETE FROM {table} WHERE scenario_id = ?", (sid,))
+			conn.executemany(
+				"INSERT INTO stages VALUES (?, ?, ?, ?)",
+				[(sid, i, st.id, st.name) for i, st in enumerate(scenario.stages)],
+			)
+			conn.executemany(
+				"INSERT INTO productions VALUES (?, ?, ?, ?, ?, ?, ?)",
+				[
+					(sid, i, p.id, p.title, p.stage_id, p.max_shows, int(p.weekend_priority))
+					for i, p in enumerate(scenario.productions)
+				],
+			)
+			conn.executemany(
+				"INSERT INTO timeslots VALUES (?, ?, ?, ?, ?, ?, ?)",
+				[
+					(sid, i, t.id, t.stage_id, t.date, t.day_of_week, t.start_time)
+					for i, t in enumerate(scenario.timeslots)
+				],
+			)
+			conn.executemany(
+				"INSERT INTO fixed_assignments VALUES (?, ?, ?, ?, ?, ?, ?)",
+				[
+					(sid, i, fa.production_id, fa.timeslot_id, fa.stage_id, fa.date, fa.start_time)
+					for i, fa in enumerate(scenario.fixed_assignments or [])
+				],
+			)
+			conn.executemany(
+				"INSERT INTO people VALUES (?, ?, ?, ?, ?)",
+				[(sid, i, p.id, p.name, p.email) for i, p in enumerate(scenario.people)],
+			)
+			conn.executemany(
+				"INSERT INTO roles VALUES (?, ?, ?, ?, ?, ?, ?)",
+				[
+					(sid, i, r.id, r.name, r.production_id, int(r.is_conductor), r.required_count)
+					for i, r in enumerate(scenario.roles)
+				],
+			)
+			conn.executemany(
+				"INSERT INTO person_production_roles VALUES (?, ?, ?, ?, ?, ?)",
+				[
+					(sid, i, ppr.person_id, ppr.production_id, ppr.role_id, int(ppr.can_play))
+					for i, ppr in enumerate(scenario.person_production_roles)
+				],
+			)
+
+	def set_scenario_status(self, scenario_id: str, status: str) -> None:
+		"""Сменить только статус сценария: люди и роли, изменённые во время решения, не перезаписываются."""
+		with self._connect() as conn:
+			conn.execute("UPDATE scenarios SET status = ? WHERE id = ?", (status, scenario_id))
+
+	def get_scenario(self, scenario_id: str) -> Optional[Scenario]:
+		"""Вернуть сценарий по id, либо None, если не найден."""
+		with self._snapshot() as conn:
+			return self._read_scenario(conn, scenario_id)
+
+	def _read_scenario(self, conn: sqlite3.Connection, scenario_id: str) -> Optional[Scenario]:
+		row = conn.execute(
+			"SELECT status, params, revenue FROM scenarios WHERE id = ?", (scenario_id,)
+		).fetchone()
+		if row is None:
+			return None
+		status, params_json, revenue_json = row
+		params = json.loads(params_json)
+		params["constraints"] = Constraints(**params.get("constraints", {}))
+		params["solver"] = SolverParams(**params.get("solver", {}))
+		params["stop"] = StopParams(**params.get("stop", {}))
+
+		def rows(table: str, columns: str):
+			return conn.execute(
+				f"SELECT {columns} FROM {table} WHERE scenario_id = ? ORDER BY position", (scenario_id,)
+			).fetchall()
+
+		return Scenario(
+			id=scenario_id,
+			productions=[
+				Production(id=r[0], title=r[1], stage_id=r[2], max_shows=r[3], weekend_priority=bool(r[4]))
+				for r in rows("productions", "id, title, stage_id, max_shows, weekend_priority")
+			],
+			stages=[Stage(id=r[0], name=r[1]) for r in rows("stages", "id, name")],
+			timeslots=[
+				TimeSlot(id=r[0], stage_id=r[1], date=r[2], day_of_week=r[3], start_time=r[4])
+				for r in rows("timeslots", "id, stage_id, date, day_of_week, start_time")
+			],
+			revenue=json.loads(revenue_json),
+			params=ScenarioParams(**params),
+			fixed_assignments=[
+				FixedAssignment(production_id=r[0], timeslot_id=r[1], stage_id=r[2], date=r[3], start_time=r[4])
+				for r in rows("fixed_assignments", "production_id, timeslot_id, stage_id, date, start_time")
+			],
+			status=status,
+			people=[Person(id=r[0], name=r[1], email=r[2]) for r in rows("people", "id, name, email")],
+			roles=[
+				Role(id=r[0], name=r[1], production_id=r[2], is_conductor=bool(r[3]), required_count=r[4])
+				for r in rows("roles", "id, name, production_id, is_conductor, required_count")
+			],
+			person_production_roles=[
+				PersonProductionRole(person_id=r[0], production_id=r[1], role_id=r[2], can_play=bool(r[3]))
+				for r in rows("person_production_roles", "person_id, production_id, role_id, can_play")
+			],
+		)
+
+	def save_result(self, result: ScenarioResult) -> None:
+		"""Сохранить результат решения для сценария."""
+		sid = result.scenario_id
+		with self._connect() as conn:
+			conn.execute(
+				"INSERT OR REPLACE INTO results "
+				"(scenario_id, objective_value, status, stage_fingerprints, revision, stats, assignment_diff, from_cache) "
+				"VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+				(
+					sid, result.objective_value, result.status, json.dumps(result.stage_fingerprints), result.revision,
+					json.dumps(asdict(result.stats)) if result.stats is not None else None,
+					# Изменения назначений нужны процессу API, если решал отдельный воркер
+					json.dumps({k: [asdict(a) for a in v] for k, v in result.assignment_diff.items()})
+					if result.assignment_diff else None,
+					int(result.from_cache),
+				),
+			)
+			for table in _RESULT_TABLES:
+				conn.execute(f"DELETE FROM {table} WHERE scenario_id = ?", (sid,))
+			conn.executemany(
+				"INSERT INTO schedule_items VALUES (?, ?, ?, ?, ?, ?)",
+				[
+					(sid, i, it.production_id, it.stage_id, it.timeslot_id, it.revenue)
+					for i, it in enumerate(result.schedule)
+				],
+			)
+			conn.executemany(
+				"INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				[
+					(
+						sid, i, a.schedule_item_id, a.production_id, a.timeslot_id,
+						a.stage_id, a.person_id, a.role_id, int(a.is_conductor),
+					)
+					for i, a in enumerate(result.assignments)
+				],
+			)
+
+	def get_result(self, scenario_id: str) -> Optional[ScenarioResult]:
+		"""Вернуть результат для сценария, либо None, если не найден."""
+		with self._snapshot() as conn:
+			return self._read_result(conn, scenario_id)
+
+	def _read_result(self, conn: sqlite3.Connection, scenario_id: str) -> Optional[ScenarioResult]:
+		row = conn.execute(
+			"SELECT objective_value, status, stage_fingerprints, revision, stats, assignment_diff, from_cache "
+			"FROM results WHERE scenario_id = ?",
+			(scenario_id,),
+		).fetchone()
+		if row is None:
+			return None
+		objective_value, status, fingerprints_json, revision, stats_json, diff_json, from_cache = row
+		schedule = [
+			ScheduleItem(scenario_id=scenario_id, production_id=r[0], stage_id=r[1], timeslot_id=r[2], revenue=r[3])
+			for r in conn.execute(
+				"SELECT production_id, stage_id, timeslot_id, revenue FROM schedule_items "
+				"WHERE scenario_id = ? ORDER BY position",
+				(scenario_id,),
+			)
+		]
+		assignments = [
+			Assignment(
+				scenario_id=scenario_id,
+				production_id=r[0],
+				timeslot_id=r[1],
+				stage_id=r[2],
+				person_id=r[3],
+				role_id=r[4],
+				is_conductor=bool(r[5]),
+			)
+			for r in conn.execute(
+				"SELECT production_id, timeslot_id, stage_id, person_id, role_id, is_conductor "
+				"FROM assignments WHERE scenario_id = ? ORDER BY position",
+				(scenario_id,),
+			)
+		]
+		return ScenarioResult(
+			scenario_id=scenario_id,
+			schedule=schedule,
+			objective_value=objective_value,
+			status=status,
+			assignments=assignments,
+			stage_fingerprints=json.loads(fingerprints_json),
+			from_cache=bool(from_cache),
+			revision=revision,
+			stats=SolveStats(**json.loads(stats_json)) if stats_json else None,
+			assignment_diff={
+				k: [Assignment(**a) for a in v] for k, v in json.loads(diff_json).items()
+			} if diff_json else {},
+		)
+
+	def get_result_revision(self, scenario_id: str) -> Optional[str]:
+		"""Ревизия сохранённого результата без загрузки расписания и назначений."""
+		row = self._connect().execute(
+			"SELECT revision FROM results WHERE scenario_id = ?", (scenario_id,)
+		).fetchone()
+		return row[0] if row else None
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+"""
+Очередь задач решения в SQLite: общая для всех процессов API и воркеров решателя.
+
+Процессы API ставят задачи и читают их состояние, процессы воркеров
+(theater_sched.worker) забирают задачи из очереди, решают и записывают
+итог вместе с результатом именно этой задачи (для пакета вариантов — отчёт
+сравнения). Отмена и промежуточные решения тоже передаются через базу. Воркер,
+решающий задачу, регулярно отмечается в heartbeat_at: задачи, по которым
+отметок давно нет, считаются брошенными упавшим процессом.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+from theater_sched.domain.models import Assignment, ScenarioResult, ScheduleItem, SolveJob, SolveStats
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+	id TEXT PRIMARY KEY,
+	scenario_id TEXT NOT NULL,
+	state TEXT NOT NULL,
+	created_at REAL NOT NULL,
+	started_at REAL,
+	finished_at REAL,
+	result_status TEXT,
+	objective_value REAL,
+	cache TEXT,
+	stop_reason TEXT,
+	error TEXT,
+	options TEXT NOT NULL,
+	stream INTEGER NOT NULL DEFAULT 0,
+	cancel_requested INTEGER NOT NULL DEFAULT 0,
+	worker TEXT,
+	heartbeat_at REAL,
+	kind TEXT NOT NULL DEFAULT 'solve',
+	output TEXT
+);
+CREATE TABLE IF NOT EXISTS job_events (
+	job_id TEXT NOT NULL,
+	seq INTEGER NOT NULL,
+	payload TEXT NOT NULL,
+	PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_state ON jobs (state, created_at);
+"""
+
+_JOB_COLUMNS = (
+	"id, scenario_id, state, created_at, started_at, finished_at, "
+	"result_status, objective_value, cache, stop_reason, error, kind"
+)
+
+# Колонки, добавленные после первой версии схемы: (имя, определение)
+_ADDED_COLUMNS = (
+	("heartbeat_at", "REAL"),
+	("kind", "TEXT NOT NULL DEFAULT 'solve'"),
+	("output", "TEXT"),
+)
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+def _job(row: Tuple) -> SolveJob:
+	return SolveJob(
+		id=row[0], scenario_id=row[1], state=row[2], created_at=row[3], started_at=row[4], finished_at=row[5],
+		result_status=row[6], objective_value=row[7], cache=row[8], stop_reason=row[9], error=row[10],
+		kind=row[11],
+	)
+
+
+class SqliteJobStore:
+	"""Задачи решения, флаги отмены и промежуточные решения в SQLite (WAL).
+
+	Как и SqliteRepository, каждый поток получает своё соединение. Задачу
+	забирает ровно один воркер: выбор и смена состояния выполняются в одной
+	транзакции BEGIN IMMEDIATE.
+	"""
+	def __init__(self, path: str = "theater_sched.db", max_finished_jobs: int = 1000) -> None:
+		self._path = path
+		self._max_finished_jobs = max_finished_jobs
+		self._local = threading.local()
+		with self._connect() as conn:
+			conn.executescript(_SCHEMA)
+			# Базы, созданные более ранними версиями
+			columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+			for name, definition in _ADDED_COLUMNS:
+				if name not in columns:
+					conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+	def _connect(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(self._path, timeout=30.0, isolation_level=None)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			self._local.conn = conn
+		return conn
+
+	def add(self, job: SolveJob, options: Dict, stream: bool = False) -> None:
+		"""Поставить задачу в очередь; options — параметры ScenarioService.solve (или варианты для kind=variants)."""
+		conn = self._connect()
+		conn.execute(
+			"INSERT INTO jobs (id, scenario_id, kind, state, created_at, options, stream) VALUES (?, ?, ?, ?, ?, ?, ?)",
+			(job.id, job.scenario_id, job.kind, job.state, job.created_at, json.dumps(options), int(stream)),
+		)
+		self._prune_finished(conn)
+
+	def get(self, job_id: str) -> Optional[SolveJob]:
+		row = self._connect().execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+		return _job(row) if row else None
+
+	def get_many(self, job_ids: List[str]) -> Dict[str, SolveJob]:
+		if not job_ids:
+			return {}
+		marks = ",".join("?" * len(job_ids))
+		rows = self._connect().execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id IN ({marks})", job_ids)
+		return {row[0]: _job(row) for row in rows}
+
+	def claim(self, worker: str) -> Optional[Tuple[SolveJob, Dict, bool]]:
+		"""Забрать самую старую задачу из очереди: (задача, параметры решения, stream) или None."""
+		conn = self._connect()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			row = conn.execute(
+				f"SELECT {_JOB_COLUMNS}, options, stream FROM jobs WHERE state = 'queued' ORDER BY created_at LIMIT 1"
+			).fetchone()
+			if row is None:
+				conn.execute("COMMIT")
+				return None
+			started_at = time.time()
+			conn.execute(
+				"UPDATE jobs SET state = 'running', started_at = ?, heartbeat_at = ?, worker = ? WHERE id = ?",
+				(started_at, started_at, worker, row[0]),
+			)
+			conn.execute("COMMIT")
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+		job = _job(row[:12])
+		job.state, job.started_at = "running", started_at
+		return job, json.loads(row[12]), bool(row[13])
+
+	def finish(self, job: SolveJob, worker: str, output: Optional[Dict] = None) -> bool:
+		"""Записать итог задачи (состояние, статус результата, ошибка) и её отчёт, если он есть.
+
+		Итог записывается, только если задача всё ещё running за этим воркером;
+		False — задачу уже пометили упавшей (fail_stale, fail_running).
+		"""
+		cursor = self._connect().execute(
+			"UPDATE jobs SET state = ?, finished_at = ?, result_status = ?, objective_value = ?, "
+			"cache = ?, stop_reason = ?, error = ?, output = ? WHERE id = ? AND state = 'running' AND worker = ?",
+			(
+				job.state, job.finished_at, job.result_status, job.objective_value, job.cache,
+				job.stop_reason, job.error, None if output is None else json.dumps(output), job.id, worker,
+			),
+		)
+		return cursor.rowcount > 0
+
+	def get_output(self, job_id: str) -> Optional[Dict]:
+		"""Итог завершённой задачи (result_to_dict или отчёт вариантов), либо None."""
+		row = self._connect().execute("SELECT output FROM jobs WHERE id = ?", (job_id,)).fetchone()
+		return json.loads(row[0]) if row and row[0] is not None else None
+
+	def cancel(self, job_id: str) -> Optional[SolveJob]:
+		"""Снять задачу из очереди или попросить воркер остановить поиск."""
+		conn = self._connect()
+		conn.execute(
+			"UPDATE jobs SET state = 'cancelled', finished_at = ? WHERE id = ? AND state = 'queued'",
+			(time.time(), job_id),
+		)
+		conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = 'running'", (job_id,))
+		return self.get(job_id)
+
+	def heartbeat(self, job_id: str, worker: str) -> bool:
+		"""Отметить, что воркер ещё решает задачу; True — поиск пора остановить.
+
+		Остановить — если запрошена отмена или задача больше не принадлежит
+		воркеру (её уже пометили упавшей), тогда отметка не обновляется.
+		"""
+		conn = self._connect()
+		cursor = conn.execute(
+			"UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = 'running' AND worker = ?",
+			(time.time(), job_id, worker),
+		)
+		if cursor.rowcount == 0:
+			return True
+		row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+		return bool(row and row[0])
+
+	def add_event(self, job_id: str, seq: int, event: Dict) -> None:
+		self._connect().execute(
+			"INSERT INTO job_events (job_id, seq, payload) VALUES (?, ?, ?)", (job_id, seq, json.dumps(event)),
+		)
+
+	def events_after(self, job_id: str, seq: int) -> List[Tuple[int, Dict]]:
+		"""Промежуточные решения задачи с номером больше seq."""
+		rows = self._connect().execute(
+			"SELECT seq, payload FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, seq),
+		)
+		return [(n, json.loads(payload)) for n, payload in rows]
+
+	def fail_running(self, worker: str, error: str) -> int:
+		"""Пометить упавшими задачи, оставшиеся running за завершившимся процессом воркера (имя — worker_name)."""
+		cursor = self._connect().execute(
+			"UPDATE jobs SET state = 'failed', finished_at = ?, error = ? WHERE state = 'running' AND worker = ?",
+			(time.time(), error, worker),
+		)
+		return cursor.rowcount
+
+	def fail_stale(self, timeout_seconds: float, error: str) -> int:
+		"""Пометить упавшими задачи, воркер которых не отмечался дольше timeout_seconds (процесс или хост пропал)."""
+		cursor = self._connect().execute(
+			"UPDATE jobs SET state = 'failed', finished_at = ?, error = ? WHERE state = 'running' AND heartbeat_at < ?",
+			(time.time(), error, time.time() - timeout_seconds),
+		)
+		return cursor.rowcount
+
+	def _prune_finished(self, conn: sqlite3.Connection) -> None:
+		"""Удалить самые старые завершённые задачи и их события сверх лимита."""
+		marks = ",".join("?" * len(FINISHED_STATES))
+		stale = [
+			row[0] for row in conn.execute(
+				f"SELECT id FROM jobs WHERE state IN ({marks}) ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+				(*FINISHED_STATES, self._max_finished_jobs),
+			)
+		]
+		for job_id in stale:
+			conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+			conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+
+
+def new_instance_id() -> str:
+	"""Id запуска пула воркеров: различает процессы разных запусков с одинаковым pid."""
+	return uuid.uuid4().hex[:12]
+
+
+def worker_name(instance: str, pid: Optional[int] = None) -> str:
+	"""Имя процесса воркера для колонки jobs.worker: хост, pid и id запуска пула."""
+	return f"{socket.gethostname()}:{pid or os.getpid()}:{instance}"
+
+
+def result_to_dict(result: ScenarioResult) -> Dict:
+	"""Результат решения в JSON для колонки jobs.output (см. result_from_dict)."""
+	return asdict(result)
+
+
+def result_from_dict(data: Dict) -> ScenarioResult:
+	return ScenarioResult(
+		scenario_id=data["scenario_id"],
+		schedule=[ScheduleItem(**item) for item in data["schedule"]],
+		objective_value=data["objective_value"],
+		status=data["status"],
+		assignments=[Assignment(**a) for a in data["assignments"]],
+		stage_fingerprints=data["stage_fingerprints"],
+		from_cache=data["from_cache"],
+		assignment_diff={k: [Assignment(**a) for a in v] for k, v in data["assignment_diff"].items()},
+		revision=data["revision"],
+		stats=SolveStats(**data["stats"]) if data["stats"] is not None else None,
+	)
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+"""
+Сериализация ответов в байты JSON и сжатие по Accept-Encoding.
+
+JSON кодируется orjson (если установлен, иначе стандартным json), минуя
+jsonable_encoder FastAPI. Полные ответы по результату (расписание,
+назначения, Гант) кодируются один раз на ревизию результата (см.
+RevisionCache), сжатые варианты — при первом запросе с нужным Accept-Encoding.
+"""
+
+import gzip
+import json
+from typing import Any, Dict, List, Optional
+
+from theater_sched.domain.models import Assignment, Scenario, ScenarioResult, ScheduleItem
+
+try:
+	import orjson
+except ImportError:  # orjson необязателен: тогда стандартный json
+	orjson = None
+
+try:
+	import brotli
+except ImportError:  # brotli необязателен: тогда только gzip
+	brotli = None
+
+
+# Меньшие ответы не сжимаются: выигрыш меньше накладных расходов
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Порядок предпочтения при равном q
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def dumps(value: Any) -> bytes:
+	"""JSON в UTF-8 (компактный, без экранирования не-ASCII)."""
+	if orjson is not None:
+		return orjson.dumps(value)
+	return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+	if encoding == "gzip":
+		return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+	if encoding == "br" and brotli is not None:
+		return brotli.compress(body, quality=BROTLI_QUALITY)
+	raise ValueError(f"Unsupported content encoding {encoding}")
+
+
+def choose_encoding(accept_encoding: Optional[str], size: int) -> Optional[str]:
+	"""Сжатие для ответа размера size по заголовку Accept-Encoding, либо None.
+
+	Учитываются q-значения (q=0 — запрет) и "*"; при равном q brotli
+	предпочтительнее gzip.
+	"""
+	if not accept_encoding or size < MIN_COMPRESS_BYTES:
+		return None
+	weights: Dict[str, float] = {}
+	for part in accept_encoding.split(","):
+		name, _, params = part.strip().partition(";")
+		q = 1.0
+		params = params.strip()
+		if params.startswith("q="):
+			try:
+				q = float(params[2:])
+			except ValueError:
+				q = 0.0
+		weights[name.strip().lower()] = q
+	best, best_q = None, 0.0
+	for encoding in SUPPORTED_ENCODINGS:
+		q = weights.get(encoding, weights.get("*", 0.0))
+		if q > best_q:
+			best, best_q = encoding, q
+	return best
+
+
+class EncodedJSON:
+	"""Тело ответа JSON в байтах и его сжатые варианты (сжимаются при первом запросе)."""
+	def __init__(self, body: bytes, etag: Optional[str] = None) -> None:
+		self.body = body
+		self.etag = etag
+		self._compressed: Dict[str, bytes] = {}
+
+	@classmethod
+	def of(cls, value: Any, etag: Optional[str] = None) -> EncodedJSON:
+		return cls(dumps(value), etag)
+
+	def encoded(self, encoding: Optional[str]) -> bytes:
+		"""Тело в кодировке encoding (None — без сжатия)."""
+		if encoding is None:
+			return self.body
+		data = self._compressed.get(encoding)
+		if data is None:
+			# Гонка двух потоков безвредна: оба получат одинаковые байты
+			data = self._compressed[encoding] = compress(self.body, encoding)
+		return data
+
+
+# Представление результата в ответах API
+
+def schedule_item_dict(item: ScheduleItem) -> Dict:
+	return {
+		"production_id": item.production_id,
+		"stage_id": item.stage_id,
+		"timeslot_id": item.timeslot_id,
+		"revenue": item.revenue,
+	}
+
+
+def assignment_dict(a: Assignment) -> Dict:
+	return {
+		"schedule_item_id": a.schedule_item_id,
+		"production_id": a.production_id,
+		"timeslot_id": a.timeslot_id,
+		"stage_id": a.stage_id,
+		"person_id": a.person_id,
+		"role_id": a.role_id,
+		"is_conductor": a.is_conductor,
+	}
+
+
+def assignment_dicts(assignments: List[Assignment]) -> List[Dict]:
+	return [assignment_dict(a) for a in assignments]
+
+
+def schedule_payload(result: ScenarioResult) -> Dict:
+	"""Полное расписание результата с назначениями."""
+	return {
+		"scenario_id": result.scenario_id,
+		"status": result.status,
+		"objective_value": result.objective_value,
+		"schedule": [schedule_item_dict(it) for it in result.schedule],
+		"assignments": assignment_dicts(result.assignments),
+	}
+
+
+def result_etag(result: ScenarioResult) -> str:
+	return f'"{result.revision}"'
+
+
+def encode_schedule(scenario: Scenario, result: ScenarioResult) -> EncodedJSON:
+	"""Полное расписание в байтах (кэшируется в RevisionCache)."""
+	return EncodedJSON.of(schedule_payload(result), result_etag(result))
+
+
+def encode_assignments(scenario: Scenario, result: ScenarioResult) -> EncodedJSON:
+	"""Все назначения результата в байтах (кэшируется в RevisionCache)."""
+	return EncodedJSON.of(
+		{"scenario_id": scenario.id, "assignments": assignment_dicts(result.assignments)},
+		result_etag(result),
+	)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+"""
+Данные для диаграммы Ганта: строятся один раз на ревизию результата (см. RevisionCache).
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+
+from theater_sched.domain.models import Scenario, ScenarioResult
+from theater_sched.services.encoding import EncodedJSON, result_etag
+
+# Московский часовой пояс (как и при нормализации входных дат в API)
+MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+
+# Для визуализации используем фиксированную длительность показа
+SHOW_DURATION = timedelta(hours=3)
+
+
+@lru_cache(maxsize=8192)
+def show_interval(date_str: str, hm: Optional[str], fallback_hm: str = "19:00") -> Optional[Tuple[str, str]]:
+	"""Начало и конец показа в ISO 8601 по московскому времени, либо None, если дату не разобрать.
+
+	Одна и та же пара (дата, время) встречается на всех сценах, поэтому
+	результат запоминается.
+	"""
+	time_str = (hm or fallback_hm).strip()
+	if len(time_str) == 5:  # "HH:MM"
+		time_str = f"{time_str}:00"
+	try:
+		start_dt = MOSCOW_TZ.localize(datetime.fromisoformat(f"{date_str}T{time_str}"))
+	except (ValueError, TypeError):
+		return None
+	return start_dt.isoformat(), (start_dt + SHOW_DURATION).isoformat()
+
+
+def build_gantt_tasks(scenario: Scenario, result: ScenarioResult) -> List[Dict]:
+	"""Задачи [{id, resource, start, end, title}] для элементов расписания."""
+	compiled = scenario.compiled
+	# Название ресурса по индексу сцены; сцены без описания — по id
+	stage_names = {st.id: st.name for st in scenario.stages}
+	resources = [stage_names.get(stage_id, stage_id) for stage_id in compiled.stage_ids]
+	tasks = []
+	for item in result.schedule:
+		slot = compiled.timeslot_index.get(item.timeslot_id)
+		if slot is None:
+			continue
+		tslot = compiled.timeslots[slot]
+		interval = show_interval(tslot.date, tslot.start_time)
+		if interval is None:
+			continue
+		# Сцена уже в таймслоте
+		tasks.append({
+			"id": f"{item.production_id}|{item.stage_id}|{item.timeslot_id}",
+			"resource": resources[compiled.slot_stage[slot]],
+			"start": interval[0],
+			"end": interval[1],
+			"title": item.production_id,
+		})
+	return tasks
+
+
+@dataclass
+class GanttView:
+	"""Готовый ответ эндпоинта Ганта для одной ревизии результата."""
+	revision: str
+	etag: str
+	payload: Dict
+	body: EncodedJSON  # payload в байтах JSON
+
+
+def build_gantt_view(scenario: Scenario, result: ScenarioResult) -> GanttView:
+	"""Готовый ответ для результата (кэшируется в RevisionCache)."""
+	etag = result_etag(result)
+	payload = {
+		"scenario_id": scenario.id,
+		"status": result.status,
+		"tasks": build_gantt_tasks(scenario, result),
+	}
+	return GanttView(revision=result.revision, etag=etag, payload=payload, body=EncodedJSON.of(payload, etag))
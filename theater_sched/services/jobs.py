@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+"""
+Фоновые задачи решения: очередь, ограничение параллельности, опрос и отмена.
+
+SolveJobManager решает в потоках процесса API; QueuedSolveJobManager ставит
+задачи в общую очередь SQLite, которую разбирают процессы воркеров
+(theater_sched.worker), — для нескольких процессов API.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from theater_sched.domain.models import ScenarioResult, SolveJob
+from theater_sched.repositories.base import ScenarioRepository
+from theater_sched.repositories.sqlite_jobs import FINISHED_STATES, SqliteJobStore, result_from_dict
+from theater_sched.services.scenarios import ScenarioService
+from theater_sched.services.variants import ScenarioVariant, validate_variant, variant_to_dict
+from theater_sched.solver.cores import CoreAllocator
+
+logger = logging.getLogger(__name__)
+
+
+def complete_job(job: SolveJob, result: ScenarioResult, cancelled: bool) -> None:
+	"""Отметить задачу завершённой по результату решения."""
+	job.state = "cancelled" if cancelled else "done"
+	job.result_status = result.status
+	# Отмена до первого решения: цели нет (прошлый результат сценария не менялся)
+	job.objective_value = result.objective_value if result.status != "cancelled" else None
+	job.cache = "hit" if result.from_cache else "miss"
+	# Для результата из кэша причина остановки относится к исходному решению
+	job.stop_reason = result.stats.stop_reason if result.stats is not None and not result.from_cache else None
+	job.finished_at = time.time()
+
+
+def job_to_dict(job: SolveJob) -> Dict:
+	"""Представление задачи для API (с прошедшим временем)."""
+	if job.started_at is None:
+		elapsed = 0.0
+	else:
+		elapsed = (job.finished_at or time.time()) - job.started_at
+	return {
+		"job_id": job.id,
+		"scenario_id": job.scenario_id,
+		"kind": job.kind,
+		"state": job.state,
+		"elapsed_seconds": round(elapsed, 3),
+		"queued_seconds": round((job.started_at or job.finished_at or time.time()) - job.created_at, 3),
+		"result_status": job.result_status,
+		"objective_value": job.objective_value,
+		"cache": job.cache,
+		"stop_reason": job.stop_reason,
+		"error": job.error,
+	}
+
+
+class SolveJobManager:
+	"""Запускает решения сценариев в ограниченном пуле потоков.
+
+	Запрос на решение сразу получает id задачи, а сам CP-SAT работает в пуле
+	из max_concurrency потоков. Отмена выставляет событие остановки, по
+	которому решатель вызывает StopSearch. Если передан cores, потоки
+	поиска CP-SAT каждой задачи выделяются из общего числа ядер (см.
+	CoreAllocator) с учётом задач в очереди.
+	"""
+	def __init__(
+		self,
+		service: ScenarioService,
+		max_concurrency: int = 2,
+		max_finished_jobs: int = 1000,
+		cores: Optional[CoreAllocator] = None,
+	) -> None:
+		self._service = service
+		self._max_concurrency = max_concurrency
+		self._cores = cores
+		self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="solve")
+		self._max_finished_jobs = max_finished_jobs
+		self._lock = threading.Lock()
+		self._jobs: "OrderedDict[str, SolveJob]" = OrderedDict()
+		self._stop_events: Dict[str, threading.Event] = {}
+		self._futures: Dict[str, Future] = {}
+
+	def submit(
+		self,
+		scenario_id: str,
+		on_solution: Optional[Callable[[Dict], None]] = None,
+		**solve_options,
+	) -> SolveJob:
+		"""Поставить решение сценария в очередь и вернуть задачу.
+
+		on_solution получает промежуточные решения (вызывается из потока решателя),
+		solve_options передаются в ScenarioService.solve (например, warm_start).
+		"""
+		self._service.get_status(scenario_id)  # ValueError, если сценария нет
+		job = SolveJob(id=str(uuid.uuid4()), scenario_id=scenario_id, created_at=time.time())
+		with self._lock:
+			self._jobs[job.id] = job
+			self._stop_events[job.id] = threading.Event()
+			self._prune_finished()
+			self._futures[job.id] = self._executor.submit(self._run, job.id, on_solution, solve_options)
+		return job
+
+	def get(self, job_id: str) -> Optional[SolveJob]:
+		"""Вернуть задачу по id, либо None, если не найдена."""
+		with self._lock:
+			return self._jobs.get(job_id)
+
+	def future(self, job_id: str) -> Future:
+		"""Future задачи — для ожидания завершения без опроса (результат — ScenarioResult или None)."""
+		with self._lock:
+			future = self._futures.get(job_id)
+		if future is None:
+			raise ValueError("Job not found")
+		return future
+
+	def cancel(self, job_id: str) -> SolveJob:
+		"""Отменить задачу: снять из очереди или остановить поиск CP-SAT."""
+		with self._lock:
+			job = self._jobs.get(job_id)
+			if job is None:
+				raise ValueError("Job not found")
+			if job.state in ("queued", "running"):
+				self._stop_events[job_id].set()
+				if job.state == "queued" and self._futures[job_id].cancel():
+					job.state = "cancelled"
+					job.finished_at = time.time()
+			return job
+
+	to_dict = staticmethod(job_to_dict)
+
+	def _run(
+		self, job_id: str, on_solution: Optional[Callable[[Dict], None]], solve_options: Dict
+	) -> Optional[ScenarioResult]:
+		with self._lock:
+			job = self._jobs[job_id]
+			stop_event = self._stop_events[job_id]
+			if stop_event.is_set():
+				job.state = "cancelled"
+				job.finished_at = time.time()
+				return
+			job.state = "running"
+			job.started_at = time.time()
+			# Претенденты на ядра: выполняющиеся задачи и те, что начнутся следом
+			active = sum(1 for j in self._jobs.values() if j.state in ("queued", "running"))
+			demand = min(active, self._max_concurrency)
+		try:
+			if self._cores is None:
+				result = self._service.solve(
+					job.scenario_id, stop_event=stop_event, on_solution=on_solution, **solve_options,
+				)
+			else:
+				with self._cores.allocate(demand) as workers:
+					result = self._service.solve(
+						job.scenario_id, stop_event=stop_event, on_solution=on_solution,
+						num_search_workers=workers, **solve_options,
+					)
+		except Exception as e:
+			with self._lock:
+				job.state = "failed"
+				job.error = str(e)
+				job.finished_at = time.time()
+			return
+		with self._lock:
+			complete_job(job, result, stop_event.is_set())
+		return result
+
+	def _prune_finished(self) -> None:
+		"""Удалить самые старые завершённые задачи сверх лимита (вызывать под lock)."""
+		finished = [jid for jid, j in self._jobs.items() if j.state in ("done", "failed", "cancelled")]
+		for jid in finished[: max(0, len(finished) - self._max_finished_jobs)]:
+			del self._jobs[jid]
+			self._stop_events.pop(jid, None)
+			self._futures.pop(jid, None)
+
+
+class _Watch:
+	"""Ожидание задачи из очереди в этом процессе: Future и получатель промежуточных решений."""
+	__slots__ = ("future", "on_solution", "seq")
+
+	def __init__(self, on_solution: Optional[Callable[[Dict], None]]) -> None:
+		self.future: Future = Future()
+		self.on_solution = on_solution
+		self.seq = 0
+
+
+class QueuedSolveJobManager:
+	"""Ставит решения в общую очередь SQLite; решают процессы theater_sched.worker.
+
+	Интерфейс совпадает с SolveJobManager, но задачи, их состояние и отмена
+	хранятся в SqliteJobStore, поэтому любой процесс API видит задачи,
+	поставленные другими. Фоновый поток опрашивает очередь раз в
+	poll_interval секунд: завершает Future ожидаемых здесь задач результатом,
+	который воркер сохранил в задаче (для пакета вариантов — отчётом
+	сравнения), и передаёт on_solution промежуточные решения воркера.
+	Ошибки опроса пишутся в лог; после max_poll_failures неудачных опросов
+	подряд ожидаемые Future завершаются последней ошибкой, а не висят.
+	"""
+	def __init__(
+		self,
+		store: SqliteJobStore,
+		repo: ScenarioRepository,
+		poll_interval: float = 0.2,
+		max_poll_failures: int = 25,
+	) -> None:
+		self._store = store
+		self._repo = repo
+		self._poll_interval = poll_interval
+		self._max_poll_failures = max_poll_failures
+		self._lock = threading.Lock()
+		self._watched: Dict[str, _Watch] = {}
+		self._wakeup = threading.Event()
+		threading.Thread(target=self._poll, name="solve-queue-poll", daemon=True).start()
+
+	def submit(
+		self,
+		scenario_id: str,
+		on_solution: Optional[Callable[[Dict], None]] = None,
+		**solve_options,
+	) -> SolveJob:
+		"""Поставить решение сценария в общую очередь и вернуть задачу."""
+		if self._repo.get_scenario(scenario_id) is None:
+			raise ValueError("Scenario not found")
+		job = SolveJob(id=str(uuid.uuid4()), scenario_id=scenario_id, created_at=time.time())
+		self._store.add(job, solve_options, stream=on_solution is not None)
+		# Промежуточные решения читаются с начала, поэтому ничего не теряется,
+		# даже если воркер успел начать решать до регистрации наблюдения
+		self._watch(job.id, on_solution)
+		return job
+
+	def submit_variants(self, scenario_id: str, variants: List[ScenarioVariant]) -> SolveJob:
+		"""Поставить пакет вариантов в общую очередь; Future задачи вернёт отчёт сравнения.
+
+		Варианты проверяются здесь (VariantError), чтобы ошибка в запросе не
+		доходила до воркера. Пул процессов вариантов запускает воркер решателя
+		на выделенных ему ядрах, а не процесс API.
+		"""
+		scenario = self._repo.get_scenario(scenario_id)
+		if scenario is None:
+			raise ValueError("Scenario not found")
+		for variant in variants:
+			validate_variant(scenario, variant)
+		job = SolveJob(id=str(uuid.uuid4()), scenario_id=scenario_id, kind="variants", created_at=time.time())
+		self._store.add(job, {"variants": [variant_to_dict(v) for v in variants]})
+		self._watch(job.id, None)
+		return job
+
+	def get(self, job_id: str) -> Optional[SolveJob]:
+		"""Вернуть задачу по id, либо None, если не найдена."""
+		return self._store.get(job_id)
+
+	def future(self, job_id: str) -> Future:
+		"""Future задачи (ScenarioResult, отчёт вариантов или None); задачи других процессов тоже."""
+		with self._lock:
+			watch = self._watched.get(job_id)
+		if watch is not None:
+			return watch.future
+		if self._store.get(job_id) is None:
+			raise ValueError("Job not found")
+		return self._watch(job_id, None).future
+
+	def cancel(self, job_id: str) -> SolveJob:
+		"""Отменить задачу: снять из очереди или попросить воркер остановить поиск."""
+		job = self._store.cancel(job_id)
+		if job is None:
+			raise ValueError("Job not found")
+		self._wakeup.set()
+		return job
+
+	to_dict = staticmethod(job_to_dict)
+
+	def _watch(self, job_id: str, on_solution: Optional[Callable[[Dict], None]]) -> _Watch:
+		with self._lock:
+			watch = self._watched.setdefault(job_id, _Watch(on_solution))
+		self._wakeup.set()
+		return watch
+
+	def _poll(self) -> None:
+		failures = 0
+		while True:
+			with self._lock:
+				watched = dict(self._watched)
+			if not watched:
+				self._wakeup.wait()
+				self._wakeup.clear()
+				continue
+			try:
+				self._poll_once(watched)
+				failures = 0
+			except Exception as e:  # база временно недоступна — повторим на следующем опросе
+				failures += 1
+				logger.exception("Solve queue poll failed (%d in a row)", failures)
+				if failures >= self._max_poll_failures:
+					self._fail_watched(watched, e)
+					failures = 0
+			self._wakeup.wait(self._poll_interval)
+			self._wakeup.clear()
+
+	def _fail_watched(self, watched: Dict[str, _Watch], error: Exception) -> None:
+		"""Завершить ошибкой ожидания, которые опрос не может обслужить."""
+		with self._lock:
+			for job_id in watched:
+				self._watched.pop(job_id, None)
+		for watch in watched.values():
+			if not watch.future.done():
+				watch.future.set_exception(error)
+
+	def _poll_once(self, watched: Dict[str, _Watch]) -> None:
+		jobs = self._store.get_many(list(watched))
+		for job_id, watch in watched.items():
+			if watch.on_solution is not None:
+				for seq, event in self._store.events_after(job_id, watch.seq):
+					watch.on_solution(event)
+					watch.seq = seq
+			job = jobs.get(job_id)
+			if job is not None and job.state not in FINISHED_STATES:
+				continue
+			with self._lock:
+				self._watched.pop(job_id, None)
+			if job is None:
+				watch.future.set_exception(ValueError("Job not found"))
+			elif job.kind == "variants":
+				watch.future.set_result(self._store.get_output(job_id))
+			else:
+				# Результат этой задачи: последний результат сценария мог записать другой воркер
+				output = self._store.get_output(job_id) if job.state != "failed" else None
+				watch.future.set_result(result_from_dict(output) if output is not None else None)
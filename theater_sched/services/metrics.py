@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+"""
+Метрики решателя в текстовом формате Prometheus (GET /metrics).
+
+Гистограммы времени фаз, размера модели и статистики поиска CP-SAT
+пополняются после каждого решения (см. observe_solve). Значения хранятся
+в памяти процесса: при нескольких воркерах каждый отдаёт свои.
+"""
+
+import math
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from theater_sched.domain.models import ScenarioResult
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 30_000, 100_000, 300_000, 1_000_000, 3_000_000)
+COUNT_BUCKETS = (0, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+GAP_BUCKETS = (0.0, 0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+	if math.isinf(value):
+		return "+Inf" if value > 0 else "-Inf"
+	return repr(float(value))
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+	if not names:
+		return ""
+	return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+	"""Монотонный счётчик с метками."""
+	kind = "counter"
+
+	def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+		self.name = name
+		self.documentation = documentation
+		self.labels = tuple(labels)
+		self._values: Dict[LabelValues, float] = {}
+		self._lock = threading.Lock()
+
+	def inc(self, amount: float = 1.0, **labels: str) -> None:
+		key = tuple(str(labels[name]) for name in self.labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0.0) + amount
+
+	def samples(self) -> List[str]:
+		with self._lock:
+			values = sorted(self._values.items())
+		return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in values]
+
+
+class Histogram:
+	"""Гистограмма с фиксированными границами корзин и метками."""
+	kind = "histogram"
+
+	def __init__(
+		self, name: str, documentation: str, buckets: Sequence[float], labels: Sequence[str] = ()
+	) -> None:
+		self.name = name
+		self.documentation = documentation
+		self.labels = tuple(labels)
+		self.buckets = tuple(sorted(buckets)) + (math.inf,)
+		# метки -> (счётчики по корзинам, сумма, число наблюдений)
+		self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+		self._lock = threading.Lock()
+
+	def observe(self, value: float, **labels: str) -> None:
+		key = tuple(str(labels[name]) for name in self.labels)
+		with self._lock:
+			counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+			for i, upper in enumerate(self.buckets):
+				if value <= upper:
+					counts[i] += 1
+					break
+			self._values[key] = (counts, total + value, count + 1)
+
+	def samples(self) -> List[str]:
+		with self._lock:
+			values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+		lines = []
+		for key, (counts, total, count) in values:
+			cumulative = 0
+			for upper, n in zip(self.buckets, counts):
+				cumulative += n
+				labels = _format_labels(self.labels + ("le",), key + (_format_value(upper),))
+				lines.append(f"{self.name}_bucket{labels} {cumulative}")
+			labels = _format_labels(self.labels, key)
+			lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+			lines.append(f"{self.name}_count{labels} {count}")
+		return lines
+
+
+class MetricsRegistry:
+	"""Набор метрик процесса и их выдача в формате Prometheus."""
+	def __init__(self) -> None:
+		self._metrics: List = []
+
+	def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+		metric = Counter(name, documentation, labels)
+		self._metrics.append(metric)
+		return metric
+
+	def histogram(
+		self, name: str, documentation: str, buckets: Sequence[float], labels: Sequence[str] = ()
+	) -> Histogram:
+		metric = Histogram(name, documentation, buckets, labels)
+		self._metrics.append(metric)
+		return metric
+
+	def render(self) -> str:
+		lines = []
+		for metric in self._metrics:
+			lines.append(f"# HELP {metric.name} {metric.documentation}")
+			lines.append(f"# TYPE {metric.name} {metric.kind}")
+			lines.extend(metric.samples())
+		return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+SOLVES = METRICS.counter(
+	"theater_solves_total", "Solves by result status and whether the result came from the solve cache.",
+	("status", "cache"),
+)
+SOLVE_STOPS = METRICS.counter(
+	"theater_solve_stops_total", "Solver runs by the criterion that ended the search.", ("reason",),
+)
+SOLVE_PHASE_SECONDS = METRICS.histogram(
+	"theater_solve_phase_seconds", "Time spent in each solve phase (build, solve, extract, assign, total).",
+	SECONDS_BUCKETS, ("phase",),
+)
+MODEL_VARIABLES = METRICS.histogram(
+	"theater_solve_model_variables", "CP-SAT model variables per constraint family.", SIZE_BUCKETS, ("family",),
+)
+MODEL_CONSTRAINTS = METRICS.histogram(
+	"theater_solve_model_constraints", "CP-SAT model constraints per constraint family.", SIZE_BUCKETS, ("family",),
+)
+SEARCH_BRANCHES = METRICS.histogram("theater_solve_branches", "CP-SAT search branches per solve.", COUNT_BUCKETS)
+SEARCH_CONFLICTS = METRICS.histogram("theater_solve_conflicts", "CP-SAT search conflicts per solve.", COUNT_BUCKETS)
+SEARCH_GAP = METRICS.histogram(
+	"theater_solve_gap", "Relative gap between objective and best bound at the end of the search.", GAP_BUCKETS,
+)
+
+
+def observe_solve(result: ScenarioResult) -> None:
+	"""Учесть результат решения в метриках (из кэша — только в счётчике решений)."""
+	SOLVES.inc(status=result.status, cache="hit" if result.from_cache else "miss")
+	stats = result.stats
+	if result.from_cache or stats is None:
+		return
+	SOLVE_STOPS.inc(reason=stats.stop_reason)
+	for phase in ("build", "solve", "extract", "assign", "total"):
+		SOLVE_PHASE_SECONDS.observe(getattr(stats, f"{phase}_seconds"), phase=phase)
+	MODEL_VARIABLES.observe(stats.num_variables, family="all")
+	MODEL_CONSTRAINTS.observe(stats.num_constraints, family="all")
+	for family, counts in stats.families.items():
+		MODEL_VARIABLES.observe(counts["variables"], family=family)
+		MODEL_CONSTRAINTS.observe(counts["constraints"], family=family)
+	SEARCH_BRANCHES.observe(stats.num_branches)
+	SEARCH_CONFLICTS.observe(stats.num_conflicts)
+	if stats.gap is not None:
+		SEARCH_GAP.observe(stats.gap)
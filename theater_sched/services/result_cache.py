@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+"""
+Кэш результатов решения по каноническому отпечатку содержимого сценария.
+"""
+
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, replace
+from typing import Dict, Optional, Tuple
+
+from theater_sched.domain.models import Scenario, ScenarioResult
+
+
+def scenario_fingerprint(scenario: Scenario) -> str:
+	"""Канонический хэш входных данных решателя, не зависящий от порядка списков.
+
+	Учитываются постановки, таймслоты, закреплённые показы, ограничения,
+	режим декомпозиции, параметры поиска и остановки, люди, роли и связи человек-роль.
+	Id сценария, статус, лимит времени и число потоков в отпечаток не входят.
+	"""
+	canonical = {
+		"productions": sorted(
+			(p.id, p.stage_id, p.max_shows, p.weekend_priority) for p in scenario.productions
+		),
+		"timeslots": sorted(
+			(t.id, t.stage_id, t.date, t.day_of_week, t.start_time) for t in scenario.timeslots
+		),
+		"fixed_assignments": sorted(
+			(fa.production_id, fa.timeslot_id) for fa in scenario.fixed_assignments or []
+		),
+		"constraints": asdict(scenario.params.constraints),
+		"decompose_by_stage": scenario.params.decompose_by_stage,
+		"assignment_engine": scenario.params.assignment_engine,
+		# Число потоков, как и лимит времени, на отпечаток не влияет
+		"solver": {k: v for k, v in asdict(scenario.params.solver).items() if k != "num_search_workers"},
+		# Досрочно остановленное решение не подходит запросу с более строгими критериями
+		"stop": asdict(scenario.params.stop),
+		"people": sorted(p.id for p in scenario.people),
+		"roles": sorted(
+			(r.id, r.production_id, r.is_conductor, r.required_count) for r in scenario.roles
+		),
+		"person_production_roles": sorted(
+			(ppr.person_id, ppr.production_id, ppr.role_id, ppr.can_play)
+			for ppr in scenario.person_production_roles
+		),
+	}
+	payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+	return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SolveResultCache:
+	"""LRU-кэш решённых результатов по отпечатку сценария.
+
+	Оптимальный результат подходит для любого лимита времени; допустимый
+	(feasible) — только если был получен с лимитом не меньше запрошенного.
+	"""
+	def __init__(self, max_entries: int = 256) -> None:
+		self._max_entries = max_entries
+		self._entries: "OrderedDict[str, Tuple[ScenarioResult, float]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, fingerprint: str, scenario_id: str, time_limit_seconds: float) -> Optional[ScenarioResult]:
+		"""Вернуть копию закэшированного результата для сценария scenario_id, либо None."""
+		with self._lock:
+			cached = self._entries.get(fingerprint)
+			if cached is None or (cached[0].status != "optimal" and cached[1] < time_limit_seconds):
+				self.misses += 1
+				return None
+			self._entries.move_to_end(fingerprint)
+			self.hits += 1
+			result = cached[0]
+		return _copy_result(result, scenario_id, from_cache=True)
+
+	def put(self, fingerprint: str, result: ScenarioResult, time_limit_seconds: float) -> None:
+		"""Сохранить результат (копией, чтобы ручные правки назначений не попадали в кэш)."""
+		if result.status == "infeasible":
+			return
+		snapshot = _copy_result(result, result.scenario_id, from_cache=False)
+		with self._lock:
+			self._entries[fingerprint] = (snapshot, time_limit_seconds)
+			self._entries.move_to_end(fingerprint)
+			while len(self._entries) > self._max_entries:
+				self._entries.popitem(last=False)
+
+	def stats(self) -> Dict:
+		with self._lock:
+			return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _copy_result(result: ScenarioResult, scenario_id: str, from_cache: bool) -> ScenarioResult:
+	"""Копия результата без общих изменяемых частей с оригиналом (включая статистику)."""
+	stats = result.stats
+	if stats is not None:
+		stats = replace(
+			stats,
+			families={family: dict(counts) for family, counts in stats.families.items()},
+			pinned_stages=list(stats.pinned_stages),
+		)
+	return replace(
+		result,
+		scenario_id=scenario_id,
+		schedule=[replace(it, scenario_id=scenario_id) for it in result.schedule],
+		assignments=[replace(a, scenario_id=scenario_id) for a in result.assignments],
+		stage_fingerprints=dict(result.stage_fingerprints),
+		assignment_diff={k: [replace(a, scenario_id=scenario_id) for a in v] for k, v in result.assignment_diff.items()},
+		from_cache=from_cache,
+		revision=uuid.uuid4().hex,
+		stats=stats,
+	)
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+"""
+Выборки из результата: фильтры по датам, сцене, постановке и человеку,
+пагинация по курсору и выбор полей. Индексы строятся один раз на ревизию
+результата (см. ResultIndex, RevisionCache).
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from theater_sched.domain.compiled import CompiledScenario
+from theater_sched.domain.models import Scenario, ScenarioResult
+
+
+class QueryError(ValueError):
+	"""Некорректные параметры выборки (неизвестное поле, устаревший курсор)."""
+
+
+# Поля по умолчанию совпадают с полным ответом; date/start_time — по запросу через fields
+SCHEDULE_FIELDS = ("production_id", "stage_id", "timeslot_id", "revenue")
+SCHEDULE_EXTRA_FIELDS = ("schedule_item_id", "date", "start_time")
+ASSIGNMENT_FIELDS = (
+	"schedule_item_id", "production_id", "timeslot_id", "stage_id", "person_id", "role_id", "is_conductor",
+)
+ASSIGNMENT_EXTRA_FIELDS = ("date", "start_time")
+
+
+@dataclass
+class ResultQuery:
+	"""Параметры выборки; даты — ISO "YYYY-MM-DD", границы включительно."""
+	date_from: Optional[str] = None
+	date_to: Optional[str] = None
+	stage_id: Optional[str] = None
+	production_id: Optional[str] = None
+	person_id: Optional[str] = None
+	cursor: Optional[str] = None
+	limit: Optional[int] = None
+	fields: Optional[List[str]] = None
+
+	def is_empty(self) -> bool:
+		return all(value is None for value in vars(self).values())
+
+
+# День строк с неизвестным таймслотом — раньше любой даты
+_NO_DAY = np.iinfo(np.int32).min
+
+
+class _RowIndex:
+	"""Строки, отсортированные по (дата, время начала), и списки позиций по значениям ключей.
+
+	Порядок и дни берутся из скомпилированного сценария: chrono_rank и
+	slot_day по индексу таймслота строки, без сравнения строк дат.
+	"""
+	def __init__(
+		self,
+		rows: Sequence[Any],
+		compiled: CompiledScenario,
+		keys: Sequence[str],
+		getters: Dict[str, Callable[[Any], Any]],
+	) -> None:
+		slots = np.fromiter(
+			(compiled.timeslot_index.get(row.timeslot_id, -1) for row in rows), dtype=np.int64, count=len(rows),
+		)
+		known = slots >= 0
+		ranks = np.where(known, compiled.chrono_rank[slots], -1)
+		order = np.argsort(ranks, kind="stable")
+		self.rows = [rows[i] for i in order.tolist()]
+		self.slots: List[int] = slots[order].tolist()
+		self.days: List[int] = np.where(known, compiled.slot_day[slots], _NO_DAY)[order].tolist()
+		self.timeslots = compiled.timeslots
+		self.getters = getters
+		# ключ -> значение -> возрастающий список позиций в self.rows
+		self.postings: Dict[str, Dict[str, List[int]]] = {key: defaultdict(list) for key in keys}
+		for pos, row in enumerate(self.rows):
+			for key in keys:
+				self.postings[key][getattr(row, key)].append(pos)
+
+	def select(
+		self,
+		filters: Dict[str, str],
+		day_from: Optional[int],
+		day_to: Optional[int],
+		after: int,
+		limit: Optional[int],
+	) -> Tuple[List[int], Optional[int]]:
+		"""Позиции строк после позиции after; вторым значением — позиция для следующей страницы."""
+		# Перебираем самый короткий из списков позиций по фильтрам, остальные проверяем
+		lists = sorted(
+			((self.postings[key].get(value, []), key) for key, value in filters.items()),
+			key=lambda pair: len(pair[0]),
+		)
+		if lists:
+			candidates, driver = lists[0]
+			lo = bisect_left(candidates, after + 1)
+			if day_from is not None:
+				lo = max(lo, bisect_left(candidates, day_from, key=self.days.__getitem__))
+			hi = bisect_right(candidates, day_to, key=self.days.__getitem__) if day_to is not None else len(candidates)
+			positions = candidates[lo:hi]
+		else:
+			driver = None
+			lo = max(after + 1, bisect_left(self.days, day_from) if day_from is not None else 0)
+			hi = bisect_right(self.days, day_to) if day_to is not None else len(self.rows)
+			positions = range(lo, hi)
+
+		# Остальные фильтры: по значению поля строки, а если поля нет (человек для показа) — по списку позиций
+		checks = [(self.getters[key], value) for key, value in filters.items() if key != driver and key in self.getters]
+		members = [
+			set(self.postings[key].get(value, ()))
+			for key, value in filters.items() if key != driver and key not in self.getters
+		]
+		selected: List[int] = []
+		for pos in positions:
+			row = self.rows[pos]
+			if all(get(row) == value for get, value in checks) and all(pos in m for m in members):
+				if limit is not None and len(selected) == limit:
+					return selected, selected[-1]
+				selected.append(pos)
+		return selected, None
+
+	def to_dicts(self, positions: Sequence[int], fields: Sequence[str]) -> List[Dict]:
+		result = []
+		for pos in positions:
+			row = self.rows[pos]
+			item = {}
+			slot = self.slots[pos]
+			for name in fields:
+				if name == "date":
+					item[name] = self.timeslots[slot].date if slot >= 0 else ""
+				elif name == "start_time":
+					item[name] = self.timeslots[slot].start_time if slot >= 0 else ""
+				else:
+					item[name] = self.getters[name](row)
+			result.append(item)
+		return result
+
+
+def _attr(name: str) -> Callable[[Any], Any]:
+	return lambda row: getattr(row, name)
+
+
+class ResultIndex:
+	"""Индексы одного результата: расписание и назначения по дате, сцене, постановке и человеку."""
+	def __init__(self, scenario: Scenario, result: ScenarioResult) -> None:
+		compiled = scenario.compiled
+		self.scenario_id = result.scenario_id
+		self.revision = result.revision
+		self.status = result.status
+		self.objective_value = result.objective_value
+
+		schedule_getters = {name: _attr(name) for name in SCHEDULE_FIELDS + ("schedule_item_id",)}
+		self.schedule = _RowIndex(result.schedule, compiled, ("stage_id", "production_id"), schedule_getters)
+		assignment_getters = {name: _attr(name) for name in ASSIGNMENT_FIELDS}
+		self.assignments = _RowIndex(
+			result.assignments, compiled, ("stage_id", "production_id", "person_id", "schedule_item_id"), assignment_getters,
+		)
+
+		# Фильтр расписания по человеку: показы, на которые он назначен
+		item_positions = {item.schedule_item_id: pos for pos, item in enumerate(self.schedule.rows)}
+		by_person: Dict[str, set] = defaultdict(set)
+		for a in self.assignments.rows:
+			pos = item_positions.get(a.schedule_item_id)
+			if pos is not None:
+				by_person[a.person_id].add(pos)
+		self.schedule.postings["person_id"] = {person: sorted(ps) for person, ps in by_person.items()}
+
+	def query_schedule(self, query: ResultQuery, include_assignments: bool = True) -> Dict:
+		"""Страница расписания; assignments — назначения показов страницы (с учётом person_id)."""
+		fields = _fields(query.fields, SCHEDULE_FIELDS, SCHEDULE_EXTRA_FIELDS)
+		positions, next_pos = self.schedule.select(
+			_filters(query, ("stage_id", "production_id", "person_id")),
+			_day(query.date_from), _day(query.date_to), self._after(query.cursor), query.limit,
+		)
+		page = {
+			"scenario_id": self.scenario_id,
+			"status": self.status,
+			"objective_value": self.objective_value,
+			"schedule": self.schedule.to_dicts(positions, fields),
+			"next_cursor": self._cursor(next_pos),
+		}
+		if include_assignments:
+			assignment_positions: List[int] = []
+			for pos in positions:
+				item_id = self.schedule.rows[pos].schedule_item_id
+				for a_pos in self.assignments.postings["schedule_item_id"].get(item_id, []):
+					if query.person_id is None or self.assignments.rows[a_pos].person_id == query.person_id:
+						assignment_positions.append(a_pos)
+			page["assignments"] = self.assignments.to_dicts(assignment_positions, ASSIGNMENT_FIELDS)
+		return page
+
+	def query_assignments(self, query: ResultQuery) -> Dict:
+		"""Страница назначений."""
+		fields = _fields(query.fields, ASSIGNMENT_FIELDS, ASSIGNMENT_EXTRA_FIELDS)
+		positions, next_pos = self.assignments.select(
+			_filters(query, ("stage_id", "production_id", "person_id")),
+			_day(query.date_from), _day(query.date_to), self._after(query.cursor), query.limit,
+		)
+		return {
+			"scenario_id": self.scenario_id,
+			"assignments": self.assignments.to_dicts(positions, fields),
+			"next_cursor": self._cursor(next_pos),
+		}
+
+	def _cursor(self, pos: Optional[int]) -> Optional[str]:
+		return None if pos is None else f"{self.revision}.{pos}"
+
+	def _after(self, cursor: Optional[str]) -> int:
+		"""Позиция, после которой продолжать; курсор привязан к ревизии результата."""
+		if not cursor:
+			return -1
+		revision, _, pos = cursor.rpartition(".")
+		if revision != self.revision or not pos.isdigit():
+			raise QueryError("Cursor is stale or invalid: result has changed, restart from the first page")
+		return int(pos)
+
+
+def _day(value: Optional[str]) -> Optional[int]:
+	if not value:
+		return None
+	try:
+		return date.fromisoformat(value).toordinal()
+	except ValueError:
+		raise QueryError(f"Invalid date {value}: expected YYYY-MM-DD")
+
+
+def _filters(query: ResultQuery, keys: Sequence[str]) -> Dict[str, str]:
+	return {key: getattr(query, key) for key in keys if getattr(query, key) is not None}
+
+
+def _fields(requested: Optional[List[str]], default: Sequence[str], extra: Sequence[str]) -> Sequence[str]:
+	if not requested:
+		return default
+	unknown = [name for name in requested if name not in default and name not in extra]
+	if unknown:
+		raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+	return requested
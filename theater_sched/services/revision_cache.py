@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+"""
+Кэш представлений, производных от результата сценария (Гант, индексы выборок).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Optional, Tuple, TypeVar
+
+from theater_sched.domain.models import Scenario, ScenarioResult
+
+T = TypeVar("T")
+
+
+class RevisionCache(Generic[T]):
+	"""LRU-кэш по id сценария; запись действительна, пока не сменилась ревизия результата."""
+	def __init__(self, build: Callable[[Scenario, ScenarioResult], T], max_entries: int = 256) -> None:
+		self._build = build
+		self._max_entries = max_entries
+		self._entries: "OrderedDict[str, Tuple[str, T]]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, scenario_id: str, revision: str) -> Optional[T]:
+		"""Значение для данной ревизии результата, либо None."""
+		with self._lock:
+			entry = self._entries.get(scenario_id)
+			if entry is None or entry[0] != revision:
+				return None
+			self._entries.move_to_end(scenario_id)
+			return entry[1]
+
+	def build(self, scenario: Scenario, result: ScenarioResult) -> T:
+		"""Построить значение для результата и положить в кэш."""
+		value = self._build(scenario, result)
+		with self._lock:
+			self._entries[scenario.id] = (result.revision, value)
+			self._entries.move_to_end(scenario.id)
+			while len(self._entries) > self._max_entries:
+				self._entries.popitem(last=False)
+		return value
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import threading
 import uuid
-from typing import Dict, List
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional, TypeVar
 
 from theater_sched.domain.models import (
 	Constraints,
@@ -13,18 +15,34 @@ from theater_sched.domain.models import (
 	Scenario,
 	ScenarioParams,
 	ScenarioResult,
+	SolverParams,
 	Stage,
+	StopParams,
 	TimeSlot,
 )
-from theater_sched.repositories.memory import InMemoryRepository
+from theater_sched.repositories.base import ScenarioRepository
+from theater_sched.services.encoding import EncodedJSON, encode_assignments, encode_schedule, schedule_payload
+from theater_sched.services.metrics import observe_solve
+from theater_sched.services.result_cache import SolveResultCache, scenario_fingerprint
+from theater_sched.services.result_query import ResultIndex, ResultQuery
+from theater_sched.services.revision_cache import RevisionCache
+from theater_sched.services.variants import ScenarioVariant, solve_variants
 from theater_sched.solver.cp_sat_solver import MinimalCPSATSolver
 
+T = TypeVar("T")
+
 
 class ScenarioService:
 	"""Сервис сценариев: создание, запуск решателя, выдача статуса и расписания."""
-	def __init__(self, repo: InMemoryRepository) -> None:
+	def __init__(self, repo: ScenarioRepository, result_cache: Optional[SolveResultCache] = None) -> None:
 		self._repo = repo
 		self._solver = MinimalCPSATSolver()
+		self._result_cache = result_cache
+		# Индексы выборок по результатам (строятся при сохранении результата решения)
+		self._indexes: RevisionCache[ResultIndex] = RevisionCache(ResultIndex)
+		# Полные ответы в байтах JSON (кодируются при первом чтении ревизии)
+		self._schedule_bodies: RevisionCache[EncodedJSON] = RevisionCache(encode_schedule)
+		self._assignment_bodies: RevisionCache[EncodedJSON] = RevisionCache(encode_assignments)
 
 	def create_scenario(
 		self,
@@ -70,6 +88,10 @@ class ScenarioService:
 				objective_weights=params.get("objective_weights", {"revenue": 1.0}) if params else {"revenue": 1.0},
 				time_limit_seconds=params.get("time_limit_seconds", 5) if params else 5,
 				constraints=Constraints(**params.get("constraints", {})) if params and params.get("constraints") else Constraints(),
+				decompose_by_stage=bool(params.get("decompose_by_stage", False)),
+				assignment_engine=params.get("assignment_engine", "flow"),
+				solver=SolverParams(**params["solver"]) if params.get("solver") else SolverParams(),
+				stop=StopParams(**params["stop"]) if params.get("stop") else StopParams(),
 			) if params else ScenarioParams(),
 			fixed_assignments=[
 				FixedAssignment(
@@ -113,19 +135,93 @@ class ScenarioService:
 		self._repo.save_scenario(scenario)
 		return scenario
 
-	def solve(self, scenario_id: str) -> ScenarioResult:
-		"""Запустить решатель для сценария, сохранить и вернуть результат."""
+	def solve(
+		self,
+		scenario_id: str,
+		stop_event: Optional[threading.Event] = None,
+		on_solution: Optional[Callable[[Dict], None]] = None,
+		warm_start: bool = False,
+		fix_unchanged_stages: bool = False,
+		repair_assignments: bool = False,
+		num_search_workers: Optional[int] = None,
+	) -> ScenarioResult:
+		"""Запустить решатель для сценария, сохранить и вернуть результат.
+
+		stop_event — необязательный сигнал отмены, on_solution — получатель
+		промежуточных решений, num_search_workers — выделенные решению потоки
+		(см. MinimalCPSATSolver.solve).
+		При warm_start прошлый результат сценария используется как подсказка
+		решателю, а fix_unchanged_stages закрепляет сцены, входные данные
+		которых не менялись. При repair_assignments люди перераспределяются
+		только на изменившихся показах, остальные назначения прошлого
+		результата сохраняются.
+		Если подключён кэш решений, сценарий с тем же содержимым (см.
+		scenario_fingerprint) получает готовый результат без запуска решателя.
+		Если решение отменено до первого найденного расписания, прошлый
+		результат и статус сценария не меняются, а возвращается несохранённый
+		результат со статусом cancelled.
+		"""
 		scenario = self._repo.get_scenario(scenario_id)
 		if not scenario:
 			raise ValueError("Scenario not found")
-		scenario.status = "solving"
-		self._repo.save_scenario(scenario)
-		result = self._solver.solve(scenario)
+		time_limit = scenario.params.time_limit_seconds
+		# Закрепление сцен может дать неоптимальный результат, а дозаполнение
+		# назначений зависит от прошлого результата — такие не кэшируем
+		fingerprint = None
+		if self._result_cache is not None and not fix_unchanged_stages and not repair_assignments:
+			fingerprint = scenario_fingerprint(scenario)
+			cached = self._result_cache.get(fingerprint, scenario_id, time_limit)
+			if cached is not None:
+				self._repo.save_result(cached)
+				self._indexes.build(scenario, cached)
+				self._repo.set_scenario_status(scenario_id, "solved")
+				observe_solve(cached)
+				return cached
+
+		previous = self._repo.get_result(scenario_id) if warm_start or repair_assignments else None
+		repair_from = None
+		if repair_assignments and previous is not None and previous.status != "infeasible":
+			repair_from = previous.assignments
+		# Только статус: сценарий целиком перезаписал бы правки людей и ролей,
+		# сделанные во время решения (в том числе другими процессами)
+		previous_status = scenario.status
+		self._repo.set_scenario_status(scenario_id, "solving")
+		result = self._solver.solve(
+			scenario,
+			stop_event=stop_event,
+			on_solution=on_solution,
+			previous=previous if warm_start else None,
+			fix_unchanged_stages=fix_unchanged_stages,
+			repair_from=repair_from,
+			num_search_workers=num_search_workers,
+		)
+		cancelled = stop_event is not None and stop_event.is_set()
+		if cancelled and result.status == "infeasible" and not _proven_infeasible(result):
+			# Отмена до первого решения: пустое расписание не заменяет прошлый результат
+			self._repo.set_scenario_status(scenario_id, previous_status)
+			result.status = "cancelled"
+			observe_solve(result)
+			return result
+		if fingerprint is not None and not cancelled:
+			self._result_cache.put(fingerprint, result, time_limit)
 		self._repo.save_result(result)
-		scenario.status = "solved" if result.status != "infeasible" else "failed"
-		self._repo.save_scenario(scenario)
+		self._indexes.build(scenario, result)
+		self._repo.set_scenario_status(scenario_id, "solved" if result.status != "infeasible" else "failed")
+		observe_solve(result)
 		return result
 
+	def solve_variants(
+		self, scenario_id: str, variants: List[ScenarioVariant], num_search_workers: Optional[int] = None
+	) -> Dict:
+		"""Решить варианты сценария параллельно и сравнить с текущим результатом (см. solve_variants).
+
+		Варианты не сохраняются и не меняют сценарий.
+		"""
+		scenario = self._repo.get_scenario(scenario_id)
+		if not scenario:
+			raise ValueError("Scenario not found")
+		return solve_variants(scenario, variants, self._repo.get_result(scenario_id), num_search_workers)
+
 	def get_status(self, scenario_id: str) -> Dict:
 		"""Вернуть текущий статус сценария и значение цели (если есть результат)."""
 		scenario = self._repo.get_scenario(scenario_id)
@@ -138,36 +234,65 @@ class ScenarioService:
 			"objective_value": getattr(result, "objective_value", None),
 		}
 
-	def get_schedule(self, scenario_id: str) -> Dict:
-		"""Вернуть расписание по сценарию (если решение уже получено)."""
+	def get_solve_stats(self, scenario_id: str) -> Dict:
+		"""Статистика последнего решения: время фаз, размер модели, поиск CP-SAT (см. SolveStats)."""
 		result = self._repo.get_result(scenario_id)
 		if not result:
 			raise ValueError("Result not found")
+		if result.stats is None:
+			raise ValueError("Solve stats not available")
 		return {
-			"scenario_id": result.scenario_id,
+			"scenario_id": scenario_id,
 			"status": result.status,
-			"objective_value": result.objective_value,
-			"schedule": [
-				{
-					"production_id": it.production_id,
-					"stage_id": it.stage_id,
-					"timeslot_id": it.timeslot_id,
-					"revenue": it.revenue,
-				}
-				for it in result.schedule
-			],
-			"assignments": [
-				{
-					"schedule_item_id": a.schedule_item_id,
-					"production_id": a.production_id,
-					"timeslot_id": a.timeslot_id,
-					"stage_id": a.stage_id,
-					"person_id": a.person_id,
-					"role_id": a.role_id,
-					"is_conductor": a.is_conductor,
-				}
-				for a in result.assignments
-			],
+			"from_cache": result.from_cache,
+			**asdict(result.stats),
 		}
 
+	def get_schedule(
+		self, scenario_id: str, query: Optional[ResultQuery] = None, include_assignments: bool = True
+	) -> Dict:
+		"""Вернуть расписание по сценарию (если решение уже получено).
+
+		С query — страница расписания по фильтрам (см. ResultIndex.query_schedule).
+		"""
+		if query is not None and not query.is_empty():
+			return self._result_index(scenario_id).query_schedule(query, include_assignments)
+		result = self._repo.get_result(scenario_id)
+		if not result:
+			raise ValueError("Result not found")
+		return schedule_payload(result)
+
+	def get_schedule_body(self, scenario_id: str) -> EncodedJSON:
+		"""Полное расписание текущей ревизии результата в байтах JSON."""
+		return self._cached(self._schedule_bodies, scenario_id)
+
+	def get_assignments_body(self, scenario_id: str) -> EncodedJSON:
+		"""Все назначения текущей ревизии результата в байтах JSON."""
+		return self._cached(self._assignment_bodies, scenario_id)
+
+	def get_assignments(self, scenario_id: str, query: ResultQuery) -> Dict:
+		"""Страница назначений по фильтрам (см. ResultIndex.query_assignments)."""
+		return self._result_index(scenario_id).query_assignments(query)
+
+	def _result_index(self, scenario_id: str) -> ResultIndex:
+		"""Индексы текущей ревизии результата; перестраиваются, если результат изменился."""
+		return self._cached(self._indexes, scenario_id)
+
+	def _cached(self, cache: RevisionCache[T], scenario_id: str) -> T:
+		"""Значение кэша для текущей ревизии результата; строится заново, если результат изменился."""
+		revision = self._repo.get_result_revision(scenario_id)
+		if revision is None:
+			raise ValueError("Result not found")
+		value = cache.get(scenario_id, revision)
+		if value is None:
+			scenario = self._repo.get_scenario(scenario_id)
+			result = self._repo.get_result(scenario_id)
+			if not scenario or not result:
+				raise ValueError("Result not found")
+			value = cache.build(scenario, result)
+		return value
+
 
+def _proven_infeasible(result: ScenarioResult) -> bool:
+	"""CP-SAT доказал, что решений нет (а не остановлен до первого решения)."""
+	return result.stats is not None and result.stats.solver_status in ("INFEASIBLE", "MODEL_INVALID")
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+"""
+Пакетное изменение людей, ролей и связей человек-роль в сценарии.
+
+Пакет сначала целиком проверяется по множествам id (с учётом операций,
+идущих в пакете раньше), и только потом применяется — либо весь, либо никак.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from theater_sched.domain.models import Person, PersonProductionRole, PPRKey, Role, Scenario
+
+
+PEOPLE = "people"
+ROLES = "roles"
+PERSON_PRODUCTION_ROLES = "person-production-roles"
+
+
+@dataclass
+class StaffOperation:
+	"""Одна операция пакета."""
+	op: str                                                          # "add" | "remove"
+	kind: str                                                        # PEOPLE | ROLES | PERSON_PRODUCTION_ROLES
+	item: Optional[Union[Person, Role, PersonProductionRole]] = None  # Что добавить (для add)
+	key: Tuple[str, ...] = ()                                        # id человека/роли или PPRKey (для remove)
+
+
+class StaffBatchError(ValueError):
+	"""Пакет не прошёл проверку; errors — [{"index": номер операции, "error": текст}]."""
+	def __init__(self, errors: List[Dict]) -> None:
+		super().__init__(f"{len(errors)} invalid operation(s)")
+		self.errors = errors
+
+
+def apply_staff_operations(scenario: Scenario, operations: List[StaffOperation]) -> Dict[str, int]:
+	"""Проверить и применить пакет операций; вернуть число применённых операций по видам.
+
+	При ошибке проверки бросает StaffBatchError, сценарий не меняется.
+	Добавление связи человек-роль работает как upsert (как и одиночный эндпоинт).
+	"""
+	index = scenario.eligibility
+	people: Set[str] = set(index.people)
+	roles: Set[str] = set(index.roles)
+	errors = []
+	for i, operation in enumerate(operations):
+		error = _check(operation, people, roles, index.production_ids)
+		if error:
+			errors.append({"index": i, "error": error})
+	if errors:
+		raise StaffBatchError(errors)
+
+	counts: Counter = Counter()
+	pending_ppr_removals: List[PPRKey] = []
+	for operation in operations:
+		if operation.kind == PERSON_PRODUCTION_ROLES and operation.op == "remove":
+			# Подряд идущие удаления связей — одним проходом по списку
+			pending_ppr_removals.append(operation.key)
+		else:
+			if pending_ppr_removals:
+				scenario.remove_person_production_roles(pending_ppr_removals)
+				pending_ppr_removals = []
+			_apply(scenario, operation)
+		counts[f"{operation.kind}.{operation.op}"] += 1
+	if pending_ppr_removals:
+		scenario.remove_person_production_roles(pending_ppr_removals)
+	return dict(counts)
+
+
+def _check(operation: StaffOperation, people: Set[str], roles: Set[str], productions: Set[str]) -> Optional[str]:
+	"""Проверить операцию и отразить её в множествах id; вернуть текст ошибки или None."""
+	item = operation.item
+	if operation.op not in ("add", "remove"):
+		return f"Unsupported op {operation.op}"
+	if operation.kind == PEOPLE:
+		if operation.op == "add":
+			if item.id in people:
+				return f"Person with id {item.id} already exists"
+			people.add(item.id)
+		else:
+			if operation.key[0] not in people:
+				return f"Person {operation.key[0]} not found"
+			people.discard(operation.key[0])
+	elif operation.kind == ROLES:
+		if operation.op == "add":
+			if item.production_id not in productions:
+				return f"Production {item.production_id} not found"
+			if item.id in roles:
+				return f"Role with id {item.id} already exists"
+			roles.add(item.id)
+		else:
+			if operation.key[0] not in roles:
+				return f"Role {operation.key[0]} not found"
+			roles.discard(operation.key[0])
+	elif operation.kind == PERSON_PRODUCTION_ROLES:
+		if operation.op == "add":
+			if item.person_id not in people:
+				return f"Person {item.person_id} not found"
+			if item.production_id not in productions:
+				return f"Production {item.production_id} not found"
+			if item.role_id not in roles:
+				return f"Role {item.role_id} not found"
+	else:
+		return f"Unknown collection {operation.kind}"
+	return None
+
+
+def _apply(scenario: Scenario, operation: StaffOperation) -> None:
+	if operation.kind == PEOPLE:
+		if operation.op == "add":
+			scenario.add_person(operation.item)
+		else:
+			scenario.remove_person(operation.key[0])
+	elif operation.kind == ROLES:
+		if operation.op == "add":
+			scenario.add_role(operation.item)
+		else:
+			scenario.remove_role(operation.key[0])
+	else:
+		scenario.set_person_production_role(operation.item)
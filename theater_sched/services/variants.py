@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+"""
+Пакетная оценка вариантов сценария ("что если"): переопределения ограничений,
+числа показов и закреплённых показов решаются параллельно в пуле процессов
+и сравниваются с базовым результатом.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from theater_sched.domain.models import Constraints, FixedAssignment, Scenario, ScenarioResult
+from theater_sched.solver.cp_sat_solver import NUM_SEARCH_WORKERS, MinimalCPSATSolver
+
+# Базовый сценарий в дочернем процессе пула (см. _init_variant_worker)
+_worker_base: Optional[Scenario] = None
+
+_CONSTRAINT_FIELDS = {f.name for f in fields(Constraints)}
+
+
+class VariantError(ValueError):
+	"""Некорректное переопределение варианта (неизвестное ограничение или постановка)."""
+
+
+@dataclass
+class ScenarioVariant:
+	"""Переопределения параметров базового сценария для одного варианта."""
+	name: str
+	constraints: Dict[str, Any] = field(default_factory=dict)  # поле Constraints -> значение
+	max_shows: Dict[str, int] = field(default_factory=dict)     # production_id -> число показов
+	fixed_assignments: List[FixedAssignment] = field(default_factory=list)  # дополнительно к базовым
+	time_limit_seconds: Optional[float] = None
+
+
+def variant_to_dict(variant: ScenarioVariant) -> Dict[str, Any]:
+	"""Вариант в JSON для общей очереди задач (см. variant_from_dict)."""
+	return asdict(variant)
+
+
+def variant_from_dict(data: Dict[str, Any]) -> ScenarioVariant:
+	return ScenarioVariant(
+		name=data["name"],
+		constraints=dict(data.get("constraints") or {}),
+		max_shows=dict(data.get("max_shows") or {}),
+		fixed_assignments=[FixedAssignment(**fa) for fa in data.get("fixed_assignments") or ()],
+		time_limit_seconds=data.get("time_limit_seconds"),
+	)
+
+
+def validate_variant(base: Scenario, variant: ScenarioVariant) -> None:
+	unknown = sorted(set(variant.constraints) - _CONSTRAINT_FIELDS)
+	if unknown:
+		raise VariantError(f"Variant {variant.name}: unknown constraints {', '.join(unknown)}")
+	productions = {p.id for p in base.productions}
+	unknown = sorted(set(variant.max_shows) - productions)
+	unknown += sorted({fa.production_id for fa in variant.fixed_assignments} - productions)
+	if unknown:
+		raise VariantError(f"Variant {variant.name}: unknown productions {', '.join(unknown)}")
+	if any(n < 1 for n in variant.max_shows.values()):
+		raise VariantError(f"Variant {variant.name}: max_shows must be >= 1")
+
+
+def apply_variant(base: Scenario, variant: ScenarioVariant, index: int) -> Scenario:
+	"""Сценарий варианта поверх базового; неизменённые списки общие с базовым.
+
+	Люди и роли не передаются: варианты сравниваются по расписанию, без
+	распределения по ролям. Декомпозиция по сценам отключается — варианты и
+	так решаются параллельно, а на оптимальное расписание она не влияет.
+	"""
+	productions = base.productions
+	if variant.max_shows:
+		productions = [
+			replace(p, max_shows=variant.max_shows[p.id]) if p.id in variant.max_shows else p
+			for p in base.productions
+		]
+	params = replace(
+		base.params,
+		constraints=replace(base.params.constraints, **variant.constraints),
+		decompose_by_stage=False,
+		time_limit_seconds=variant.time_limit_seconds or base.params.time_limit_seconds,
+	)
+	return replace(
+		base,
+		id=f"{base.id}#variant-{index}",
+		productions=productions,
+		params=params,
+		fixed_assignments=list(base.fixed_assignments) + variant.fixed_assignments,
+		people=[],
+		roles=[],
+		person_production_roles=[],
+	)
+
+
+def _init_variant_worker(base: Scenario) -> None:
+	global _worker_base
+	_worker_base = base
+
+
+def _solve_variant(
+	variant: ScenarioVariant, index: int, num_search_workers: int
+) -> Tuple[Optional[ScenarioResult], Optional[str], float]:
+	"""Точка входа дочернего процесса: (результат, ошибка, время решения)."""
+	started = time.perf_counter()
+	try:
+		scenario = apply_variant(_worker_base, variant, index)
+		result = MinimalCPSATSolver().solve(scenario, num_search_workers=num_search_workers)
+	except Exception as e:  # несогласованные данные варианта — ошибка этого варианта, а не всего пакета
+		return None, str(e), time.perf_counter() - started
+	return result, None, time.perf_counter() - started
+
+
+def solve_variants(
+	base: Scenario,
+	variants: List[ScenarioVariant],
+	baseline: Optional[ScenarioResult] = None,
+	num_search_workers: Optional[int] = None,
+) -> Dict:
+	"""Решить варианты параллельно и вернуть таблицу сравнения с базой.
+
+	База — сохранённый результат сценария (baseline), а если его нет или он
+	неразрешим — базовый сценарий, решённый вместе с вариантами. Варианты
+	решаются в пуле не более чем из num_search_workers процессов (выделенные
+	решению ядра), остальные ждут в очереди пула; потоки CP-SAT делятся между
+	процессами поровну. Пока вариантов не больше ядер, пакет занимает
+	примерно время одного решения.
+	"""
+	for variant in variants:
+		validate_variant(base, variant)
+	runs = list(variants)
+	if baseline is None or baseline.status == "infeasible":
+		baseline = None
+		runs.insert(0, ScenarioVariant(name="base"))
+
+	granted = max(1, num_search_workers or NUM_SEARCH_WORKERS)
+	processes = min(len(runs), granted)
+	workers = max(1, granted // processes)
+	started = time.perf_counter()
+	# Базовый сценарий передаётся процессам один раз (initializer), варианты — только переопределениями
+	# spawn, как и у воркеров решателя: fork процесса API с потоками может унаследовать захваченные блокировки
+	with ProcessPoolExecutor(
+		max_workers=processes,
+		mp_context=multiprocessing.get_context("spawn"),
+		initializer=_init_variant_worker,
+		initargs=(base,),
+	) as pool:
+		outcomes = list(pool.map(_solve_variant, runs, range(len(runs)), [workers] * len(runs)))
+	wall_seconds = time.perf_counter() - started
+
+	base_source = "result"
+	if baseline is None:
+		base_source = "solved"
+		baseline = outcomes[0][0]
+		base_row = _row(runs[0], outcomes[0], None)
+		outcomes, runs = outcomes[1:], runs[1:]
+	else:
+		base_row = {"name": "base", "status": baseline.status, "objective_value": baseline.objective_value}
+	base_row["source"] = base_source
+
+	return {
+		"scenario_id": base.id,
+		"base": base_row,
+		"variants": [_row(variant, outcome, baseline) for variant, outcome in zip(runs, outcomes)],
+		"processes": processes,
+		"num_search_workers": workers,
+		"wall_seconds": round(wall_seconds, 3),
+	}
+
+
+def _row(
+	variant: ScenarioVariant,
+	outcome: Tuple[Optional[ScenarioResult], Optional[str], float],
+	baseline: Optional[ScenarioResult],
+) -> Dict:
+	"""Строка таблицы сравнения: статус, цель, её изменение и изменения по постановкам."""
+	result, error, seconds = outcome
+	row: Dict[str, Any] = {"name": variant.name, "seconds": round(seconds, 3)}
+	if result is None:
+		row.update(status="error", error=error, objective_value=None)
+		return row
+	row.update(
+		status=result.status,
+		objective_value=result.objective_value if result.status != "infeasible" else None,
+		stop_reason=result.stats.stop_reason if result.stats is not None else None,
+	)
+	if baseline is not None and baseline.status != "infeasible" and result.status != "infeasible":
+		row["objective_delta"] = result.objective_value - baseline.objective_value
+		row["productions"] = production_diff(baseline, result)
+	return row
+
+
+def _production_slots(result: ScenarioResult) -> Dict[str, List[str]]:
+	slots: Dict[str, List[str]] = {}
+	for item in result.schedule:
+		slots.setdefault(item.production_id, []).append(item.timeslot_id)
+	return slots
+
+
+def production_diff(baseline: ScenarioResult, result: ScenarioResult) -> List[Dict]:
+	"""Постановки, чьи показы отличаются от базы: число показов, добавленные и убранные слоты."""
+	before, after = _production_slots(baseline), _production_slots(result)
+	diff = []
+	for production_id in sorted(set(before) | set(after)):
+		old, new = set(before.get(production_id, ())), set(after.get(production_id, ()))
+		if old == new:
+			continue
+		diff.append({
+			"production_id": production_id,
+			"base_shows": len(old),
+			"shows": len(new),
+			"added": sorted(new - old),
+			"removed": sorted(old - new),
+		})
+	return diff
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+"""
+Распределение людей по ролям для составленного расписания.
+
+Методы (ScenarioParams.assignment_engine):
+- "flow"   — поток минимальной стоимости (по умолчанию), масштабируется на тысячи людей и показов;
+- "cp_sat" — отдельная модель CP-SAT, минимизирует максимальную нагрузку;
+- "greedy" — прежнее циклическое распределение (без проверки пересечений по времени).
+
+Во "flow" и "cp_sat" человек не может быть назначен на два показа с одинаковыми
+датой и временем начала (даже на разных сценах), а людей назначают только на
+роли, для которых в PersonProductionRole стоит can_play.
+"""
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from ortools.graph.python import min_cost_flow
+from ortools.sat.python import cp_model
+
+from theater_sched.domain.models import Assignment, Role, ScheduleItem, Scenario
+
+
+@dataclass
+class AssignmentBudget:
+	"""Ресурсы распределения: потоки, выделенные решению, и остаток его лимита времени."""
+	num_search_workers: int = 1
+	time_limit_seconds: Optional[float] = None  # None — лимит времени сценария целиком
+
+
+# (scenario, schedule, budget) -> assignments
+AssignmentEngine = Callable[[Scenario, List[ScheduleItem], Optional[AssignmentBudget]], List[Assignment]]
+
+# Момент показа: (день, минута начала) из Scenario.compiled; для неизвестного таймслота — (timeslot_id, 0)
+TimeKey = Tuple[Union[int, str], int]
+
+
+def _time_key(scenario: Scenario, item: ScheduleItem) -> TimeKey:
+	compiled = scenario.compiled
+	slot = compiled.timeslot_index.get(item.timeslot_id)
+	return compiled.moment(slot) if slot is not None else (item.timeslot_id, 0)
+
+
+@dataclass
+class _StaffingProblem:
+	"""Позиции для заполнения: одна на пару (показ, роль)."""
+	demands: List[Tuple[ScheduleItem, Role]]
+	eligible: List[List[str]]             # Кто может занять позицию
+	time_keys: List[TimeKey]              # Момент показа позиции
+	capacity: List[int] = field(default_factory=list)  # Сколько людей нужно (по умолчанию role.required_count)
+
+	def open_count(self, d: int) -> int:
+		return self.capacity[d] if self.capacity else self.demands[d][1].required_count
+
+
+def _build_staffing_problem(scenario: Scenario, schedule: List[ScheduleItem]) -> _StaffingProblem:
+	"""Собрать позиции и списки подходящих людей по индексу допуска сценария."""
+	index = scenario.eligibility
+	roles_by_production: Dict[str, List[Role]] = {}
+	eligible_by_role: Dict[Tuple[str, str], List[str]] = {}
+
+	problem = _StaffingProblem(demands=[], eligible=[], time_keys=[])
+	for item in schedule:
+		time_key = _time_key(scenario, item)
+		roles = roles_by_production.get(item.production_id)
+		if roles is None:
+			roles = roles_by_production[item.production_id] = index.roles_of_production(item.production_id)
+		for role in roles:
+			key = (item.production_id, role.id)
+			eligible = eligible_by_role.get(key)
+			if eligible is None:
+				eligible = eligible_by_role[key] = index.eligible_people(*key)
+			problem.demands.append((item, role))
+			problem.eligible.append(eligible)
+			problem.time_keys.append(time_key)
+	return problem
+
+
+def _make_assignment(scenario: Scenario, item: ScheduleItem, role: Role, person_id: str) -> Assignment:
+	return Assignment(
+		scenario_id=scenario.id,
+		production_id=item.production_id,
+		timeslot_id=item.timeslot_id,
+		stage_id=item.stage_id,
+		person_id=person_id,
+		role_id=role.id,
+		is_conductor=role.is_conductor,
+	)
+
+
+def _solve_flow(
+	problem: _StaffingProblem,
+	busy: Optional[Set[Tuple[str, TimeKey]]] = None,
+	base_load: Optional[Dict[str, int]] = None,
+) -> List[List[str]]:
+	"""Поток минимальной стоимости; возвращает назначенных людей для каждой позиции.
+
+	Сеть: источник → человек → (человек, дата+время) → позиция → сток.
+	Дуга в узел (человек, время) имеет пропускную способность 1 — это и есть
+	запрет двойного назначения (если позиция в это время у человека одна,
+	узел не создаётся). От источника к человеку идут параллельные дуги
+	стоимостью 1, 2, 3, …: k-е назначение человека стоит k, поэтому при
+	максимальном числе заполненных позиций минимизируется сумма квадратов
+	нагрузок, т.е. нагрузка выравнивается.
+
+	busy — занятые (person_id, момент показа) и base_load — уже имеющаяся
+	нагрузка людей: так решается дозаполнение при неизменных остальных назначениях.
+	"""
+	busy = busy or set()
+	base_load = base_load or {}
+	source, sink = 0, 1
+	num_nodes = 2 + len(problem.demands)
+	person_nodes: Dict[str, int] = {}
+	person_time_nodes: Dict[Tuple[str, TimeKey], int] = {}
+	starts: List[int] = []
+	ends: List[int] = []
+	capacities: List[int] = []
+	costs: List[int] = []
+	# (индекс дуги, индекс позиции, person_id) для дуг (человек, время) → позиция
+	candidate_arcs: List[Tuple[int, int, str]] = []
+
+	def add_arc(tail: int, head: int, capacity: int, cost: int) -> None:
+		starts.append(tail)
+		ends.append(head)
+		capacities.append(capacity)
+		costs.append(cost)
+
+	# Узел (человек, время) нужен, только если у человека несколько позиций в одно время
+	candidates_at_time: Dict[Tuple[str, TimeKey], int] = defaultdict(int)
+	for d, people in enumerate(problem.eligible):
+		for person_id in people:
+			candidates_at_time[(person_id, problem.time_keys[d])] += 1
+	for pt_key in busy:
+		candidates_at_time.pop(pt_key, None)
+
+	def person_node_of(person_id: str) -> int:
+		nonlocal num_nodes
+		node = person_nodes.get(person_id)
+		if node is None:
+			node = person_nodes[person_id] = num_nodes
+			num_nodes += 1
+		return node
+
+	total_demand = 0
+	slots_per_person: Dict[str, int] = defaultdict(int)
+	for d in range(len(problem.demands)):
+		demand_node = 2 + d
+		add_arc(demand_node, sink, problem.open_count(d), 0)
+		total_demand += problem.open_count(d)
+		for person_id in problem.eligible[d]:
+			pt_key = (person_id, problem.time_keys[d])
+			if pt_key in busy:
+				continue
+			if candidates_at_time[pt_key] == 1:
+				tail = person_node_of(person_id)
+				slots_per_person[person_id] += 1
+			else:
+				tail = person_time_nodes.get(pt_key)
+				if tail is None:
+					tail = person_time_nodes[pt_key] = num_nodes
+					num_nodes += 1
+					add_arc(person_node_of(person_id), tail, 1, 0)
+					slots_per_person[person_id] += 1
+			candidate_arcs.append((len(starts), d, person_id))
+			add_arc(tail, demand_node, 1, 0)
+
+	# Выпуклая стоимость нагрузки: единичные дуги 1..K, где K с запасом больше
+	# средней нагрузки, и одна дуга на остаток со стоимостью выше любой из них
+	total_load = total_demand + sum(base_load.get(person_id, 0) for person_id in slots_per_person)
+	balanced_load = 2 * (-(-total_load // max(1, len(slots_per_person)))) + 1
+	for person_id, num_slots in slots_per_person.items():
+		person_node = person_nodes[person_id]
+		base = base_load.get(person_id, 0)
+		unit_arcs = min(num_slots, max(0, balanced_load - base))
+		for k in range(1, unit_arcs + 1):
+			add_arc(source, person_node, 1, base + k)
+		if num_slots > unit_arcs:
+			add_arc(source, person_node, num_slots - unit_arcs, base + num_slots + 1)
+
+	staffed: List[List[str]] = [[] for _ in problem.demands]
+	if not candidate_arcs:
+		return staffed
+
+	smcf = min_cost_flow.SimpleMinCostFlow()
+	smcf.add_arcs_with_capacity_and_unit_cost(
+		np.array(starts, dtype=np.int32),
+		np.array(ends, dtype=np.int32),
+		np.array(capacities, dtype=np.int64),
+		np.array(costs, dtype=np.int64),
+	)
+	supplies = np.zeros(num_nodes, dtype=np.int64)
+	supplies[source] = total_demand
+	supplies[sink] = -total_demand
+	smcf.set_nodes_supplies(np.arange(num_nodes, dtype=np.int32), supplies)
+	status = smcf.solve_max_flow_with_min_cost()
+	if status != smcf.OPTIMAL:
+		raise Exception(f"Не удалось распределить людей по ролям (статус потока: {status})")
+
+	flows = smcf.flows(np.array([arc for arc, _, _ in candidate_arcs], dtype=np.int32))
+	for (_, d, person_id), flow in zip(candidate_arcs, flows):
+		if flow > 0:
+			staffed[d].append(person_id)
+	return staffed
+
+
+def assign_min_cost_flow(
+	scenario: Scenario, schedule: List[ScheduleItem], budget: Optional[AssignmentBudget] = None
+) -> List[Assignment]:
+	"""Распределение потоком минимальной стоимости (см. _solve_flow).
+
+	Позиции, на которые не хватило людей без двойных назначений, остаются
+	незаполненными.
+	"""
+	problem = _build_staffing_problem(scenario, schedule)
+	return _assignments(scenario, problem, _solve_flow(problem))
+
+
+def assignment_index(assignments: Iterable[Assignment]) -> Dict[Tuple[str, str], List[Assignment]]:
+	"""Назначения по ключу (schedule_item_id, role_id)."""
+	index: Dict[Tuple[str, str], List[Assignment]] = defaultdict(list)
+	for a in assignments:
+		index[(a.schedule_item_id, a.role_id)].append(a)
+	return index
+
+
+def repair_assignments(
+	scenario: Scenario,
+	schedule: List[ScheduleItem],
+	assignments: List[Assignment],
+	pinned: Iterable[Assignment] = (),
+) -> Tuple[List[Assignment], List[Assignment], List[Assignment]]:
+	"""Дозаполнить назначения после ручной правки или перерешения расписания.
+
+	pinned (ручные правки) сохраняются как есть. Из остальных назначений
+	остаются все, что по-прежнему корректны: показ есть в расписании, роль
+	относится к постановке, человек допущен к роли, не занят в то же время
+	и позиция не переполнена. Освободившиеся и новые позиции заполняются
+	потоком минимальной стоимости с учётом занятости и нагрузки оставшихся.
+	Возвращает (новый список назначений, добавленные, удалённые).
+	"""
+	index = scenario.eligibility
+	items = {item.schedule_item_id: item for item in schedule}
+
+	pinned = list(pinned)
+	pinned_ids = {id(a) for a in pinned}
+	busy: Set[Tuple[str, TimeKey]] = set()
+	load: Counter = Counter()
+	filled: Counter = Counter()
+	kept_ids: Set[int] = set()
+	for a in pinned + [a for a in assignments if id(a) not in pinned_ids]:
+		item = items.get(a.schedule_item_id)
+		role = index.roles.get(a.role_id)
+		if item is None or role is None or role.production_id != item.production_id:
+			continue
+		pt_key = (a.person_id, _time_key(scenario, item))
+		if pt_key in busy:
+			continue
+		if id(a) not in pinned_ids and (
+			not index.can_play(a.person_id, item.production_id, role.id)
+			or filled[(a.schedule_item_id, role.id)] >= role.required_count
+		):
+			continue
+		kept_ids.add(id(a))
+		busy.add(pt_key)
+		load[a.person_id] += 1
+		filled[(a.schedule_item_id, role.id)] += 1
+
+	full = _build_staffing_problem(scenario, schedule)
+	open_positions = _StaffingProblem(demands=[], eligible=[], time_keys=[], capacity=[])
+	for d, (item, role) in enumerate(full.demands):
+		missing = role.required_count - filled[(item.schedule_item_id, role.id)]
+		if missing > 0:
+			open_positions.demands.append((item, role))
+			open_positions.eligible.append(full.eligible[d])
+			open_positions.time_keys.append(full.time_keys[d])
+			open_positions.capacity.append(missing)
+	staffed = _solve_flow(open_positions, busy, load)
+
+	added = [a for a in pinned if id(a) in kept_ids]
+	added += [
+		_make_assignment(scenario, item, role, person_id)
+		for (item, role), people in zip(open_positions.demands, staffed)
+		for person_id in people
+	]
+	removed = [a for a in assignments if id(a) not in kept_ids]
+	kept = [a for a in assignments if id(a) in kept_ids and id(a) not in pinned_ids]
+	return kept + added, added, removed
+
+
+def assign_cp_sat(
+	scenario: Scenario, schedule: List[ScheduleItem], budget: Optional[AssignmentBudget] = None
+) -> List[Assignment]:
+	"""Распределение отдельной моделью CP-SAT.
+
+	Сначала максимизируется число заполненных позиций, затем минимизируется
+	максимальная нагрузка на одного человека. Решение потока используется как
+	подсказка, поэтому результат не хуже "flow". Модель решается в потоках и
+	за остаток времени из budget; если времени не осталось, возвращается
+	решение потока.
+	"""
+	budget = budget or AssignmentBudget()
+	time_limit = scenario.params.time_limit_seconds if budget.time_limit_seconds is None else budget.time_limit_seconds
+	problem = _build_staffing_problem(scenario, schedule)
+	hint = _solve_flow(problem)
+	if time_limit <= 0:
+		return _assignments(scenario, problem, hint)
+
+	model = cp_model.CpModel()
+	x: Dict[Tuple[int, str], cp_model.IntVar] = {}
+	by_person_time: Dict[Tuple[str, TimeKey], List[cp_model.IntVar]] = defaultdict(list)
+	by_person: Dict[str, List[cp_model.IntVar]] = defaultdict(list)
+	for d, (_, role) in enumerate(problem.demands):
+		hinted = set(hint[d])
+		for person_id in problem.eligible[d]:
+			var = model.NewBoolVar(f"a_{d}_{person_id}")
+			x[(d, person_id)] = var
+			model.AddHint(var, person_id in hinted)
+			by_person_time[(person_id, problem.time_keys[d])].append(var)
+			by_person[person_id].append(var)
+		if problem.eligible[d]:
+			model.Add(cp_model.LinearExpr.Sum([x[(d, p)] for p in problem.eligible[d]]) <= role.required_count)
+
+	for vars_at_time in by_person_time.values():
+		if len(vars_at_time) > 1:
+			model.AddAtMostOne(vars_at_time)
+
+	max_load = model.NewIntVar(0, len(problem.demands), "max_load")
+	for vars_of_person in by_person.values():
+		model.Add(cp_model.LinearExpr.Sum(vars_of_person) <= max_load)
+
+	if x:
+		# Каждая заполненная позиция важнее любого выигрыша по максимальной нагрузке
+		model.Maximize((len(problem.demands) + 1) * cp_model.LinearExpr.Sum(list(x.values())) - max_load)
+
+	solver = cp_model.CpSolver()
+	solver.parameters.max_time_in_seconds = float(time_limit)
+	solver.parameters.num_search_workers = max(1, budget.num_search_workers)
+	status = solver.Solve(model)
+
+	if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+		staffed = [
+			[p for p in problem.eligible[d] if solver.Value(x[(d, p)])]
+			for d in range(len(problem.demands))
+		]
+	else:
+		staffed = hint
+	return _assignments(scenario, problem, staffed)
+
+
+def _assignments(scenario: Scenario, problem: _StaffingProblem, staffed: List[List[str]]) -> List[Assignment]:
+	return [
+		_make_assignment(scenario, item, role, person_id)
+		for (item, role), people in zip(problem.demands, staffed)
+		for person_id in people
+	]
+
+
+def assign_greedy(
+	scenario: Scenario, schedule: List[ScheduleItem], budget: Optional[AssignmentBudget] = None
+) -> List[Assignment]:
+	"""Распределяет людей по ролям для каждого показа с балансировкой нагрузки.
+
+	Алгоритм:
+	1. Для каждого элемента расписания находим нужные роли
+	2. Для каждой роли находим людей, которые могут её играть
+	3. Распределяем людей равномерно (каждый человек играет примерно одинаковое количество раз)
+
+	Пересечения по времени не проверяются: человек может попасть на два
+	показа в одно время.
+	"""
+	assignments = []
+	index = scenario.eligibility
+
+	# Считаем, сколько раз каждый человек уже назначен (для балансировки)
+	person_assignment_count: Dict[str, int] = defaultdict(int)
+
+	# Группируем элементы расписания по постановке для балансировки
+	schedule_by_production: Dict[str, List[ScheduleItem]] = defaultdict(list)
+	for item in schedule:
+		schedule_by_production[item.production_id].append(item)
+
+	# Для каждой постановки распределяем людей равномерно
+	for production_id, production_items in schedule_by_production.items():
+		roles = index.roles_of_production(production_id)
+
+		# Для каждой роли в этой постановке
+		for role in roles:
+			# Находим людей, которые могут играть эту роль
+			available_people = [index.people[pid] for pid in index.eligible_people(production_id, role.id)]
+
+			if not available_people:
+				# Если нет доступных людей, пропускаем роль (или можно выбросить ошибку)
+				continue
+
+			# Сортируем людей по количеству уже сделанных назначений (для балансировки)
+			available_people.sort(key=lambda p: person_assignment_count[p.id])
+
+			# Распределяем назначения
+			assignment_idx = 0
+			for item in production_items:
+				# Назначаем требуемое количество людей на эту роль
+				for _ in range(role.required_count):
+					if assignment_idx >= len(available_people):
+						# Если людей не хватает, начинаем заново (циклическое распределение)
+						assignment_idx = 0
+
+					person = available_people[assignment_idx]
+					assignments.append(_make_assignment(scenario, item, role, person.id))
+					person_assignment_count[person.id] += 1
+					assignment_idx += 1
+
+	return assignments
+
+
+ASSIGNMENT_ENGINES: Dict[str, AssignmentEngine] = {
+	"flow": assign_min_cost_flow,
+	"cp_sat": assign_cp_sat,
+	"greedy": assign_greedy,
+}
+
+
+def register_assignment_engine(name: str, engine: AssignmentEngine) -> None:
+	"""Подключить собственный метод распределения под именем name."""
+	ASSIGNMENT_ENGINES[name] = engine
+
+
+def assign_people_to_roles(
+	scenario: Scenario, schedule: List[ScheduleItem], budget: Optional[AssignmentBudget] = None
+) -> List[Assignment]:
+	"""Распределить людей методом из scenario.params.assignment_engine (budget — см. AssignmentBudget)."""
+	name = scenario.params.assignment_engine
+	engine = ASSIGNMENT_ENGINES.get(name)
+	if engine is None:
+		raise ValueError(f"Неизвестный метод распределения по ролям: {name}")
+	return engine(scenario, schedule, budget)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+"""
+Распределение ядер процессора между одновременными решениями CP-SAT.
+
+Число потоков поиска фиксируется при запуске Solve, поэтому каждое решение
+получает долю ядер при старте: поровну между решениями, которые сейчас
+выполняются или ждут в очереди, и не больше свободных ядер.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+def available_cores() -> int:
+	"""Ядра, доступные процессу: с учётом привязки к CPU и квоты cgroup (лимит CPU контейнера)."""
+	try:
+		cores = len(os.sched_getaffinity(0))
+	except AttributeError:  # нет sched_getaffinity (macOS, Windows)
+		cores = os.cpu_count() or 1
+	quota = _cgroup_cpu_quota()
+	if quota is not None:
+		cores = min(cores, max(1, int(quota)))
+	return max(1, cores)
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+	"""Квота CPU cgroup в ядрах (v2: cpu.max, v1: cfs_quota_us / cfs_period_us), либо None."""
+	try:
+		with open("/sys/fs/cgroup/cpu.max") as f:
+			quota, period = f.read().split()[:2]
+		return None if quota == "max" else int(quota) / int(period)
+	except (OSError, ValueError):
+		pass
+	try:
+		with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+			quota = int(f.read())
+		with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+			period = int(f.read())
+		return None if quota <= 0 else quota / period
+	except (OSError, ValueError):
+		return None
+
+
+class CoreAllocator:
+	"""Выдаёт решениям потоки поиска так, чтобы в сумме не превышать total_cores.
+
+	demand — сколько решений претендует на ядра одновременно (вместе с
+	запрашивающим); доля — total_cores // demand, но не больше свободных ядер
+	и не меньше одного потока.
+	"""
+	def __init__(self, total_cores: Optional[int] = None) -> None:
+		self.total_cores = max(1, total_cores or available_cores())
+		self._in_use = 0
+		self._running = 0
+		self._lock = threading.Lock()
+
+	def acquire(self, demand: Optional[int] = None) -> int:
+		with self._lock:
+			demand = max(demand or 0, self._running + 1)
+			grant = max(1, min(self.total_cores // demand, self.total_cores - self._in_use))
+			self._in_use += grant
+			self._running += 1
+			return grant
+
+	def release(self, cores: int) -> None:
+		with self._lock:
+			self._in_use -= cores
+			self._running -= 1
+
+	@contextmanager
+	def allocate(self, demand: Optional[int] = None) -> Iterator[int]:
+		"""Число потоков на время решения (возвращаются при выходе из блока)."""
+		cores = self.acquire(demand)
+		try:
+			yield cores
+		finally:
+			self.release(cores)
+
+	def stats(self) -> Dict:
+		with self._lock:
+			return {"total_cores": self.total_cores, "in_use": self._in_use, "running": self._running}
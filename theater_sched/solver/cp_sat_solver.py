@@ -1,8 +1,18 @@
 from __future__ import annotations
+import hashlib
+import multiprocessing
+import threading
+import time
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from functools import partial
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
 from ortools.sat.python import cp_model
 
+from theater_sched.domain.compiled import CompiledScenario
 from theater_sched.domain.models import (
 	Assignment,
 	FixedAssignment,
@@ -13,208 +23,919 @@ from theater_sched.domain.models import (
 	ScheduleItem,
 	Scenario,
 	ScenarioResult,
+	SolveStats,
+	SolverParams,
+	StopParams,
 	TimeSlot,
 )
+from theater_sched.solver.assignment import AssignmentBudget, assign_people_to_roles, repair_assignments
+
+
+# Число потоков CP-SAT на одно решение, если ни сервер (CoreAllocator), ни сценарий его не задали
+NUM_SEARCH_WORKERS = 8
+
+# Событие остановки и очередь промежуточных решений в дочернем процессе пула (см. _solve_by_stage)
+_worker_stop_event = None
+_worker_solution_queue = None
+
+# (objective, bound, [(production_id, timeslot_id), ...]) -> None
+PartSolutionHandler = Callable[[float, float, List[Tuple[str, str]]], None]
 
 
 def _key(p: str, s: str, t: str) -> str:
 	return f"{p}|{s}|{t}"
 
 
-class MinimalCPSATSolver:
-	def solve(self, scenario: Scenario) -> ScenarioResult:
-		model = cp_model.CpModel()
-
-		# Вытаскиваем данные из созданного сценария
-		productions: List[Production] = scenario.productions
-		timeslots: List[TimeSlot] = scenario.timeslots
-		constraints = scenario.params.constraints        # зачем ?
-		fixed_assignments: List[FixedAssignment] = scenario.fixed_assignments or []
-
-		# Инициализация переменных для модели
-		x: Dict[Tuple[str, str], cp_model.IntVar] = {}
-		for p in productions:
-			for t in timeslots:
-				if p.stage_id == t.stage_id:
-					x[(p.id, t.id)] = model.NewBoolVar(f"x_{p.id}_{t.id}")
-
-		# Жесткие ограничения:
-
-		# Учёт фиксированных спектаклей
-		for fa in fixed_assignments:
-			var = x.get((fa.production_id, fa.timeslot_id))
-			if var is not None: model.Add(var == 1)
-			else: raise Exception("Входные данные не согласованы")
-
-		# Каждый таймслот -> максимум одна постановка
-		for t in timeslots:
-			relevant_prods = [p for p in productions if p.stage_id == t.stage_id]
-			if relevant_prods:
-				slot_vars = [x.get((p.id, t.id)) for p in relevant_prods if x.get((p.id, t.id)) is not None]
-				if slot_vars: model.Add(sum(slot_vars) <= 1)
-
-		# Учёт требуемого количества постановок
-		for p in productions:
-			relevant_slots = [t for t in timeslots if t.stage_id == p.stage_id]
-			prod_vars = [x.get((p.id, t.id)) for t in relevant_slots if x.get((p.id, t.id)) is not None]
-			if prod_vars: model.Add(sum(prod_vars) == p.max_shows)
-			else: raise Exception("Для данной сцены нет таймслотов")
-
-		# Понедельник - выходной день
-		if constraints.monday_off:
-			for t in timeslots:
-				if t.day_of_week == 0:
-					relevant_prods = [p for p in productions if p.stage_id == t.stage_id]
-					prod_vars = [x.get((p.id, t.id)) for p in relevant_prods if x.get((p.id, t.id)) is not None]
-					model.Add(sum(prod_vars) == 0)
-
-		# Показы спектаклей идут подряд
-		if constraints.consecutive_shows:
-			for p in productions:
-				if p.max_shows <= 1: continue
-				ts_for_prod = sorted([t for t in timeslots if t.stage_id == p.stage_id],
-									  key=lambda ts: (ts.date, ts.start_time))
-				
-				start_vars = {}
-				for i in range(len(ts_for_prod)-p.max_shows+1):
-					start_var = model.NewBoolVar(f"start_{p.id}_{ts_for_prod[i].id}")
-					start_vars[ts_for_prod[i].id] = start_var
-					
-					# после открывающего спектакля -> все остальные идут за ним
-					for j in range(p.max_shows):
-						var = x.get((p.id, ts_for_prod[i + j].id))
-						if var is not None: model.Add(var >= start_var)
-
-				# одно начало последовательности
-				model.Add(sum(start_vars.values()) == 1)
-
-
-		# Мягкие ограничения (максимизация)
-
-		# Заполнение каждого слота в выходной день
-		weekend_empty_penalty: List[cp_model.LinearExpr] = []
-		if constraints.weekend_always_show:
-			for t in [t for t in timeslots if t.day_of_week in (5, 6)]:
-				relevant_prods = [p for p in productions if p.stage_id == t.stage_id]
-				slot_vars = [x.get((p.id, t.id)) for p in relevant_prods if x.get((p.id, t.id)) is not None]
-				if slot_vars:
-					weekend_empty_penalty.append(1 - sum(slot_vars))
-
-		# Учёт приоритета для спектаклей выходного дня
-		weekend_priority_bonus: List[cp_model.LinearExpr] = []
-		if constraints.weekend_priority_bonus:
-			slots_by_stage = defaultdict(list)
-			for t in (t for t in timeslots if t.day_of_week in (5, 6)):
-				slots_by_stage[t.stage_id].append(t)
-
-			for p in (p for p in productions if p.weekend_priority):
-				weekend_slot_vars = []
-				for slot in slots_by_stage[p.stage_id]:
-					var = x.get((p.id, slot.id))
-					if var is not None: weekend_slot_vars.append(var)
-
-				weekend_priority_bonus.append(sum(weekend_slot_vars))
-
-		# Мягкое ограничение: между РАЗНЫМИ спектаклями желателен пустой слот (перерыв)
-		# Реализуем штраф за отсутствие пустого слота между разными спектаклями на буднях (Вт–Пт)
-		penalty_terms: List[cp_model.LinearExpr] = []
-		if constraints.break_between_different_shows:
-			# Группируем таймслоты по сцене
-			slots_by_stage: Dict[str, List[TimeSlot]] = defaultdict(list)
-			for t in timeslots:
-				if t.day_of_week in [0, 1, 2, 3, 4, 5, 6]:  # Вт-Пт, исключаем понедельник и выходные
-					slots_by_stage[t.stage_id].append(t)
-			# Для каждой сцены рассматриваем соседние по времени слоты
-			for stage_id, stage_slots in slots_by_stage.items():
-				stage_slots.sort(key=lambda ts: (ts.date, ts.start_time))
-				for i in range(len(stage_slots) - 1):
-					t1, t2 = stage_slots[i], stage_slots[i + 1]
-					# A = назначен ли кто-то в t1; B = назначен ли кто-то в t2
-					A_vars = [x.get((p.id, t1.id)) for p in productions if p.stage_id == stage_id]
-					B_vars = [x.get((p.id, t2.id)) for p in productions if p.stage_id == stage_id]
-					A_vars = [v for v in A_vars if v is not None]
-					B_vars = [v for v in B_vars if v is not None]
-					if not A_vars or not B_vars:
-						continue
-					A_sum = sum(A_vars)
-					B_sum = sum(B_vars)
-					# both_assigned = AND(A_sum==1, B_sum==1) через стандартную линейную релаксацию
-					both_assigned = model.NewBoolVar(f"both_assigned_{stage_id}_{t1.id}_{t2.id}")
-					model.Add(both_assigned <= A_sum)
-					model.Add(both_assigned <= B_sum)
-					model.Add(both_assigned >= A_sum + B_sum - 1)
-					# same_prod = существует p, такой что x[p,t1]==1 и x[p,t2]==1
-					same_terms: List[cp_model.IntVar] = []
-					for p in productions:
-						if p.stage_id != stage_id:
-							continue
-						v1 = x.get((p.id, t1.id))
-						v2 = x.get((p.id, t2.id))
-						if v1 is None or v2 is None:
-							continue
-						y = model.NewBoolVar(f"same_{p.id}_{t1.id}_{t2.id}")
-						model.Add(y <= v1)
-						model.Add(y <= v2)
-						model.Add(y >= v1 + v2 - 1)
-						same_terms.append(y)
-					same_sum = sum(same_terms) if same_terms else 0
-					# different_adjacent = both_assigned - same_sum (0/1)
-					# Добавляем как штраф: если подряд идут РАЗНЫЕ спектакли без пустого слота
-					penalty_terms.append(both_assigned - same_sum)
+@dataclass
+class WarmStart:
+	"""Данные тёплого старта из прошлого решения.
+
+	assigned — пары (production_id, timeslot_id) прошлого расписания, они
+	передаются в CP-SAT как подсказки (AddHint). Для сцен из fixed_stages
+	прошлое решение закрепляется жёстко.
+	"""
+	assigned: Set[Tuple[str, str]] = field(default_factory=set)
+	fixed_stages: Set[str] = field(default_factory=set)
+
+
+def stage_fingerprints(scenario: Scenario) -> Dict[str, str]:
+	"""Отпечаток входных данных каждой сцены (постановки, слоты, закрепления, ограничения).
+
+	Совпадение отпечатков означает, что подзадача сцены не изменилась и её
+	прошлое решение можно переиспользовать.
+	"""
+	constraints = sorted(asdict(scenario.params.constraints).items())
+	stage_of_production = {p.id: p.stage_id for p in scenario.productions}
+	data: Dict[str, List[Tuple]] = defaultdict(list)
+	for p in scenario.productions:
+		data[p.stage_id].append(("p", p.id, p.max_shows, p.weekend_priority))
+	for t in scenario.timeslots:
+		data[t.stage_id].append(("t", t.id, t.date, t.day_of_week, t.start_time))
+	for fa in scenario.fixed_assignments or []:
+		data[stage_of_production.get(fa.production_id, fa.stage_id)].append(("f", fa.production_id, fa.timeslot_id))
+	return {
+		stage_id: hashlib.sha1(repr((sorted(items), constraints)).encode("utf-8")).hexdigest()
+		for stage_id, items in data.items()
+	}
+
+
+class _EarlyStop:
+	"""Досрочная остановка поиска по критериям StopParams; reason — сработавший критерий.
+
+	Разрыв проверяется на каждом решении и при улучшении границы
+	(best_bound_callback), первое решение — в колбэке решений, а время без
+	улучшений — потоком наблюдения (_watch_search).
+	"""
+	def __init__(self, cp_solver: cp_model.CpSolver, params: StopParams) -> None:
+		self._cp_solver = cp_solver
+		self._params = params
+		self._objective: Optional[float] = None
+		self._last_improvement: Optional[float] = None
+		self._lock = threading.Lock()
+		self.reason: Optional[str] = None
+
+	@property
+	def needs_watch(self) -> bool:
+		return self._params.no_improvement_seconds is not None
+
+	def on_solution(self, objective: float, bound: float) -> None:
+		with self._lock:
+			self._objective = objective
+			self._last_improvement = time.monotonic()
+			if self._params.first_feasible:
+				self._stop("first_feasible")
+			else:
+				self._check_gap(bound)
+
+	def on_bound(self, bound: float) -> None:
+		with self._lock:
+			if self._objective is not None:
+				self._check_gap(bound)
+
+	def should_stop(self) -> bool:
+		"""Проверить время без улучшений; True, если поиск нужно остановить."""
+		with self._lock:
+			limit = self._params.no_improvement_seconds
+			if (
+				self.reason is None and limit is not None and self._last_improvement is not None
+				and time.monotonic() - self._last_improvement >= limit
+			):
+				self._stop("no_improvement")
+			return self.reason is not None
+
+	def _check_gap(self, bound: float) -> None:
+		gap = abs(bound - self._objective)
+		if self._params.absolute_gap is not None and gap <= self._params.absolute_gap:
+			self._stop("gap")
+		elif self._params.relative_gap is not None and _relative_gap(self._objective, bound) <= self._params.relative_gap:
+			self._stop("gap")
+
+	def _stop(self, reason: str) -> None:
+		if self.reason is None:
+			self.reason = reason
+		self._cp_solver.StopSearch()
+
+
+def _watch_search(
+	cp_solver: cp_model.CpSolver,
+	stop_event,
+	early_stop: Optional[_EarlyStop],
+	finished: threading.Event,
+) -> None:
+	"""Останавливает поиск CP-SAT по событию отмены или по времени без улучшений.
+
+	StopSearch действует только во время Solve, поэтому при отмене вызываем его
+	повторно, пока решатель не завершится.
+	"""
+	while not finished.is_set():
+		cancelled = stop_event is not None and stop_event.is_set()
+		if cancelled or (early_stop is not None and early_stop.should_stop()):
+			cp_solver.StopSearch()
+		finished.wait(0.1)
+
+
+class _ScheduleSolutionCallback(cp_model.CpSolverSolutionCallback):
+	"""Передаёт каждое улучшающее решение CP-SAT в on_solution и критерии остановки."""
+	def __init__(
+		self,
+		x: Dict[Tuple[str, str], cp_model.IntVar],
+		on_solution: Optional[PartSolutionHandler],
+		early_stop: Optional[_EarlyStop] = None,
+	) -> None:
+		super().__init__()
+		self._x = x
+		self._on_solution = on_solution
+		self._early_stop = early_stop
+
+	def on_solution_callback(self) -> None:
+		objective, bound = self.ObjectiveValue(), self.BestObjectiveBound()
+		if self._on_solution is not None:
+			assigned = [key for key, var in self._x.items() if self.BooleanValue(var)]
+			self._on_solution(objective, bound, assigned)
+		if self._early_stop is not None:
+			self._early_stop.on_solution(objective, bound)
+
+
+class _SolutionReporter:
+	"""Собирает промежуточные решения подзадач в общие события для клиента.
+
+	Событие: значение цели, граница, относительный разрыв, время с начала
+	решения и изменения расписания (added/removed) относительно прошлого события.
+	"""
+	def __init__(self, scenario: Scenario, num_parts: int, on_solution: Callable[[Dict], None]) -> None:
+		self._stage_of_timeslot = {t.id: t.stage_id for t in scenario.timeslots}
+		self._on_solution = on_solution
+		self._num_parts = num_parts
+		self._parts: Dict[int, Tuple[float, float, List[Tuple[str, str]]]] = {}
+		self._previous: set = set()
+		self._started = time.monotonic()
+		self._lock = threading.Lock()
+
+	def update(self, part_index: int, objective: float, bound: float, assigned: List[Tuple[str, str]]) -> None:
+		with self._lock:
+			self._parts[part_index] = (objective, bound, assigned)
+			current = {key for _, _, keys in self._parts.values() for key in keys}
+			added, removed = current - self._previous, self._previous - current
+			self._previous = current
+			objective_total = sum(obj for obj, _, _ in self._parts.values())
+			bound_total = sum(b for _, b, _ in self._parts.values())
+			event = {
+				"objective_value": objective_total,
+				"best_bound": bound_total,
+				"gap": abs(bound_total - objective_total) / max(1.0, abs(objective_total)),
+				"wall_time": round(time.monotonic() - self._started, 3),
+				"complete": len(self._parts) == self._num_parts,
+				"added": [self._item(key) for key in sorted(added)],
+				"removed": [self._item(key) for key in sorted(removed)],
+			}
+		self._on_solution(event)
+
+	def _item(self, key: Tuple[str, str]) -> Dict:
+		production_id, timeslot_id = key
+		return {
+			"production_id": production_id,
+			"stage_id": self._stage_of_timeslot.get(timeslot_id, ""),
+			"timeslot_id": timeslot_id,
+		}
+
+
+class _ModelIndex:
+	"""Индексы для построения модели поверх скомпилированного сценария (Scenario.compiled).
+
+	Постановки и слоты — целые индексы CompiledScenario; порядок слотов каждой
+	сцены по (дата, время) посчитан при компиляции и здесь не пересортировывается.
+	"""
+	def __init__(self, compiled: CompiledScenario) -> None:
+		self.compiled = compiled
+		# Переменные по индексу слота и по индексу постановки (в порядке compiled.stage_slots)
+		self.slot_vars: List[List[cp_model.IntVar]] = [[] for _ in compiled.timeslots]
+		self.production_vars: List[List[cp_model.IntVar]] = [[] for _ in compiled.productions]
+		# Семейство ограничений -> {"variables": ..., "constraints": ...} (см. _ModelSizes)
+		self.families: Dict[str, Dict[str, int]] = {}
+
+	def stage_slots_of(self, p: int) -> List[int]:
+		"""Отсортированные слоты сцены постановки p (парные к production_vars[p])."""
+		return self.compiled.stage_slots[self.compiled.production_stage[p]].tolist()
+
+
+class _ModelSizes:
+	"""Считает переменные и ограничения модели по семействам ограничений.
+
+	mark(family) относит к семейству всё, что добавлено в модель с прошлой
+	отметки; семейства без переменных и ограничений не записываются.
+	"""
+	def __init__(self, model: cp_model.CpModel, families: Dict[str, Dict[str, int]]) -> None:
+		self._model = model
+		self._families = families
+		self._variables = 0
+		self._constraints = 0
+
+	def mark(self, family: str) -> None:
+		proto = self._model.Proto()
+		variables, constraints = len(proto.variables), len(proto.constraints)
+		if variables > self._variables or constraints > self._constraints:
+			entry = self._families.setdefault(family, {"variables": 0, "constraints": 0})
+			entry["variables"] += variables - self._variables
+			entry["constraints"] += constraints - self._constraints
+		self._variables, self._constraints = variables, constraints
+
+
+def _build_model(
+	scenario: Scenario,
+	warm_start: Optional[WarmStart] = None,
+) -> Tuple[cp_model.CpModel, Dict[Tuple[str, str], cp_model.IntVar], _ModelIndex]:
+	"""Строит CP-SAT модель расписания: переменные x[(p, t)], ограничения и цель."""
+	model = cp_model.CpModel()
+
+	# Вытаскиваем данные из созданного сценария (в скомпилированной форме)
+	compiled = scenario.compiled
+	productions: List[Production] = compiled.productions
+	timeslots: List[TimeSlot] = compiled.timeslots
+	constraints = scenario.params.constraints        # зачем ?
+	fixed_assignments: List[FixedAssignment] = scenario.fixed_assignments or []
+	index = _ModelIndex(compiled)
+	sizes = _ModelSizes(model, index.families)
+
+	# Инициализация переменных для модели (только пары постановка/слот одной сцены)
+	x: Dict[Tuple[str, str], cp_model.IntVar] = {}
+	for stage, stage_prods in enumerate(compiled.stage_productions):
+		if not len(stage_prods): continue
+		stage_prods = stage_prods.tolist()
+		for t in compiled.stage_slots[stage].tolist():
+			t_id = timeslots[t].id
+			for p in stage_prods:
+				p_id = productions[p].id
+				var = model.NewBoolVar(f"x_{p_id}_{t_id}")
+				x[(p_id, t_id)] = var
+				index.slot_vars[t].append(var)
+				index.production_vars[p].append(var)
+	sizes.mark("x")
+
+	# Жесткие ограничения:
+
+	# Учёт фиксированных спектаклей
+	for fa in fixed_assignments:
+		var = x.get((fa.production_id, fa.timeslot_id))
+		if var is not None: model.Add(var == 1)
+		else: raise Exception("Входные данные не согласованы")
+	sizes.mark("fixed_assignments")
+
+	# Тёплый старт: прошлое решение как подсказка, неизменившиеся сцены — жёстко
+	if warm_start is not None:
+		fixed_stages = {compiled.stage_index[s] for s in warm_start.fixed_stages if s in compiled.stage_index}
+		for (p_id, t_id), var in x.items():
+			value = 1 if (p_id, t_id) in warm_start.assigned else 0
+			model.AddHint(var, value)
+			if compiled.slot_stage[compiled.timeslot_index[t_id]] in fixed_stages:
+				model.Add(var == value)
+	sizes.mark("warm_start")
+
+	# Каждый таймслот -> максимум одна постановка
+	for slot_vars in index.slot_vars:
+		if slot_vars: model.Add(cp_model.LinearExpr.Sum(slot_vars) <= 1)
+	sizes.mark("one_production_per_timeslot")
+
+	# Учёт требуемого количества постановок
+	for p, prod_vars in enumerate(index.production_vars):
+		if prod_vars: model.Add(cp_model.LinearExpr.Sum(prod_vars) == productions[p].max_shows)
+		else: raise Exception("Для данной сцены нет таймслотов")
+	sizes.mark("exact_shows_count")
+
+	weekend = compiled.slot_dow >= 5
+
+	# Понедельник - выходной день
+	if constraints.monday_off:
+		for t in np.flatnonzero(compiled.slot_dow == 0).tolist():
+			if index.slot_vars[t]:
+				model.Add(cp_model.LinearExpr.Sum(index.slot_vars[t]) == 0)
+	sizes.mark("monday_off")
+
+	# Показы спектаклей идут подряд
+	if constraints.consecutive_shows:
+		if constraints.consecutive_encoding == "start_index":
+			_add_consecutive_start_index(model, index)
+		else:
+			_add_consecutive_windows(model, index)
+	sizes.mark("consecutive_shows")
+
+
+	# Мягкие ограничения (максимизация)
+
+	# Заполнение каждого слота в выходной день
+	weekend_empty_penalty: List[cp_model.LinearExpr] = []
+	if constraints.weekend_always_show:
+		for t in np.flatnonzero(weekend).tolist():
+			if index.slot_vars[t]:
+				weekend_empty_penalty.append(1 - cp_model.LinearExpr.Sum(index.slot_vars[t]))
+
+	# Учёт приоритета для спектаклей выходного дня
+	weekend_priority_bonus: List[cp_model.LinearExpr] = []
+	if constraints.weekend_priority_bonus:
+		for p in (p for p, prod in enumerate(productions) if prod.weekend_priority):
+			weekend_slot_vars = [
+				var for t, var in zip(index.stage_slots_of(p), index.production_vars[p])
+				if weekend[t]
+			]
+			weekend_priority_bonus.append(cp_model.LinearExpr.Sum(weekend_slot_vars))
+
+	# Мягкое ограничение: между РАЗНЫМИ спектаклями желателен пустой слот (перерыв)
+	# Штраф за отсутствие пустого слота между разными спектаклями в соседних слотах сцены
+	penalty_terms: List[cp_model.LinearExpr] = []
+	if constraints.break_between_different_shows:
+		if constraints.break_encoding == "compact":
+			penalty_terms = _compact_break_penalties(model, index)
+		else:
+			penalty_terms = _pairwise_break_penalties(model, index)
+	sizes.mark("break_between_different_shows")
+	
+
+	# Целевая функция:
+
+		# заполнение слотов в выходные дни    - штраф
+		# приоритет выходных спектаклей       - награда
+		# интервалы между разными спектаклями - штраф
+
+	objective_terms = []
+	# штраф - отсутствие перерыва между разными спектаклями
+	if constraints.break_between_different_shows: objective_terms.append(-cp_model.LinearExpr.Sum(penalty_terms) * 50)
+	# штраф - пустые выходные слоты
+	if constraints.weekend_always_show and weekend_empty_penalty: objective_terms.append(-cp_model.LinearExpr.Sum(weekend_empty_penalty))
+	# награда - приоритет выходных спектаклей
+	if constraints.weekend_priority_bonus: objective_terms.append(cp_model.LinearExpr.Sum(weekend_priority_bonus) * 100)
+
+	if objective_terms:
+		model.Maximize(cp_model.LinearExpr.Sum(objective_terms))
+	return model, x, index
+
+
+def _add_consecutive_windows(model: cp_model.CpModel, index: _ModelIndex) -> None:
+	"""Показы подряд: булева переменная начала на каждое допустимое окно.
+
+	На постановку — O(T) переменных и O(T * max_shows) импликаций.
+	"""
+	timeslots = index.compiled.timeslots
+	for p, prod in enumerate(index.compiled.productions):
+		if prod.max_shows <= 1: continue
+		ts_for_prod = index.stage_slots_of(p)
+		prod_vars = index.production_vars[p]
 		
+		start_vars = []
+		for i in range(len(ts_for_prod)-prod.max_shows+1):
+			start_var = model.NewBoolVar(f"start_{prod.id}_{timeslots[ts_for_prod[i]].id}")
+			start_vars.append(start_var)
+			
+			# после открывающего спектакля -> все остальные идут за ним
+			for j in range(prod.max_shows):
+				model.AddImplication(start_var, prod_vars[i + j])
+
+		# одно начало последовательности
+		model.Add(cp_model.LinearExpr.Sum(start_vars) == 1)
+
+
+def _add_consecutive_start_index(model: cp_model.CpModel, index: _ModelIndex) -> None:
+	"""Показы подряд: целочисленный индекс начала серии по слотам сцены.
+
+	start_p — номер первого слота серии в отсортированных слотах сцены.
+	Каждый показ x[p,i] = 1 требует start_p <= i <= start_p + max_shows - 1;
+	вместе с точным числом показов это означает, что серия занимает ровно
+	слоты start_p .. start_p + max_shows - 1. Серии одной сцены — интервалы
+	фиксированной длины, их непересечение добавлено как избыточное NoOverlap
+	для более сильного распространения. На постановку — 1 целая переменная,
+	интервал и 2T условных ограничений, независимо от max_shows.
+	"""
+	intervals_by_stage: Dict[str, List[cp_model.IntervalVar]] = defaultdict(list)
+	for p, prod in enumerate(index.compiled.productions):
+		if prod.max_shows <= 1: continue
+		prod_vars = index.production_vars[p]
+		last_start = max(0, len(prod_vars) - prod.max_shows)
+		start = model.NewIntVar(0, last_start, f"run_start_{prod.id}")
+		for i, var in enumerate(prod_vars):
+			model.Add(start <= i).OnlyEnforceIf(var)
+			model.Add(start >= i - prod.max_shows + 1).OnlyEnforceIf(var)
+		intervals_by_stage[prod.stage_id].append(
+			model.NewFixedSizeIntervalVar(start, prod.max_shows, f"run_{prod.id}")
+		)
+	for intervals in intervals_by_stage.values():
+		if len(intervals) > 1:
+			model.AddNoOverlap(intervals)
+
 
-		# Целевая функция:
-
-			# заполнение слотов в выходные дни    - штраф
-			# приоритет выходных спектаклей       - награда
-			# интервалы между разными спектаклями - штраф
-
-		objective_terms = []
-		# штраф - отсутствие перерыва между разными спектаклями
-		if constraints.break_between_different_shows: objective_terms.append(-sum(penalty_terms) * 50)
-		# штраф - пустые выходные слоты
-		if constraints.weekend_always_show and weekend_empty_penalty: objective_terms.append(-sum(weekend_empty_penalty))
-		# награда - приоритет выходных спектаклей
-		if constraints.weekend_priority_bonus: objective_terms.append(sum(weekend_priority_bonus) * 100)
-
-		model.Maximize(sum(objective_terms))
-
-		# Запускаем решатель
-		cp_solver = cp_model.CpSolver()
-		cp_solver.parameters.max_time_in_seconds = scenario.params.time_limit_seconds
-		cp_solver.parameters.num_search_workers = 8
-		status = cp_solver.Solve(model)
-
-		schedule: List[ScheduleItem] = []
-		objective_value: float = 0.0
-		if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-			# Извлекаем решение и формируем расписание
-			for p in productions:
-				for t in timeslots:
-					if p.stage_id == t.stage_id:  # Только если сцены совпадают
-						var = x.get((p.id, t.id))
-						if var is not None and cp_solver.Value(var) == 1:
-							rev = 0.0
-							schedule.append(
-								ScheduleItem(
-									scenario_id=scenario.id,
-									production_id=p.id,
-									stage_id=t.stage_id,  # Сцена из таймслота
-									timeslot_id=t.id,
-									revenue=rev,
-								)
-							)
-			# Значение цели = количество назначений
-			objective_value = float(cp_solver.ObjectiveValue())
-			result_status = "feasible" if status == cp_model.FEASIBLE else "optimal"
+def _pairwise_break_penalties(model: cp_model.CpModel, index: _ModelIndex) -> List[cp_model.LinearExpr]:
+	"""Штрафы за соседние разные спектакли: явные both_assigned и same_{p}.
+
+	На каждую пару соседних слотов — 1 + P вспомогательных переменных и
+	3 + 3P линейных ограничения.
+	"""
+	compiled = index.compiled
+	penalty_terms: List[cp_model.LinearExpr] = []
+	# Для каждой сцены рассматриваем соседние по времени слоты
+	for stage, stage_prods in enumerate(compiled.stage_productions):
+		if not len(stage_prods): continue
+		stage_id = compiled.stage_ids[stage]
+		stage_prods = stage_prods.tolist()
+		stage_slots = compiled.stage_slots[stage].tolist()
+		for i in range(len(stage_slots) - 1):
+			t1, t2 = stage_slots[i], stage_slots[i + 1]
+			t1_id, t2_id = compiled.timeslots[t1].id, compiled.timeslots[t2].id
+			# A = назначен ли кто-то в t1; B = назначен ли кто-то в t2
+			A_sum = cp_model.LinearExpr.Sum(index.slot_vars[t1])
+			B_sum = cp_model.LinearExpr.Sum(index.slot_vars[t2])
+			# both_assigned = AND(A_sum==1, B_sum==1) через стандартную линейную релаксацию
+			both_assigned = model.NewBoolVar(f"both_assigned_{stage_id}_{t1_id}_{t2_id}")
+			model.Add(both_assigned <= A_sum)
+			model.Add(both_assigned <= B_sum)
+			model.Add(both_assigned >= A_sum + B_sum - 1)
+			# same_prod = существует p, такой что x[p,t1]==1 и x[p,t2]==1
+			same_terms: List[cp_model.IntVar] = []
+			for p in stage_prods:
+				# i-й слот сцены — i-я переменная постановки
+				v1 = index.production_vars[p][i]
+				v2 = index.production_vars[p][i + 1]
+				y = model.NewBoolVar(f"same_{compiled.productions[p].id}_{t1_id}_{t2_id}")
+				model.Add(y <= v1)
+				model.Add(y <= v2)
+				model.Add(y >= v1 + v2 - 1)
+				same_terms.append(y)
+			same_sum = cp_model.LinearExpr.Sum(same_terms)
+			# different_adjacent = both_assigned - same_sum (0/1)
+			# Добавляем как штраф: если подряд идут РАЗНЫЕ спектакли без пустого слота
+			penalty_terms.append(both_assigned - same_sum)
+	return penalty_terms
+
+
+def _compact_break_penalties(model: cp_model.CpModel, index: _ModelIndex) -> List[cp_model.LinearExpr]:
+	"""Штрафы за соседние разные спектакли через индикатор смены на границе слотов.
+
+	change >= x[p,t1] + B - x[p,t2] - 1 для каждой постановки p сцены, где B —
+	занятость t2. Правая часть равна 1 ровно тогда, когда в t1 идёт p, а в t2 —
+	другой спектакль; в остальных случаях она <= 0, и штраф в цели прижимает
+	change к нулю. На пару соседних слотов — 1 переменная и P ограничений.
+	"""
+	compiled = index.compiled
+	penalty_terms: List[cp_model.LinearExpr] = []
+	for stage, stage_prods in enumerate(compiled.stage_productions):
+		if not len(stage_prods): continue
+		stage_id = compiled.stage_ids[stage]
+		stage_prods = stage_prods.tolist()
+		stage_slots = compiled.stage_slots[stage].tolist()
+		for i in range(len(stage_slots) - 1):
+			t1, t2 = stage_slots[i], stage_slots[i + 1]
+			B_sum = cp_model.LinearExpr.Sum(index.slot_vars[t2])
+			change = model.NewBoolVar(f"change_{stage_id}_{compiled.timeslots[t1].id}_{compiled.timeslots[t2].id}")
+			for p in stage_prods:
+				prod_vars = index.production_vars[p]
+				model.Add(change >= prod_vars[i] + B_sum - prod_vars[i + 1] - 1)
+			penalty_terms.append(change)
+	return penalty_terms
+
+
+def _search_workers(requested: Optional[int], budget: Optional[int]) -> int:
+	"""Потоки поиска: запрошенные в сценарии, но не больше выделенных сервером."""
+	if budget is None:
+		return requested or NUM_SEARCH_WORKERS
+	return max(1, min(requested, budget)) if requested else budget
+
+
+def _apply_search_params(parameters, params: SolverParams) -> None:
+	"""Переносит параметры поиска сценария в CpSolver.parameters (SatParameters)."""
+	if params.random_seed is not None:
+		parameters.random_seed = params.random_seed
+	if params.relative_gap_limit is not None:
+		parameters.relative_gap_limit = params.relative_gap_limit
+	if params.presolve_level <= 0:
+		parameters.cp_model_presolve = False
+	elif params.presolve_level == 1:
+		parameters.max_presolve_iterations = 1
+		parameters.cp_model_probing_level = 0
+	# Значения перечисления — атрибуты класса SatParameters (FIXED_SEARCH, ...)
+	parameters.search_branching = getattr(type(parameters), f"{params.search_branching.upper()}_SEARCH")
+
+
+def _solve_schedule(
+	scenario: Scenario,
+	num_search_workers: int = NUM_SEARCH_WORKERS,
+	stop_event: Optional[threading.Event] = None,
+	on_solution: Optional[PartSolutionHandler] = None,
+	warm_start: Optional[WarmStart] = None,
+) -> Tuple[List[ScheduleItem], float, str, SolveStats]:
+	"""Строит и решает CP-SAT модель расписания для сценария.
+
+	Возвращает (элементы расписания, значение цели, статус, статистика
+	решения без времени распределения по ролям). Люди по ролям
+	здесь не распределяются — это делается после сборки полного расписания.
+	Если передан stop_event, его установка прерывает поиск (как по лимиту времени).
+	Критерии scenario.params.stop останавливают поиск досрочно (см. _EarlyStop).
+	on_solution вызывается на каждое найденное улучшающее решение.
+	warm_start задаёт подсказки и закреплённые сцены из прошлого решения.
+	"""
+	started = time.perf_counter()
+	model, x, index = _build_model(scenario, warm_start)
+	build_seconds = time.perf_counter() - started
+
+	# Запускаем решатель
+	cp_solver = cp_model.CpSolver()
+	cp_solver.parameters.max_time_in_seconds = scenario.params.time_limit_seconds
+	cp_solver.parameters.num_search_workers = num_search_workers
+	_apply_search_params(cp_solver.parameters, scenario.params.solver)
+	early_stop = None
+	if scenario.params.stop.is_active():
+		early_stop = _EarlyStop(cp_solver, scenario.params.stop)
+		cp_solver.best_bound_callback = early_stop.on_bound
+	callback = None
+	if on_solution is not None or early_stop is not None:
+		callback = _ScheduleSolutionCallback(x, on_solution, early_stop)
+	if stop_event is None and (early_stop is None or not early_stop.needs_watch):
+		status = cp_solver.Solve(model, callback)
+	else:
+		finished = threading.Event()
+		watcher = threading.Thread(
+			target=_watch_search, args=(cp_solver, stop_event, early_stop, finished), daemon=True,
+		)
+		watcher.start()
+		try:
+			status = cp_solver.Solve(model, callback)
+		finally:
+			finished.set()
+			watcher.join()
+
+	started = time.perf_counter()
+	schedule: List[ScheduleItem] = []
+	objective_value: float = 0.0
+	if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+		# Извлекаем решение и формируем расписание
+		timeslots = index.compiled.timeslots
+		for p, prod in enumerate(index.compiled.productions):
+			for t, var in zip(index.stage_slots_of(p), index.production_vars[p]):
+				if cp_solver.Value(var) == 1:
+					rev = 0.0
+					schedule.append(
+						ScheduleItem(
+							scenario_id=scenario.id,
+							production_id=prod.id,
+							stage_id=timeslots[t].stage_id,  # Сцена из таймслота
+							timeslot_id=timeslots[t].id,
+							revenue=rev,
+						)
+					)
+		# Значение цели = количество назначений
+		objective_value = float(cp_solver.ObjectiveValue())
+		result_status = "feasible" if status == cp_model.FEASIBLE else "optimal"
+	else:
+		result_status = "infeasible"
+
+	proto = model.Proto()
+	found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+	bound = float(cp_solver.BestObjectiveBound()) if found else None
+	stats = SolveStats(
+		build_seconds=build_seconds,
+		solve_seconds=cp_solver.WallTime(),
+		extract_seconds=time.perf_counter() - started,
+		solver_status=cp_solver.StatusName(status),
+		num_variables=len(proto.variables),
+		num_constraints=len(proto.constraints),
+		families=index.families,
+		num_branches=cp_solver.NumBranches(),
+		num_conflicts=cp_solver.NumConflicts(),
+		objective_value=objective_value if found else None,
+		best_objective_bound=bound,
+		gap=_relative_gap(objective_value, bound) if found else None,
+		num_search_workers=num_search_workers,
+		time_limit_seconds=scenario.params.time_limit_seconds,
+		stop_reason=_stop_reason(status, early_stop, stop_event),
+	)
+	return schedule, objective_value, result_status, stats
+
+
+def _stop_reason(status, early_stop: Optional[_EarlyStop], stop_event) -> str:
+	"""Почему закончился поиск: критерий досрочной остановки, отмена или итог CP-SAT."""
+	if early_stop is not None and early_stop.reason is not None:
+		return early_stop.reason
+	if stop_event is not None and stop_event.is_set():
+		return "cancelled"
+	if status == cp_model.OPTIMAL:
+		return "optimal"
+	if status == cp_model.INFEASIBLE:
+		return "infeasible"
+	if status == cp_model.MODEL_INVALID:
+		return "model_invalid"
+	return "time_limit"
+
+
+def _relative_gap(objective: float, bound: float) -> float:
+	"""Относительный разрыв между целью и границей (как relative_gap_limit в CP-SAT)."""
+	return abs(bound - objective) / max(1.0, abs(objective))
+
+
+# Статусы CP-SAT от худшего к лучшему: общий статус частей — худший из них
+_SOLVER_STATUS_ORDER = ("MODEL_INVALID", "INFEASIBLE", "UNKNOWN", "FEASIBLE", "OPTIMAL")
+# Причины остановки частей: общая — первая по порядку (та, что сильнее всего ограничила поиск)
+_STOP_REASON_ORDER = (
+	"model_invalid", "infeasible", "cancelled", "time_limit", "no_improvement", "first_feasible", "gap", "optimal",
+)
+
+
+def _merge_stats(parts: List[SolveStats]) -> SolveStats:
+	"""Общая статистика подзадач, решавшихся параллельно.
+
+	Время — максимум по частям (части идут одновременно), размеры модели,
+	счётчики поиска, цель и граница — суммы.
+	"""
+	families: Dict[str, Dict[str, int]] = {}
+	for part in parts:
+		for family, counts in part.families.items():
+			entry = families.setdefault(family, {"variables": 0, "constraints": 0})
+			entry["variables"] += counts["variables"]
+			entry["constraints"] += counts["constraints"]
+	found = all(part.objective_value is not None for part in parts)
+	objective = sum(part.objective_value for part in parts) if found else None
+	bound = sum(part.best_objective_bound for part in parts) if found else None
+	return SolveStats(
+		build_seconds=max(part.build_seconds for part in parts),
+		solve_seconds=max(part.solve_seconds for part in parts),
+		extract_seconds=max(part.extract_seconds for part in parts),
+		solver_status=min(
+			(part.solver_status for part in parts),
+			key=lambda st: _SOLVER_STATUS_ORDER.index(st) if st in _SOLVER_STATUS_ORDER else 0,
+		),
+		num_variables=sum(part.num_variables for part in parts),
+		num_constraints=sum(part.num_constraints for part in parts),
+		families=families,
+		num_branches=sum(part.num_branches for part in parts),
+		num_conflicts=sum(part.num_conflicts for part in parts),
+		objective_value=objective,
+		best_objective_bound=bound,
+		gap=_relative_gap(objective, bound) if found else None,
+		num_search_workers=sum(part.num_search_workers for part in parts),
+		time_limit_seconds=max(part.time_limit_seconds for part in parts),
+		num_parts=len(parts),
+		stop_reason=min(
+			(part.stop_reason for part in parts),
+			key=lambda r: _STOP_REASON_ORDER.index(r) if r in _STOP_REASON_ORDER else 0,
+		),
+	)
+
+
+def _solve_single(
+	scenario: Scenario,
+	stop_event: Optional[threading.Event] = None,
+	on_solution: Optional[Callable[[Dict], None]] = None,
+	warm_start: Optional[WarmStart] = None,
+	num_search_workers: int = NUM_SEARCH_WORKERS,
+) -> Tuple[List[ScheduleItem], float, str, SolveStats]:
+	"""Решает сценарий одной моделью; промежуточные решения — через _SolutionReporter."""
+	reporter = _SolutionReporter(scenario, 1, on_solution) if on_solution is not None else None
+	return _solve_schedule(
+		scenario,
+		num_search_workers,
+		stop_event=stop_event,
+		on_solution=partial(reporter.update, 0) if reporter is not None else None,
+		warm_start=warm_start,
+	)
+
+
+def _split_by_stage(scenario: Scenario) -> List[Scenario]:
+	"""Разбивает сценарий на независимые подсценарии — по одному на сцену.
+
+	Каждая постановка привязана к одной сцене, и ни одно ограничение модели
+	не связывает разные сцены, поэтому подзадачи можно решать независимо.
+	Люди и роли в подсценарии не передаются: распределение по ролям
+	выполняется уже по объединённому расписанию.
+	"""
+	stage_of_production = {p.id: p.stage_id for p in scenario.productions}
+	productions_by_stage: Dict[str, List[Production]] = defaultdict(list)
+	for p in scenario.productions:
+		productions_by_stage[p.stage_id].append(p)
+	timeslots_by_stage: Dict[str, List[TimeSlot]] = defaultdict(list)
+	for t in scenario.timeslots:
+		timeslots_by_stage[t.stage_id].append(t)
+	fixed_by_stage: Dict[str, List[FixedAssignment]] = defaultdict(list)
+	for fa in scenario.fixed_assignments or []:
+		stage_id = stage_of_production.get(fa.production_id)
+		if stage_id is None:
+			raise Exception("Входные данные не согласованы")
+		fixed_by_stage[stage_id].append(fa)
+
+	return [
+		replace(
+			scenario,
+			productions=prods,
+			stages=[st for st in scenario.stages if st.id == stage_id],
+			timeslots=timeslots_by_stage.get(stage_id, []),
+			fixed_assignments=fixed_by_stage.get(stage_id, []),
+			people=[],
+			roles=[],
+			person_production_roles=[],
+		)
+		for stage_id, prods in productions_by_stage.items()
+	]
+
+
+def _merge_statuses(statuses: List[str]) -> str:
+	"""Общий статус: infeasible, если хоть одна часть неразрешима; optimal — если все оптимальны."""
+	if any(st == "infeasible" for st in statuses):
+		return "infeasible"
+	if all(st == "optimal" for st in statuses):
+		return "optimal"
+	return "feasible"
+
+
+def _init_stage_worker(stop_event, solution_queue) -> None:
+	global _worker_stop_event, _worker_solution_queue
+	_worker_stop_event = stop_event
+	_worker_solution_queue = solution_queue
+
+
+def _put_part_solution(part_index: int, objective: float, bound: float, assigned: List[Tuple[str, str]]) -> None:
+	_worker_solution_queue.put((part_index, objective, bound, assigned))
+
+
+def _solve_stage_part(
+	part: Scenario,
+	num_search_workers: int,
+	part_index: int,
+	warm_start: Optional[WarmStart] = None,
+) -> Tuple[List[ScheduleItem], float, str, SolveStats]:
+	"""Точка входа дочернего процесса: решает подзадачу одной сцены."""
+	on_solution = partial(_put_part_solution, part_index) if _worker_solution_queue is not None else None
+	return _solve_schedule(part, num_search_workers, _worker_stop_event, on_solution, warm_start)
+
+
+def _forward_stop_event(source: threading.Event, target, finished: threading.Event) -> None:
+	"""Пробрасывает отмену из потока-владельца в событие дочерних процессов."""
+	while not finished.is_set():
+		if source.wait(0.1):
+			target.set()
+			return
+
+
+def _drain_solution_queue(solution_queue, reporter: _SolutionReporter) -> None:
+	"""Передаёт решения из дочерних процессов в reporter до сигнала None."""
+	while True:
+		item = solution_queue.get()
+		if item is None:
+			return
+		reporter.update(*item)
+
+
+def _solve_by_stage(
+	scenario: Scenario,
+	stop_event: Optional[threading.Event] = None,
+	on_solution: Optional[Callable[[Dict], None]] = None,
+	warm_start: Optional[WarmStart] = None,
+	num_search_workers: int = NUM_SEARCH_WORKERS,
+) -> Tuple[List[ScheduleItem], float, str, SolveStats]:
+	"""Решает подзадачи по сценам параллельно в пуле процессов и объединяет результат.
+
+	Подзадачи выполняются одновременно, поэтому лимит времени
+	(time_limit_seconds) общий: каждая часть получает его целиком, а
+	num_search_workers потоков CP-SAT делятся между частями поровну (не
+	меньше одного на часть).
+	"""
+	parts = _split_by_stage(scenario)
+	if len(parts) <= 1:
+		return _solve_single(parts[0] if parts else scenario, stop_event, on_solution, warm_start, num_search_workers)
+
+	workers_per_part = max(1, num_search_workers // len(parts))
+	# spawn, а не fork: у процесса API работают потоки CP-SAT, пула решений и
+	# SSE, и унаследованные дочерним процессом захваченные блокировки повесят его
+	context = multiprocessing.get_context("spawn")
+	# Событие и очередь процессов передаются через initializer (при запуске процесса), а не через map
+	process_stop_event = context.Event()
+	solution_queue = context.Queue() if on_solution is not None else None
+	finished = threading.Event()
+	if stop_event is not None:
+		threading.Thread(
+			target=_forward_stop_event,
+			args=(stop_event, process_stop_event, finished),
+			daemon=True,
+		).start()
+	drainer = None
+	if solution_queue is not None:
+		drainer = threading.Thread(
+			target=_drain_solution_queue,
+			args=(solution_queue, _SolutionReporter(scenario, len(parts), on_solution)),
+			daemon=True,
+		)
+		drainer.start()
+	try:
+		with ProcessPoolExecutor(
+			max_workers=len(parts),
+			mp_context=context,
+			initializer=_init_stage_worker,
+			initargs=(process_stop_event, solution_queue),
+		) as pool:
+			results = list(pool.map(
+				_solve_stage_part,
+				parts,
+				[workers_per_part] * len(parts),
+				range(len(parts)),
+				[warm_start] * len(parts),
+			))
+	finally:
+		finished.set()
+		if drainer is not None:
+			solution_queue.put(None)
+			drainer.join()
+
+	status = _merge_statuses([st for _, _, st, _ in results])
+	stats = _merge_stats([part_stats for _, _, _, part_stats in results])
+	if status == "infeasible":
+		return [], 0.0, status, stats
+	schedule = [item for part_schedule, _, _, _ in results for item in part_schedule]
+	objective_value = sum(obj for _, obj, _, _ in results)
+	return schedule, objective_value, status, stats
+
+
+class MinimalCPSATSolver:
+	def solve(
+		self,
+		scenario: Scenario,
+		stop_event: Optional[threading.Event] = None,
+		on_solution: Optional[Callable[[Dict], None]] = None,
+		previous: Optional[ScenarioResult] = None,
+		fix_unchanged_stages: bool = False,
+		repair_from: Optional[List[Assignment]] = None,
+		num_search_workers: Optional[int] = None,
+	) -> ScenarioResult:
+		"""Составить расписание и распределить людей по ролям.
+
+		stop_event позволяет досрочно прервать поиск из другого потока:
+		возвращается лучшее найденное к этому моменту решение.
+		on_solution получает событие (см. _SolutionReporter) на каждое
+		улучшающее решение — вызывается из потоков решателя.
+		previous — прошлый результат для тёплого старта; при fix_unchanged_stages
+		сцены с неизменившимися входными данными закрепляются как были.
+		repair_from — прошлые назначения: вместо полного распределения
+		сохраняются все ещё корректные, а заново заполняются только позиции
+		изменившихся показов (см. repair_assignments).
+		num_search_workers — потоки, выделенные решению сервером (см.
+		CoreAllocator); params.solver.num_search_workers сценария не может
+		их превысить.
+		"""
+		started = time.perf_counter()
+		workers = _search_workers(scenario.params.solver.num_search_workers, num_search_workers)
+		fingerprints = stage_fingerprints(scenario)
+		warm_start = None
+		if previous is not None and previous.status != "infeasible":
+			warm_start = WarmStart(assigned={(it.production_id, it.timeslot_id) for it in previous.schedule})
+			if fix_unchanged_stages:
+				warm_start.fixed_stages = {
+					stage_id for stage_id, fp in fingerprints.items()
+					if previous.stage_fingerprints.get(stage_id) == fp
+				}
+
+		if scenario.params.decompose_by_stage:
+			schedule, objective_value, result_status, stats = _solve_by_stage(
+				scenario, stop_event, on_solution, warm_start, workers,
+			)
 		else:
-			result_status = "infeasible"
+			schedule, objective_value, result_status, stats = _solve_single(
+				scenario, stop_event, on_solution, warm_start, workers,
+			)
 
 		# Распределяем людей по ролям с балансировкой нагрузки
+		assign_started = time.perf_counter()
 		assignments = []
-		if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) and schedule:
-			assignments = _assign_people_to_roles(scenario, schedule)
-		
+		assignment_diff = {}
+		if result_status != "infeasible" and schedule:
+			if repair_from is not None:
+				assignments, added, removed = repair_assignments(scenario, schedule, repair_from)
+				assignment_diff = {"added": added, "removed": removed}
+			else:
+				# Распределению — те же потоки и остаток лимита времени решения, а не новый лимит
+				budget = AssignmentBudget(
+					num_search_workers=workers,
+					time_limit_seconds=max(0.0, scenario.params.time_limit_seconds - (time.perf_counter() - started)),
+				)
+				assignments = _assign_people_to_roles(scenario, schedule, budget)
+		stats.assign_seconds = time.perf_counter() - assign_started
+		stats.total_seconds = time.perf_counter() - started
+		if warm_start is not None and warm_start.fixed_stages:
+			# Оптимум найден только для незакреплённых сцен, а не для всего сценария
+			stats.pinned_stages = sorted(warm_start.fixed_stages)
+			if result_status == "optimal":
+				result_status = "optimal_restricted"
+
 		return ScenarioResult(
 			scenario_id=scenario.id,
 			schedule=sorted(
@@ -224,94 +945,14 @@ class MinimalCPSATSolver:
 			objective_value=objective_value,
 			status=result_status,
 			assignments=assignments,
+			stage_fingerprints=fingerprints,
+			assignment_diff=assignment_diff,
+			stats=stats,
 		)
 
 
-def _assign_people_to_roles(scenario: Scenario, schedule: List[ScheduleItem]) -> List[Assignment]:
-	"""Распределяет людей по ролям для каждого показа с балансировкой нагрузки.
-	
-	Алгоритм:
-	1. Для каждого элемента расписания находим нужные роли
-	2. Для каждой роли находим людей, которые могут её играть
-	3. Распределяем людей равномерно (каждый человек играет примерно одинаковое количество раз)
-	"""
-	from collections import defaultdict
-	
-	assignments = []
-	
-	# Группируем роли по постановкам
-	roles_by_production: Dict[str, List[Role]] = defaultdict(list)
-	for role in scenario.roles:
-		roles_by_production[role.production_id].append(role)
-	
-	# Создаём словарь: кто может играть какую роль в каком спектакле
-	# (person_id, production_id, role_id) -> can_play
-	can_play_map: Dict[Tuple[str, str, str], bool] = {}
-	for ppr in scenario.person_production_roles:
-		key = (ppr.person_id, ppr.production_id, ppr.role_id)
-		can_play_map[key] = ppr.can_play
-	
-	# Считаем, сколько раз каждый человек уже назначен (для балансировки)
-	person_assignment_count: Dict[str, int] = defaultdict(int)
-	
-	# Группируем элементы расписания по постановке для балансировки
-	schedule_by_production: Dict[str, List[ScheduleItem]] = defaultdict(list)
-	for item in schedule:
-		schedule_by_production[item.production_id].append(item)
-	
-	# Для каждой постановки распределяем людей равномерно
-	for production_id, production_items in schedule_by_production.items():
-		roles = roles_by_production.get(production_id, [])
-		
-		# Для каждой роли в этой постановке
-		for role in roles:
-			# Находим людей, которые могут играть эту роль
-			available_people = []
-			for person in scenario.people:
-				key = (person.id, production_id, role.id)
-				if can_play_map.get(key, False):
-					available_people.append(person)
-			
-			if not available_people:
-				# Если нет доступных людей, пропускаем роль (или можно выбросить ошибку)
-				continue
-			
-			# Распределяем людей равномерно по всем показам
-			# Если требуется N человек на роль и есть M показов, каждый человек должен играть примерно M*N/len(available_people) раз
-			num_shows = len(production_items)
-			total_assignments_needed = num_shows * role.required_count
-			
-			# Сортируем людей по количеству уже сделанных назначений (для балансировки)
-			available_people.sort(key=lambda p: person_assignment_count[p.id])
-			
-			# Распределяем назначения
-			assignment_idx = 0
-			for item in production_items:
-				schedule_item_id = f"{item.production_id}|{item.stage_id}|{item.timeslot_id}"
-				
-				# Назначаем требуемое количество людей на эту роль
-				for _ in range(role.required_count):
-					if assignment_idx >= len(available_people):
-						# Если людей не хватает, начинаем заново (циклическое распределение)
-						assignment_idx = 0
-					
-					person = available_people[assignment_idx]
-					assignment = Assignment(
-						scenario_id=scenario.id,
-						schedule_item_id=schedule_item_id,
-						production_id=item.production_id,
-						timeslot_id=item.timeslot_id,
-						stage_id=item.stage_id,
-						person_id=person.id,
-						role_id=role.id,
-						is_conductor=role.is_conductor,
-					)
-					assignments.append(assignment)
-					person_assignment_count[person.id] += 1
-					assignment_idx += 1
-			
-			# После распределения для роли, пересортировываем для следующей роли
-			# (чтобы следующая роль тоже распределялась равномерно)
-			available_people.sort(key=lambda p: person_assignment_count[p.id])
-	
-	return assignments
\ No newline at end of file
+def _assign_people_to_roles(
+	scenario: Scenario, schedule: List[ScheduleItem], budget: Optional[AssignmentBudget] = None
+) -> List[Assignment]:
+	"""Распределяет людей по ролям методом из scenario.params.assignment_engine (см. solver/assignment.py)."""
+	return assign_people_to_roles(scenario, schedule, budget)
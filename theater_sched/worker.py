@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+"""
+Процессы решателя для режима нескольких процессов API (THEATER_JOBS=sqlite).
+
+Процессы API только ставят задачи в общую очередь SQLite, а решает их этот
+пул процессов, поэтому тяжёлый CP-SAT не отнимает CPU у обработки запросов:
+
+python -m theater_sched.worker
+
+Число процессов — SOLVE_MAX_CONCURRENCY, база — THEATER_SQLITE_PATH, ядра
+(SOLVER_CPU_CORES или квота CPU) делятся между процессами поровну. Задачи
+упавшего процесса помечаются failed сразу, а задачи, воркер которых не
+отмечался дольше SOLVE_HEARTBEAT_TIMEOUT секунд (пропал процесс или хост), —
+любым запущенным пулом.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Dict, Optional
+
+from theater_sched.domain.models import SolveJob
+from theater_sched.repositories.sqlite import SqliteRepository
+from theater_sched.repositories.sqlite_jobs import SqliteJobStore, new_instance_id, result_to_dict, worker_name
+from theater_sched.services.jobs import complete_job
+from theater_sched.services.result_cache import SolveResultCache
+from theater_sched.services.scenarios import ScenarioService
+from theater_sched.services.variants import variant_from_dict
+from theater_sched.solver.cores import available_cores
+
+logger = logging.getLogger(__name__)
+_LOG_FORMAT = "%(asctime)s %(levelname)s %(processName)s %(name)s: %(message)s"
+
+
+class SolveWorker:
+	"""Забирает задачи из очереди SqliteJobStore и решает их по одной.
+
+	Во время поиска воркер раз в poll_interval отмечается в задаче (heartbeat)
+	и получает флаг отмены, который переводится в событие остановки CP-SAT;
+	промежуточные решения пишутся в очередь, если их ждёт поток SSE. Пакет
+	вариантов (kind=variants) решается пулом процессов на ядрах этого воркера,
+	отчёт сравнения сохраняется в задаче; начатый пакет не прерывается.
+	"""
+	def __init__(
+		self,
+		service: ScenarioService,
+		store: SqliteJobStore,
+		num_search_workers: Optional[int] = None,
+		poll_interval: float = 0.5,
+		name: Optional[str] = None,
+	) -> None:
+		self._service = service
+		self._store = store
+		self._num_search_workers = num_search_workers
+		self._poll_interval = poll_interval
+		self.name = name or worker_name(new_instance_id())
+		self._stopping = threading.Event()
+		self._stop_event: Optional[threading.Event] = None
+
+	def stop(self) -> None:
+		"""Остановить воркер; текущее решение прерывается и сохраняется как отменённое."""
+		self._stopping.set()
+		if self._stop_event is not None:
+			self._stop_event.set()
+
+	def run_forever(self) -> None:
+		while not self._stopping.is_set():
+			if not self.run_once():
+				self._stopping.wait(self._poll_interval)
+
+	def run_once(self) -> bool:
+		"""Решить одну задачу из очереди; False, если очередь пуста."""
+		claimed = self._store.claim(self.name)
+		if claimed is None:
+			return False
+		job, options, stream = claimed
+		stop_event = self._stop_event = threading.Event()
+		if self._stopping.is_set():
+			stop_event.set()
+		finished = threading.Event()
+		watcher = threading.Thread(
+			target=self._heartbeat, args=(job.id, stop_event, finished), name="solve-heartbeat", daemon=True,
+		)
+		watcher.start()
+		output = None
+		try:
+			if job.kind == "variants":
+				output = self._solve_variants(job, options)
+			else:
+				output = self._solve(job, options, stream, stop_event)
+		finally:
+			finished.set()
+			watcher.join()
+			self._stop_event = None
+			if not self._store.finish(job, self.name, output):
+				logger.warning("Job %s is no longer owned by worker %s; its final state was not recorded", job.id, self.name)
+		return True
+
+	def _solve_variants(self, job: SolveJob, options: Dict) -> Optional[Dict]:
+		variants = [variant_from_dict(v) for v in options["variants"]]
+		try:
+			report = self._service.solve_variants(
+				job.scenario_id, variants, num_search_workers=self._num_search_workers,
+			)
+		except Exception as e:
+			job.state = "failed"
+			job.error = str(e)
+			job.finished_at = time.time()
+			return None
+		job.state = "done"
+		job.finished_at = time.time()
+		return report
+
+	def _solve(self, job: SolveJob, options: Dict, stream: bool, stop_event: threading.Event) -> Optional[Dict]:
+		on_solution = None
+		if stream:
+			seq = 0
+
+			def on_solution(event: Dict) -> None:
+				nonlocal seq
+				seq += 1
+				self._store.add_event(job.id, seq, event)
+
+		try:
+			result = self._service.solve(
+				job.scenario_id, stop_event=stop_event, on_solution=on_solution,
+				num_search_workers=self._num_search_workers, **options,
+			)
+		except Exception as e:
+			job.state = "failed"
+			job.error = str(e)
+			job.finished_at = time.time()
+			return None
+		complete_job(job, result, stop_event.is_set())
+		# Результат задачи, а не последний результат сценария: его могла заменить другая задача
+		return result_to_dict(result)
+
+	def _heartbeat(self, job_id: str, stop_event: threading.Event, finished: threading.Event) -> None:
+		while not finished.wait(self._poll_interval):
+			if self._store.heartbeat(job_id, self.name):
+				stop_event.set()
+
+
+def _service(path: str) -> ScenarioService:
+	# Кэш решений у каждого процесса свой (SOLVE_CACHE_SIZE=0 — отключить)
+	cache_size = int(os.getenv("SOLVE_CACHE_SIZE", "256"))
+	return ScenarioService(SqliteRepository(path), SolveResultCache(cache_size) if cache_size > 0 else None)
+
+
+def _run_worker(path: str, num_search_workers: int, poll_interval: float, instance: str) -> None:
+	"""Точка входа дочернего процесса: решать задачи до SIGTERM."""
+	logging.basicConfig(level=logging.INFO, format=_LOG_FORMAT)
+	worker = SolveWorker(
+		_service(path), SqliteJobStore(path), num_search_workers, poll_interval, worker_name(instance),
+	)
+	signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+	signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C обрабатывает родитель
+	worker.run_forever()
+
+
+def main() -> None:
+	logging.basicConfig(level=logging.INFO, format=_LOG_FORMAT)
+	path = os.getenv("THEATER_SQLITE_PATH", "theater_sched.db")
+	processes = max(1, int(os.getenv("SOLVE_MAX_CONCURRENCY", "2")))
+	total_cores = int(os.environ["SOLVER_CPU_CORES"]) if os.getenv("SOLVER_CPU_CORES") else available_cores()
+	num_search_workers = max(1, total_cores // processes)
+	poll_interval = float(os.getenv("SOLVE_POLL_INTERVAL", "0.5"))
+	heartbeat_timeout = float(os.getenv("SOLVE_HEARTBEAT_TIMEOUT", "30"))
+
+	store = SqliteJobStore(path)
+	# Процессы этого запуска отличаются от процессов других пулов (на этом же хосте тоже)
+	instance = new_instance_id()
+
+	stopping = threading.Event()
+	signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+	signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+	# spawn: дочерние процессы не наследуют состояние OR-Tools родителя
+	context = multiprocessing.get_context("spawn")
+	children: Dict[int, multiprocessing.Process] = {}
+	logger.info("Solver workers: %d x %d CP-SAT threads, database %s", processes, num_search_workers, path)
+	while not stopping.is_set():
+		# Задачи процессов, переставших отмечаться (упавший пул, пропавший хост)
+		store.fail_stale(heartbeat_timeout, "Solver worker stopped responding")
+		for slot in range(processes):
+			child = children.get(slot)
+			if child is not None and child.is_alive():
+				continue
+			if child is not None:
+				store.fail_running(
+					worker_name(instance, child.pid), f"Solver worker exited with code {child.exitcode}",
+				)
+			child = context.Process(
+				target=_run_worker, args=(path, num_search_workers, poll_interval, instance), name=f"solver-{slot}",
+			)
+			child.start()
+			children[slot] = child
+		stopping.wait(1.0)
+
+	# Текущие решения прерываются и сохраняются с лучшим найденным расписанием
+	for child in children.values():
+		child.terminate()
+	for child in children.values():
+		child.join(timeout=30)
+		if child.is_alive():
+			child.kill()
+			child.join()
+			store.fail_running(worker_name(instance, child.pid), "Solver worker killed on shutdown")
+
+
+if __name__ == "__main__":
+	main()
@@ -2798,7 +2798,9 @@
 			
 			const result = await res.json();
 			const statusMsg = result.status === 'optimal' ? '✅ Расписание составлено' : 
+							  result.status === 'optimal_restricted' ? '✅ Расписание составлено (сцены без изменений закреплены)' : 
 							  result.status === 'feasible' ? '✓ Допустимое решение' : 
+							  result.status === 'cancelled' ? '⏹ Решение отменено, прошлое расписание сохранено' : 
 							  '⚠ Не найдено решение';
 			setStatus(`${statusMsg}`, false, result.status !== 'infeasible');
 			// Загружаем расписание без прокрутки